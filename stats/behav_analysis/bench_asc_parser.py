@@ -0,0 +1,114 @@
+"""
+-----------------------------------------------------------------------------------------
+bench_asc_parser.py
+-----------------------------------------------------------------------------------------
+Goal of the script:
+Compare the single-pass asc parser (edf_utils.parse_asc) with the former
+extract_eyetraces.py path (.msg line loop + np.genfromtxt of the .dat file)
+-----------------------------------------------------------------------------------------
+Input(s):
+sys.argv[1]: asc file converted with edf2asc -miss -1.0 (optional, synthetic run if none)
+-----------------------------------------------------------------------------------------
+Output(s):
+timing of both paths and check of identical samples/messages
+-----------------------------------------------------------------------------------------
+To run:
+cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
+python behav_analysis/bench_asc_parser.py
+-----------------------------------------------------------------------------------------
+"""
+
+# Stop warnings
+# -------------
+import warnings
+warnings.filterwarnings("ignore")
+
+# General imports
+# ---------------
+import os
+import sys
+import re
+import time
+import tempfile
+import numpy as np
+
+# Specific imports
+# ----------------
+from edf_utils import parse_asc
+
+# Get inputs
+# ----------
+tmp_dir = tempfile.mkdtemp()
+if len(sys.argv) > 1:
+	asc_filename = sys.argv[1]
+else:
+	# synthetic 1000 Hz run of 9 sequences of 32 trials
+	asc_filename = '{}/synthetic.asc'.format(tmp_dir)
+	num_samples = 1500000
+	t0 = 1000000
+	rng = np.random.default_rng(0)
+	x = 960 + np.cumsum(rng.normal(0, 0.5, num_samples))
+	y = 540 + np.cumsum(rng.normal(0, 0.5, num_samples))
+	x[200000:200150], y[200000:200150] = -1, -1
+	with open(asc_filename, 'w') as ascfid:
+		ascfid.write('** CONVERTED FROM synthetic.edf\n')
+		ascfid.write('START\t{}\tRIGHT\tSAMPLES\tEVENTS\n'.format(t0))
+		msg_times = np.linspace(t0 + 1000, t0 + num_samples - 1000, 9*(2+2*32)).astype(int)
+		msg_idx = 0
+		msg_list = []
+		for seq in np.arange(1,10):
+			msg_list.append('sequence {} started at 1.0'.format(seq))
+			for trial in np.arange(1,33):
+				msg_list.append('sequence {} trial {} onset at 1.0'.format(seq, trial))
+				msg_list.append('sequence {} trial {} offset at 1.0'.format(seq, trial))
+			msg_list.append('sequence {} stopped at 1.0'.format(seq))
+		for t_sample in np.arange(num_samples):
+			t = t0 + t_sample
+			while msg_idx < len(msg_list) and msg_times[msg_idx] == t:
+				ascfid.write('MSG\t{}\t{}\n'.format(t, msg_list[msg_idx]))
+				msg_idx += 1
+			ascfid.write('{}\t{:7.1f}\t{:7.1f}\t{:7.1f}\t...\n'.format(t, x[t_sample], y[t_sample], 1200.0))
+		ascfid.write('END\t{}\tSAMPLES\tEVENTS\n'.format(t0 + num_samples))
+
+# split asc in the former .msg (events) and .dat (samples) files
+msg_filename = '{}/bench.msg'.format(tmp_dir)
+dat_filename = '{}/bench.dat'.format(tmp_dir)
+with open(asc_filename) as ascfid, open(msg_filename, 'w') as msgfid, open(dat_filename, 'w') as datfid:
+	for line in ascfid:
+		if line[:1].isdigit(): datfid.write(line)
+		else: msgfid.write(line)
+
+# Former path
+# -----------
+t_start = time.time()
+msgfid = open(msg_filename)
+msg_old = []
+for line_read in msgfid:
+	la = line_read.split()
+	if re.search(r"MSG", line_read):
+		if re.search(r"sequence\s\d+\sstarted", line_read): msg_old.append(int(la[1]))
+		if re.search(r"sequence\s\d+\sstopped", line_read): msg_old.append(int(la[1]))
+		if re.search(r"trial\s\d+\sonset", line_read): msg_old.append(int(la[1]))
+		if re.search(r"trial\s\d+\soffset", line_read): msg_old.append(int(la[1]))
+msgfid.close()
+eye_dat = np.genfromtxt(dat_filename,usecols=(0, 1, 2))
+dur_old = time.time() - t_start
+
+# Single-pass parser
+# ------------------
+t_start = time.time()
+edf_data = parse_asc(asc_filename)
+dur_new = time.time() - t_start
+
+# Report
+# ------
+same_samples = np.array_equal(eye_dat[:,0], edf_data['time']) and \
+			   np.allclose(eye_dat[:,1:3], np.column_stack((edf_data['x'],edf_data['y'])))
+same_msg = np.array_equal(np.array(msg_old), edf_data['msg_time'])
+print('samples: {}, messages: {}'.format(edf_data['time'].shape[0], edf_data['msg_time'].shape[0]))
+print('msg loop + genfromtxt: {:.2f} s'.format(dur_old))
+print('parse_asc:             {:.2f} s ({:.1f}x faster)'.format(dur_new, dur_old/dur_new))
+print('identical samples: {}, identical messages: {}'.format(same_samples, same_msg))
+
+for filename in [msg_filename, dat_filename]:
+	os.remove(filename)
@@ -0,0 +1,157 @@
+"""
+-----------------------------------------------------------------------------------------
+bench_detectors.py
+-----------------------------------------------------------------------------------------
+Goal of the script:
+Compare the saccade detectors of sac_utils (run_detector: ek, ivt, idt, adaptive) on the
+trials of a subject: throughput and agreement with the EyeLink parsed saccades (ESACC)
+and with the Engbert-Kliegl detector
+-----------------------------------------------------------------------------------------
+Input(s):
+sys.argv[1]: subject number (sub-01)
+sys.argv[2]: task (SacLoc)
+-----------------------------------------------------------------------------------------
+Output(s):
+table with one row per detector
+recall: proportion of reference saccades overlapped by a detected saccade
+precision: proportion of detected saccades overlapping a reference saccade
+-----------------------------------------------------------------------------------------
+To run:
+cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
+python behav_analysis/bench_detectors.py sub-01 SacLoc
+-----------------------------------------------------------------------------------------
+"""
+
+# Stop warnings
+# -------------
+import warnings
+warnings.filterwarnings("ignore")
+
+# General imports
+# ---------------
+import sys
+import platform
+import json
+import time
+import numpy as np
+import h5py
+
+# Specific imports
+# ----------------
+from sac_utils import run_detector, match_saccades, assign_trials
+from h5_utils import load_trial_index, load_trial
+
+# Get inputs
+# ----------
+subject = sys.argv[1]
+task = sys.argv[2]
+
+# Define analysis parameters
+# --------------------------
+with open('./behavior_settings.json') as f:
+	json_s = f.read()
+	analysis_info = json.loads(json_s)
+
+# Platform settings
+# -----------------
+if platform.system() == 'Darwin':
+	main_dir = analysis_info['main_dir_mac']
+
+elif platform.system() == 'Windows':
+	main_dir = analysis_info['main_dir_pc']
+
+elif platform.system() == 'Linux':
+	main_dir = analysis_info['main_dir_unix']
+
+sampling_rate = analysis_info['sampling_rate']
+detectors = ['ek', 'ivt', 'idt', 'adaptive']
+
+# Load data
+# ---------
+file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
+h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
+h5_file = h5py.File(h5_filename,'r')
+folder_alias = 'eye_traces'
+trial_index = load_trial_index(h5_file, folder_alias)
+el_sacc = {column: np.array(h5_file['{folder_alias}/eyelink_saccades/{column}'.format(folder_alias = folder_alias, column = column)])
+		   for column in ['run', 'start', 'end']}
+
+# trials without missing time stamps
+trials_data = []
+for run, sequence, trial in zip(trial_index['run'], trial_index['sequence'], trial_index['trial']):
+	trial_data = load_trial(h5_file, run, sequence, trial, trial_index = trial_index)
+	if trial_data['time'].shape[0] < 6 or np.sum(np.diff(trial_data['time'])>1000/sampling_rate) > 0:
+		continue
+	trial_data['run'] = run
+	trials_data.append(trial_data)
+num_samples = np.sum([trial_data['time'].shape[0] for trial_data in trials_data])
+print('trials: {}, samples: {}'.format(len(trials_data), num_samples))
+
+# Detection
+# ---------
+det_sacc, det_dur = {}, {}
+for detector in detectors:
+	analysis_info['saccade_detector'] = detector
+	run_detector(trials_data[0]['x'], trials_data[0]['y'], analysis_info)	# compilation/import
+	t_start = time.time()
+	sac_trials = [run_detector(trial_data['x'], trial_data['y'], analysis_info) for trial_data in trials_data]
+	det_dur[detector] = time.time() - t_start
+
+	# saccade onset/offset times by run
+	det_sacc[detector] = {	'run': np.concatenate([np.full(sac.shape[0], trial_data['run']) for sac, trial_data in zip(sac_trials, trials_data)]),
+							'start': np.concatenate([trial_data['time'][sac['onset']] for sac, trial_data in zip(sac_trials, trials_data)]),
+							'end': np.concatenate([trial_data['time'][sac['offset']] for sac, trial_data in zip(sac_trials, trials_data)])}
+
+# EyeLink saccades starting within the analysed trials
+trial_onset = np.array([trial_data['time'][0] for trial_data in trials_data])
+trial_offset = np.array([trial_data['time'][-1] for trial_data in trials_data])
+trial_run = np.array([trial_data['run'] for trial_data in trials_data])
+el_logic = np.zeros(el_sacc['start'].shape[0], dtype = bool)
+for run in np.unique(trial_run):
+	run_el_logic = el_sacc['run'] == run
+	el_logic[run_el_logic] = assign_trials(el_sacc['start'][run_el_logic], trial_onset[trial_run == run], trial_offset[trial_run == run]) >= 0
+ref_sacc = {'eyelink': {column: el_sacc[column][el_logic] for column in ['run', 'start', 'end']},
+			'ek': det_sacc['ek']}
+
+# Agreement
+# ---------
+def agreement(sacc, ref):
+	"""
+	----------------------------------------------------------------------
+	agreement(sacc, ref)
+	----------------------------------------------------------------------
+	Goal of the function :
+	Agreement of detected saccades with reference saccades (same run,
+	overlapping in time)
+	----------------------------------------------------------------------
+	Input(s) :
+	sacc: detected saccades (dictionary of run, start and end arrays)
+	ref: reference saccades (same keys)
+	----------------------------------------------------------------------
+	Output(s) :
+	recall: proportion of reference saccades matched
+	precision: proportion of detected saccades matched
+	----------------------------------------------------------------------
+	Function created by Martin SZINTE (mail@martinszinte.net)
+	----------------------------------------------------------------------
+	"""
+	num_ref_match, num_sac_match = 0, 0
+	for run in np.unique(np.concatenate((sacc['run'], ref['run']))):
+		sac_logic, ref_logic = sacc['run'] == run, ref['run'] == run
+		sac_order, ref_order = np.argsort(sacc['start'][sac_logic]), np.argsort(ref['start'][ref_logic])
+		sac_on, sac_off = sacc['start'][sac_logic][sac_order], sacc['end'][sac_logic][sac_order]
+		ref_on, ref_off = ref['start'][ref_logic][ref_order], ref['end'][ref_logic][ref_order]
+		num_sac_match += np.sum(match_saccades(sac_on, sac_off, ref_on, ref_off) >= 0)
+		num_ref_match += np.sum(match_saccades(ref_on, ref_off, sac_on, sac_off) >= 0)
+	return num_ref_match/max(ref['start'].shape[0], 1), num_sac_match/max(sacc['start'].shape[0], 1)
+
+# Report
+# ------
+print('{:<10}{:>10}{:>10}{:>12}{:>11}{:>14}{:>11}{:>14}'.format('detector', 'saccades', 'time (s)', 'Msamples/s',
+		'recall EL', 'precision EL', 'recall EK', 'precision EK'))
+for detector in detectors:
+	recall_el, precision_el = agreement(det_sacc[detector], ref_sacc['eyelink'])
+	recall_ek, precision_ek = agreement(det_sacc[detector], ref_sacc['ek'])
+	print('{:<10}{:>10}{:>10.3f}{:>12.1f}{:>11.3f}{:>14.3f}{:>11.3f}{:>14.3f}'.format(
+			detector, det_sacc[detector]['start'].shape[0], det_dur[detector], num_samples/det_dur[detector]/1e6,
+			recall_el, precision_el, recall_ek, precision_ek))
@@ -0,0 +1,94 @@
+"""
+-----------------------------------------------------------------------------------------
+bench_sac_kernel.py
+-----------------------------------------------------------------------------------------
+Goal of the script:
+Compare the numba saccade detection kernel (sac_utils._ek_kernel) with the numpy
+path (vecvel + microsacc_merge) on a synthetic 1000 Hz session
+-----------------------------------------------------------------------------------------
+Input(s):
+sys.argv[1]: number of trials (optional, default 576 = 2 runs of 9 sequences of 32 trials)
+-----------------------------------------------------------------------------------------
+Output(s):
+timing of both paths and check of identical saccades
+-----------------------------------------------------------------------------------------
+To run:
+cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
+python behav_analysis/bench_sac_kernel.py
+-----------------------------------------------------------------------------------------
+"""
+
+# Stop warnings
+# -------------
+import warnings
+warnings.filterwarnings("ignore")
+
+# General imports
+# ---------------
+import sys
+import json
+import time
+import numpy as np
+
+# Specific imports
+# ----------------
+import sac_utils
+from sac_utils import detect_saccades
+
+# Get inputs
+# ----------
+if len(sys.argv) > 1: num_trials = int(sys.argv[1])
+else: num_trials = 576
+
+# Define analysis parameters
+# --------------------------
+with open('behavior_settings.json') as f:
+	json_s = f.read()
+	analysis_info = json.loads(json_s)
+sampling_rate = analysis_info['sampling_rate']
+velocity_th = analysis_info['velocity_th']
+min_dur = analysis_info['min_dur']
+merge_interval = analysis_info['merge_interval']
+
+# Synthetic session
+# -----------------
+# 1.2 s trials of fixation noise with two 40 ms saccades (float32 as in the h5 files)
+rng = np.random.default_rng(0)
+trial_samples = int(1.2*sampling_rate)
+trials_xy = []
+for trial in np.arange(0,num_trials,1):
+	x = np.cumsum(rng.normal(0, 0.005, trial_samples))
+	y = np.cumsum(rng.normal(0, 0.005, trial_samples))
+	for sac_onset in rng.integers(100, trial_samples-100, 2):
+		sac_amp = rng.uniform(1, 10, 2)*rng.choice([-1,1], 2)
+		sac_prof = (1-np.cos(np.linspace(0, np.pi, 40)))/2
+		x[sac_onset:sac_onset+40] += sac_prof*sac_amp[0]
+		x[sac_onset+40:] += sac_amp[0]
+		y[sac_onset:sac_onset+40] += sac_prof*sac_amp[1]
+		y[sac_onset+40:] += sac_amp[1]
+	trials_xy.append((x.astype('float32'), y.astype('float32')))
+
+# Numpy path
+# ----------
+t_start = time.time()
+sac_numpy = [detect_saccades(x,y,sampling_rate,velocity_th,min_dur,merge_interval,use_kernel = False) for x,y in trials_xy]
+dur_numpy = time.time() - t_start
+
+# Numba kernel
+# ------------
+print('samples: {}, trials: {}'.format(num_trials*trial_samples, num_trials))
+print('vecvel + microsacc_merge: {:.2f} s'.format(dur_numpy))
+if sac_utils.numba is None:
+	print('numba not installed, kernel not compiled')
+	sys.exit()
+
+detect_saccades(trials_xy[0][0],trials_xy[0][1],sampling_rate,velocity_th,min_dur,merge_interval)	# compilation
+t_start = time.time()
+sac_kernel = [detect_saccades(x,y,sampling_rate,velocity_th,min_dur,merge_interval) for x,y in trials_xy]
+dur_kernel = time.time() - t_start
+
+# Report
+# ------
+same_sac = np.all([np.array_equal(sac_n, sac_k) for sac_n, sac_k in zip(sac_numpy, sac_kernel)])
+print('numba kernel:             {:.2f} s ({:.1f}x faster)'.format(dur_kernel, dur_numpy/dur_kernel))
+print('saccades: {}, identical saccades: {}'.format(np.sum([sac.shape[0] for sac in sac_numpy]), same_sac))
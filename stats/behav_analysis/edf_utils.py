@@ -0,0 +1,540 @@
+import ctypes
+import ctypes.util
+import re
+import os
+import hashlib
+
+# EDF Access API item types (edf_data.h)
+NO_PENDING_ITEMS = 0
+STARTBLINK = 3
+ENDBLINK = 4
+STARTSACC = 5
+ENDSACC = 6
+STARTFIX = 7
+ENDFIX = 8
+MESSAGEEVENT = 24
+SAMPLE_TYPE = 200
+
+# FSAMPLE flags and missing value
+SAMPLE_LEFT = 0x8000
+SAMPLE_RIGHT = 0x4000
+MISSING_DATA = 1e8
+
+# version of the decoded arrays, increase when a reader or parser output changes
+PARSER_VERSION = 2
+
+# edf2asc message line: MSG <time> <text>
+MSG_PATTERN = re.compile(rb'MSG\s+(\d+)\s+(.*)')
+
+# runTrials.m messages (one "<time>\t<text>" line per message)
+EVENT_PATTERN = re.compile(r'^(\d+)\tsequence (\d+) (?:'
+                           r'trial (\d+) (onset|offset|saccade onset|2nd saccade onset|2nd onset|pursuit onset|pursuit offset) at'
+                           r'|(started|stopped) at'
+                           r'|event (mri_trigger) val = (\d+)'
+                           r'|- (\d+) (missed) sync)', re.M)
+EVENT_KINDS = ['sequence_start', 'sequence_stop', 'trial_onset', 'trial_offset',
+               'saccade_onset', 'saccade2_onset', 'trial2_onset',
+               'pursuit_onset', 'pursuit_offset', 'mri_trigger', 'missed_sync']
+EVENT_MSG_KINDS = {'started': 'sequence_start', 'stopped': 'sequence_stop',
+                   'onset': 'trial_onset', 'offset': 'trial_offset',
+                   'saccade onset': 'saccade_onset', '2nd saccade onset': 'saccade2_onset',
+                   '2nd onset': 'trial2_onset', 'pursuit onset': 'pursuit_onset',
+                   'pursuit offset': 'pursuit_offset', 'mri_trigger': 'mri_trigger',
+                   'missed': 'missed_sync'}
+EVENT_DTYPE = [('kind', 'u1'), ('run', 'u1'), ('sequence', 'i2'),
+               ('trial', 'i2'), ('time', 'i8'), ('value', 'i4')]
+
+# EyeLink online parsed events (EBLINK, ESACC, EFIX)
+EL_BLINK_DTYPE = [('run', 'u1'), ('start', 'i8'), ('end', 'i8')]
+EL_SACC_DTYPE = [('run', 'u1'), ('start', 'i8'), ('end', 'i8'),
+                 ('x_onset', 'f4'), ('y_onset', 'f4'), ('x_offset', 'f4'), ('y_offset', 'f4'),
+                 ('amp', 'f4'), ('vpeak', 'f4')]
+EL_FIX_DTYPE = [('run', 'u1'), ('start', 'i8'), ('end', 'i8'),
+                ('x', 'f4'), ('y', 'f4'), ('pupil', 'f4')]
+
+class FSAMPLE(ctypes.Structure):
+    _fields_ = [('time', ctypes.c_uint32),
+                ('px', ctypes.c_float*2), ('py', ctypes.c_float*2),
+                ('hx', ctypes.c_float*2), ('hy', ctypes.c_float*2),
+                ('pa', ctypes.c_float*2),
+                ('gx', ctypes.c_float*2), ('gy', ctypes.c_float*2),
+                ('rx', ctypes.c_float), ('ry', ctypes.c_float),
+                ('gxvel', ctypes.c_float*2), ('gyvel', ctypes.c_float*2),
+                ('hxvel', ctypes.c_float*2), ('hyvel', ctypes.c_float*2),
+                ('rxvel', ctypes.c_float*2), ('ryvel', ctypes.c_float*2),
+                ('fgxvel', ctypes.c_float*2), ('fgyvel', ctypes.c_float*2),
+                ('fhxvel', ctypes.c_float*2), ('fhyvel', ctypes.c_float*2),
+                ('frxvel', ctypes.c_float*2), ('fryvel', ctypes.c_float*2),
+                ('hdata', ctypes.c_int16*8),
+                ('flags', ctypes.c_uint16),
+                ('input', ctypes.c_uint16),
+                ('buttons', ctypes.c_uint16),
+                ('htype', ctypes.c_int16),
+                ('errors', ctypes.c_uint16)]
+
+class LSTRING(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_int16),
+                ('c', ctypes.c_char)]
+
+class FEVENT(ctypes.Structure):
+    _fields_ = [('time', ctypes.c_uint32),
+                ('type', ctypes.c_int16),
+                ('read', ctypes.c_uint16),
+                ('sttime', ctypes.c_uint32), ('entime', ctypes.c_uint32),
+                ('hstx', ctypes.c_float), ('hsty', ctypes.c_float),
+                ('gstx', ctypes.c_float), ('gsty', ctypes.c_float),
+                ('sta', ctypes.c_float),
+                ('henx', ctypes.c_float), ('heny', ctypes.c_float),
+                ('genx', ctypes.c_float), ('geny', ctypes.c_float),
+                ('ena', ctypes.c_float),
+                ('havx', ctypes.c_float), ('havy', ctypes.c_float),
+                ('gavx', ctypes.c_float), ('gavy', ctypes.c_float),
+                ('ava', ctypes.c_float),
+                ('avel', ctypes.c_float), ('pvel', ctypes.c_float),
+                ('svel', ctypes.c_float), ('evel', ctypes.c_float),
+                ('supd_x', ctypes.c_float), ('eupd_x', ctypes.c_float),
+                ('supd_y', ctypes.c_float), ('eupd_y', ctypes.c_float),
+                ('eye', ctypes.c_int16),
+                ('status', ctypes.c_uint16),
+                ('flags', ctypes.c_uint16),
+                ('input', ctypes.c_uint16),
+                ('buttons', ctypes.c_uint16),
+                ('parsedby', ctypes.c_uint16),
+                ('message', ctypes.POINTER(LSTRING))]
+
+def load_edfapi(edfapi_lib = None):
+    """
+    ----------------------------------------------------------------------
+    load_edfapi(edfapi_lib = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Load the SR Research EDF Access API shared library
+    ----------------------------------------------------------------------
+    Input(s) :
+    edfapi_lib: path of the edfapi library (None: search system paths)
+    ----------------------------------------------------------------------
+    Output(s) :
+    edfapi: ctypes library handle with typed functions
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if not edfapi_lib:
+        edfapi_lib = ctypes.util.find_library('edfapi64') or ctypes.util.find_library('edfapi')
+    if not edfapi_lib:
+        raise OSError('edfapi library not found, install the EyeLink Developers Kit or use "edf_reader": "edf2asc"')
+
+    edfapi = ctypes.CDLL(edfapi_lib)
+
+    edfapi.edf_open_file.restype = ctypes.c_void_p
+    edfapi.edf_open_file.argtypes = [ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+    edfapi.edf_close_file.restype = ctypes.c_int
+    edfapi.edf_close_file.argtypes = [ctypes.c_void_p]
+    edfapi.edf_get_next_data.restype = ctypes.c_int
+    edfapi.edf_get_next_data.argtypes = [ctypes.c_void_p]
+    edfapi.edf_get_float_data.restype = ctypes.c_void_p
+    edfapi.edf_get_float_data.argtypes = [ctypes.c_void_p]
+    edfapi.edf_get_element_count.restype = ctypes.c_uint
+    edfapi.edf_get_element_count.argtypes = [ctypes.c_void_p]
+
+    return edfapi
+
+def read_edf(edf_filename, edfapi_lib = None):
+    """
+    ----------------------------------------------------------------------
+    read_edf(edf_filename, edfapi_lib = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Decode samples and messages of an EyeLink edf file in process
+    (replaces the edf2asc conversion and text parsing)
+    ----------------------------------------------------------------------
+    Input(s) :
+    edf_filename: edf file path
+    edfapi_lib: path of the edfapi library (None: search system paths)
+    ----------------------------------------------------------------------
+    Output(s) :
+    edf_data['time']: sample time stamps (ms)
+    edf_data['x']: gaze horizontal coordinate (pixels, -1 if missing)
+    edf_data['y']: gaze vertical coordinate (pixels, -1 if missing)
+    edf_data['pupil']: pupil size (-1 if missing)
+    edf_data['msg_time']: message time stamps (ms)
+    edf_data['msg_text']: message texts
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    edfapi = load_edfapi(edfapi_lib)
+
+    errval = ctypes.c_int(0)
+    edf = edfapi.edf_open_file(edf_filename.encode(), 0, 1, 1, ctypes.byref(errval))
+    if not edf or errval.value:
+        raise IOError('cannot open {} (edfapi error {})'.format(edf_filename, errval.value))
+
+    # copy raw sample structures in a preallocated buffer
+    num_items = edfapi.edf_get_element_count(edf)
+    sample_size = ctypes.sizeof(FSAMPLE)
+    samples = np.empty(num_items, dtype = np.dtype(FSAMPLE))
+    samples_ptr = samples.ctypes.data
+    num_samples = 0
+    msg_time, msg_text = [], []
+    el_blinks, el_saccs, el_fixs = [], [], []
+
+    item_type = edfapi.edf_get_next_data(edf)
+    while item_type != NO_PENDING_ITEMS:
+        if item_type == SAMPLE_TYPE:
+            ctypes.memmove(samples_ptr + num_samples*sample_size, edfapi.edf_get_float_data(edf), sample_size)
+            num_samples += 1
+
+        elif item_type == MESSAGEEVENT:
+            event = ctypes.cast(edfapi.edf_get_float_data(edf), ctypes.POINTER(FEVENT)).contents
+            if event.message:
+                message = event.message.contents
+                text = ctypes.string_at(ctypes.addressof(message) + LSTRING.c.offset, message.len)
+                msg_time.append(event.sttime)
+                msg_text.append(text.split(b'\0')[0].decode('ascii', 'replace').strip())
+
+        elif item_type in (ENDBLINK, ENDSACC, ENDFIX):
+            event = ctypes.cast(edfapi.edf_get_float_data(edf), ctypes.POINTER(FEVENT)).contents
+            if item_type == ENDBLINK:
+                el_blinks.append((event.eye, event.sttime, event.entime))
+            elif item_type == ENDSACC:
+                # amplitude in degrees from the start/end resolution, as in edf2asc
+                res_x, res_y = (event.supd_x + event.eupd_x)/2.0, (event.supd_y + event.eupd_y)/2.0
+                amp = ((event.genx - event.gstx)/res_x)**2 + ((event.geny - event.gsty)/res_y)**2 if res_x and res_y else float('nan')
+                el_saccs.append((event.eye, event.sttime, event.entime, event.gstx, event.gsty,
+                                 event.genx, event.geny, amp**0.5, event.pvel))
+            else:
+                el_fixs.append((event.eye, event.sttime, event.entime, event.gavx, event.gavy, event.ava))
+
+        item_type = edfapi.edf_get_next_data(edf)
+
+    edfapi.edf_close_file(edf)
+    samples = samples[:num_samples]
+
+    # recorded eye (left first, as in edf2asc sample output)
+    eye = np.where(samples['flags'] & SAMPLE_LEFT, 0, 1)
+    idx = np.arange(num_samples)
+    x = samples['gx'][idx, eye].astype('float64')
+    y = samples['gy'][idx, eye].astype('float64')
+    pupil = samples['pa'][idx, eye].astype('float64')
+
+    # missing data as in edf2asc -miss -1.0
+    missing = np.logical_or(np.abs(x) >= MISSING_DATA, np.abs(y) >= MISSING_DATA)
+    missing = np.logical_or(missing, np.logical_or(np.isnan(x), np.isnan(y)))
+    x[missing], y[missing], pupil[missing] = -1.0, -1.0, -1.0
+
+    edf_data = {'time': samples['time'].astype('int64'),
+                'x': x,
+                'y': y,
+                'pupil': pupil,
+                'msg_time': np.array(msg_time, dtype = 'int64'),
+                'msg_text': np.array(msg_text, dtype = 'U')}
+    edf_data.update(el_event_arrays(el_blinks, el_saccs, el_fixs))
+
+    return edf_data
+
+def parse_asc(asc_filename, chunk_lines = 200000):
+    """
+    ----------------------------------------------------------------------
+    parse_asc(asc_filename, chunk_lines = 200000)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Parse samples and messages of an edf2asc output in a single pass
+    ----------------------------------------------------------------------
+    Input(s) :
+    asc_filename: asc file path (edf2asc with samples and events)
+    chunk_lines: number of lines read and converted at once
+    ----------------------------------------------------------------------
+    Output(s) :
+    edf_data: dictionary with the same keys as read_edf
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    sample_chunks = []
+    msg_time, msg_text = [], []
+    el_blinks, el_saccs, el_fixs = [], [], []
+    el_eyes = {b'L': 0, b'R': 1}
+
+    def to_float(value):
+        try: return float(value)
+        except ValueError: return np.nan
+
+    with open(asc_filename, 'rb') as ascfid:
+        while True:
+            lines = ascfid.readlines(chunk_lines*64)
+            if not lines:
+                break
+
+            # samples start with the time stamp digit
+            sample_lines = [line for line in lines if line[:1].isdigit()]
+            if sample_lines:
+                sample_chunk = np.empty((len(sample_lines), 4), dtype = 'float64')
+                try:
+                    sample_chunk[:] = np.loadtxt(sample_lines, usecols = (0, 1, 2, 3), ndmin = 2)
+                except ValueError:
+                    sample_chunk[:,:3] = np.loadtxt(sample_lines, usecols = (0, 1, 2), ndmin = 2)
+                    sample_chunk[:,3] = np.nan
+                sample_chunks.append(sample_chunk)
+
+            # messages and EyeLink end events
+            for line in lines:
+                if line[:3] == b'MSG':
+                    msg_match = MSG_PATTERN.match(line)
+                    if msg_match:
+                        msg_time.append(int(msg_match.group(1)))
+                        msg_text.append(msg_match.group(2).decode('ascii', 'replace').strip())
+
+                elif line[:1] == b'E':
+                    la = line.split()
+                    if la[0] == b'EBLINK':
+                        el_blinks.append((el_eyes[la[1]], int(la[2]), int(la[3])))
+                    elif la[0] == b'ESACC':
+                        el_saccs.append((el_eyes[la[1]], int(la[2]), int(la[3])) + tuple(to_float(val) for val in la[5:11]))
+                    elif la[0] == b'EFIX':
+                        el_fixs.append((el_eyes[la[1]], int(la[2]), int(la[3])) + tuple(to_float(val) for val in la[5:8]))
+
+    if sample_chunks:
+        samples = np.concatenate(sample_chunks, axis = 0)
+    else:
+        samples = np.zeros((0, 4))
+
+    edf_data = {'time': samples[:,0].astype('int64'),
+                'x': samples[:,1],
+                'y': samples[:,2],
+                'pupil': samples[:,3],
+                'msg_time': np.array(msg_time, dtype = 'int64'),
+                'msg_text': np.array(msg_text, dtype = 'U')}
+    edf_data.update(el_event_arrays(el_blinks, el_saccs, el_fixs))
+
+    return edf_data
+
+def el_event_arrays(el_blinks, el_saccs, el_fixs):
+    """
+    ----------------------------------------------------------------------
+    el_event_arrays(el_blinks, el_saccs, el_fixs)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Arrange EyeLink end events of the recorded eye in interval arrays
+    ----------------------------------------------------------------------
+    Input(s) :
+    el_blinks: list of (eye, start, end)
+    el_saccs: list of (eye, start, end, x_onset, y_onset, x_offset, y_offset, amp, vpeak)
+    el_fixs: list of (eye, start, end, x, y, pupil)
+    ----------------------------------------------------------------------
+    Output(s) :
+    el_events['blink_el']: blinks (EL_BLINK_DTYPE, run 0)
+    el_events['sacc_el']: saccades (EL_SACC_DTYPE, run 0)
+    el_events['fix_el']: fixations (EL_FIX_DTYPE, run 0)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    # left eye first, as for the samples
+    el_eye = 0 if any(event[0] == 0 for event in el_blinks + el_saccs + el_fixs) else 1
+
+    el_events = {}
+    for key, events, dtype in zip(['blink_el', 'sacc_el', 'fix_el'], [el_blinks, el_saccs, el_fixs],
+                                  [EL_BLINK_DTYPE, EL_SACC_DTYPE, EL_FIX_DTYPE]):
+        events = [event for event in events if event[0] == el_eye]
+        el_array = np.zeros(len(events), dtype = dtype)
+        if events:
+            el_cols = np.array(events, dtype = 'float64')
+            for col, name in enumerate(el_array.dtype.names[1:]):
+                el_array[name] = el_cols[:,col+1]
+        for name in el_array.dtype.names[3:]:
+            el_array[name][np.abs(el_array[name]) >= MISSING_DATA] = np.nan
+        el_events[key] = el_array
+
+    return el_events
+
+def read_edf2asc(edf_filename, edf2asc_cmd = 'edf2asc'):
+    """
+    ----------------------------------------------------------------------
+    read_edf2asc(edf_filename, edf2asc_cmd = 'edf2asc')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Read samples and messages of an EyeLink edf file through a single
+    edf2asc conversion (fallback when edfapi is not available)
+    ----------------------------------------------------------------------
+    Input(s) :
+    edf_filename: edf file path
+    edf2asc_cmd: edf2asc executable
+    ----------------------------------------------------------------------
+    Output(s) :
+    edf_data: dictionary with the same keys as read_edf
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import os
+
+    asc_filename = '{}.asc'.format(os.path.splitext(edf_filename)[0])
+
+    # samples and events in one conversion
+    os.system('{edf2asc_cmd} {edf_filename} -miss -1.0 -y'.format(edf2asc_cmd = edf2asc_cmd, edf_filename = edf_filename))
+    edf_data = parse_asc(asc_filename)
+    os.remove(asc_filename)
+
+    return edf_data
+
+def msg_event_table(msg_time, msg_text, run = 0):
+    """
+    ----------------------------------------------------------------------
+    msg_event_table(msg_time, msg_text, run = 0)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Build the event table of all runTrials.m messages of a run
+    ----------------------------------------------------------------------
+    Input(s) :
+    msg_time: message time stamps (ms)
+    msg_text: message texts
+    run: run number (0 = first)
+    ----------------------------------------------------------------------
+    Output(s) :
+    events: structured array (EVENT_DTYPE) sorted by time with
+        events['kind']: event type (index in EVENT_KINDS)
+        events['run']: run number (0 = first)
+        events['sequence']: sequence number (0 = first)
+        events['trial']: trial number in sequence (0 = first, -1 if none)
+        events['time']: time stamp (ms)
+        events['value']: mri_trigger value or missed sync frames (-1 if none)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    msg_lines = np.char.add(np.char.add(np.asarray(msg_time).astype('U'), '\t'), np.asarray(msg_text, dtype = 'U'))
+    msg_match = np.array(EVENT_PATTERN.findall('\n'.join(msg_lines)), dtype = 'U').reshape(-1, 9)
+
+    # groups: time, sequence, trial, trial kind, sequence kind, mri, value, missed frames, missed
+    msg_kind = np.char.add(np.char.add(msg_match[:,3], msg_match[:,4]), np.char.add(msg_match[:,5], msg_match[:,8]))
+    msg_value = np.char.add(msg_match[:,6], msg_match[:,7])
+    kind_lookup = {msg_kind: EVENT_KINDS.index(kind) for msg_kind, kind in EVENT_MSG_KINDS.items()}
+
+    events = np.zeros(msg_match.shape[0], dtype = EVENT_DTYPE)
+    events['kind'] = [kind_lookup[kind] for kind in msg_kind]
+    events['run'] = run
+    events['sequence'] = msg_match[:,1].astype('int16') - 1
+    events['trial'] = np.where(msg_match[:,2] == '', '0', msg_match[:,2]).astype('int16') - 1
+    events['time'] = msg_match[:,0].astype('int64')
+    events['value'] = np.where(msg_value == '', '-1', msg_value).astype('int32')
+
+    return events[np.argsort(events['time'], kind = 'stable')]
+
+def select_events(events, kind, run = None, sequence = None, trial = None):
+    """
+    ----------------------------------------------------------------------
+    select_events(events, kind, run = None, sequence = None, trial = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Select rows of an event table
+    ----------------------------------------------------------------------
+    Input(s) :
+    events: event table (from msg_event_table)
+    kind: event type name (see EVENT_KINDS)
+    run: run number (None = all)
+    sequence: sequence number (None = all)
+    trial: trial number (None = all)
+    ----------------------------------------------------------------------
+    Output(s) :
+    events_sel: selected rows of the event table
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    sel = events['kind'] == EVENT_KINDS.index(kind)
+    if run is not None: sel &= events['run'] == run
+    if sequence is not None: sel &= events['sequence'] == sequence
+    if trial is not None: sel &= events['trial'] == trial
+
+    return events[sel]
+
+def edf_hash(edf_filename, block_size = 1<<20):
+    """
+    ----------------------------------------------------------------------
+    edf_hash(edf_filename, block_size = 1<<20)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Compute the content hash of an edf file
+    ----------------------------------------------------------------------
+    Input(s) :
+    edf_filename: edf file path
+    block_size: read block size (bytes)
+    ----------------------------------------------------------------------
+    Output(s) :
+    hash_txt: sha1 hexadecimal digest
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    edf_sha1 = hashlib.sha1()
+    with open(edf_filename, 'rb') as edffid:
+        for block in iter(lambda: edffid.read(block_size), b''):
+            edf_sha1.update(block)
+
+    return edf_sha1.hexdigest()
+
+def load_edf_data(edf_filename, edf_reader = 'edfapi', edfapi_lib = None, edf2asc_cmd = 'edf2asc', cache_dir = None):
+    """
+    ----------------------------------------------------------------------
+    load_edf_data(edf_filename, edf_reader = 'edfapi', edfapi_lib = None,
+                  edf2asc_cmd = 'edf2asc', cache_dir = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Decode an edf file and its message events, reusing the arrays saved in
+    the cache directory when the edf content, reader and parser version
+    did not change
+    ----------------------------------------------------------------------
+    Input(s) :
+    edf_filename: edf file path
+    edf_reader: 'edfapi' (read_edf) or 'edf2asc' (read_edf2asc)
+    edfapi_lib: path of the edfapi library (None: search system paths)
+    edf2asc_cmd: edf2asc executable
+    cache_dir: cache directory (None or '' = no cache)
+    ----------------------------------------------------------------------
+    Output(s) :
+    edf_data: dictionary with the keys of read_edf
+    events: message event table (from msg_event_table, run 0)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    if cache_dir:
+        cache_filename = '{cache_dir}/{name}_{hash}_{reader}_v{version}.npz'.format(
+                                cache_dir = cache_dir,
+                                name = os.path.splitext(os.path.basename(edf_filename))[0],
+                                hash = edf_hash(edf_filename),
+                                reader = edf_reader,
+                                version = PARSER_VERSION)
+
+        if os.path.exists(cache_filename):
+            with np.load(cache_filename) as cache_file:
+                edf_data = {key: cache_file[key] for key in cache_file.files if key != 'events'}
+                events = cache_file['events']
+            return edf_data, events
+
+    if edf_reader == 'edfapi':
+        edf_data = read_edf(edf_filename, edfapi_lib)
+    else:
+        edf_data = read_edf2asc(edf_filename, edf2asc_cmd)
+    events = msg_event_table(edf_data['msg_time'], edf_data['msg_text'])
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok = True)
+        tmp_filename = '{}.{}.tmp.npz'.format(cache_filename[:-4], os.getpid())
+        np.savez(tmp_filename, events = events, **edf_data)
+        os.replace(tmp_filename, cache_filename)
+
+    return edf_data, events
@@ -6,8 +6,8 @@ Goal of the script:
 Extract eye traces from edf file and arrange them well for later treatment
 -----------------------------------------------------------------------------------------
 Input(s):
-sys.argv[1]: subject number (sub-01)
-sys.argv[2]: task (EyeMov)
+sys.argv[1]: subject number (sub-01) or all (batch mode)
+sys.argv[2]: task (EyeMov) or number of workers in batch mode (optional)
 -----------------------------------------------------------------------------------------
 Output(s):
 h5 files with loads of data on eye traces across runs
@@ -15,6 +15,8 @@ h5 files with loads of data on eye traces across runs
 To run:
 cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
 python behav_analysis/extract_eyetraces.py sub-01 EyeMov
+or to extract every data/sub-*/ses-*/func/*_eyeData.edf with a pool of 8 workers:
+python behav_analysis/extract_eyetraces.py all 8
 -----------------------------------------------------------------------------------------
 """
 
@@ -29,6 +31,8 @@ import os
 import sys
 import platform
 import re
+import glob
+import multiprocessing
 import numpy as np
 import ipdb
 import json
@@ -36,10 +40,10 @@ import h5py
 import scipy.io
 deb = ipdb.set_trace
 
-# Get inputs
-# ----------
-subject = sys.argv[1]
-task = sys.argv[2]
+# Specific imports
+# ----------------
+from edf_utils import load_edf_data, select_events, EVENT_KINDS
+from h5_utils import write_run, make_trial_index, write_trial_index, FLAG_BLINK
 
 # Define analysis parameters
 # --------------------------
@@ -51,213 +55,284 @@ with open('behavior_settings.json') as f:
 # ----------------
 if platform.system() == 'Darwin':
 	main_dir = analysis_info['main_dir_mac']
-	edf2asc_dir = analysis_info['edf2asc_dir_mac']
-	end_file = ''
+	edf2asc_cmd = '{}/edf2asc'.format(analysis_info['edf2asc_dir_mac'])
+	edfapi_lib = analysis_info['edfapi_lib_mac']
 
 elif platform.system() == 'Windows':
 	main_dir = analysis_info['main_dir_pc']
-	edf2asc_dir = analysis_info['edf2asc_dir_win']
-	end_file ='.exe'
+	edf2asc_cmd = '{}/edf2asc.exe'.format(analysis_info['edf2asc_dir_win'])
+	edfapi_lib = analysis_info['edfapi_lib_win']
 
 elif platform.system() == 'Linux':
-    main_dir = analysis_info['main_dir_unix']
+	main_dir = analysis_info['main_dir_unix']
+	edf2asc_cmd = 'edf2asc'
+	edfapi_lib = analysis_info['edfapi_lib_unix']
 
-# Define file list
-# ----------------
-file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
-list_filename = ['{sub}_task-{task}_run-01'.format(sub = subject, task = task),
-				 '{sub}_task-{task}_run-02'.format(sub = subject, task = task),]
+# edf decoding: 'edfapi' (in process) or 'edf2asc' (text conversion)
+edf_reader = analysis_info['edf_reader']
 
+# blink detection: 'samples' (-1 samples) or 'eyelink' (EBLINK events)
+blink_source = analysis_info['blink_source']
+
+# decoded edf cache (empty = no cache)
+if analysis_info['cache_dir']:
+	cache_dir = '{exp_dir}/{cache_dir}'.format(exp_dir = main_dir, cache_dir = analysis_info['cache_dir'])
+else:
+	cache_dir = None
 
 # Define experiments details
 # --------------------------
-num_run = analysis_info['num_run']
 num_seq = analysis_info['num_seq']
 seq_trs = analysis_info['seq_trs']
-eye_mov_seq = analysis_info['eye_mov_seq']
-rads = analysis_info['rads']
-pursuits_tr = np.arange(0,seq_trs,2)
-saccades_tr = np.arange(1,seq_trs,2)
-
 
 # Exctract data
 # -------------
-eye_data_runs = [];
-time_last_run_eye   =   0;
-time_start_eye = np.zeros((1,num_run))
-time_end_eye = np.zeros((1,num_run))
-time_start_seq = np.zeros((num_seq,num_run))
-time_end_seq = np.zeros((num_seq,num_run))
-time_start_trial = np.zeros((seq_trs,num_seq,num_run))
-time_end_trial = np.zeros((seq_trs,num_seq,num_run))
-for t_run in np.arange(0,num_run,1):
-
-	edf_filename = '{file_dir}/func/{filename}_eyeData'.format(file_dir = file_dir,filename = list_filename[t_run])
-	mat_filename = '{file_dir}/add/{filename}_matFile.mat'.format(file_dir = file_dir,filename = list_filename[t_run])
-
-	# get .msg and .dat file
-	if not os.path.exists('{}.msg'.format(edf_filename)):
-		if platform.system() == 'Linux':
-			os.system('edf2asc {edf_filename}.edf -e -y'.format(edf_filename = edf_filename))
+def extract_eyetraces(edf_filenames, mat_filename, h5_filename):
+	"""
+	----------------------------------------------------------------------
+	extract_eyetraces(edf_filenames, mat_filename, h5_filename)
+	----------------------------------------------------------------------
+	Goal of the function :
+	Extract eye traces of all runs of a subject and task
+	----------------------------------------------------------------------
+	Input(s) :
+	edf_filenames: edf files sorted by run
+	mat_filename: mat file of the task (screen settings, amplitude sequence)
+	h5_filename: output h5 file
+	----------------------------------------------------------------------
+	Output(s) :
+	h5_filename: output h5 file
+	----------------------------------------------------------------------
+	"""
+	num_run = len(edf_filenames)
+	eye_data_runs = [];
+	events_runs = [];
+	el_runs = {'blink_el': [], 'sacc_el': [], 'fix_el': []}
+	time_last_run_eye   =   0;
+	time_start_eye = np.zeros((1,num_run), dtype = 'int64')
+	time_end_eye = np.zeros((1,num_run), dtype = 'int64')
+	time_start_seq = np.zeros((num_seq,num_run), dtype = 'int64')
+	time_end_seq = np.zeros((num_seq,num_run), dtype = 'int64')
+	time_start_trial = np.zeros((seq_trs,num_seq,num_run), dtype = 'int64')
+	time_end_trial = np.zeros((seq_trs,num_seq,num_run), dtype = 'int64')
+	for t_run in np.arange(0,num_run,1):
+
+		edf_filename = edf_filenames[t_run]
+
+		# decode edf file and message events (cached)
+		edf_data, events_run = load_edf_data(edf_filename, edf_reader, edfapi_lib, edf2asc_cmd, cache_dir)
+		events_run['run'] = t_run
+		events_runs.append(events_run)
+
+		# get first and last time of each run
+		seq_start = select_events(events_run, 'sequence_start')
+		seq_stop = select_events(events_run, 'sequence_stop')
+		trial_onset = select_events(events_run, 'trial_onset')
+		trial_offset = select_events(events_run, 'trial_offset')
+
+		time_start_eye[0,t_run] = seq_start['time'][seq_start['sequence'] == 0][0]
+		time_end_eye[0,t_run] = seq_stop['time'][seq_stop['sequence'] == num_seq-1][0]
+		time_start_seq[seq_start['sequence'],t_run] = seq_start['time']
+		time_end_seq[seq_stop['sequence'],t_run] = seq_stop['time']
+		time_start_trial[trial_onset['trial'],trial_onset['sequence'],t_run] = trial_onset['time']
+		time_end_trial[trial_offset['trial'],trial_offset['sequence'],t_run] = trial_offset['time']
+
+		# eye coord data
+		eye_dat = np.column_stack((edf_data['time'],edf_data['x'],edf_data['y']))
+		eye_data_run = eye_dat[np.logical_and(eye_dat[:,0]>=time_start_eye[0,t_run],eye_dat[:,0]<=time_end_eye[0,t_run])]
+
+		# add run number
+		eye_data_run = np.concatenate((eye_data_run,np.ones((eye_data_run.shape[0],1))*(t_run)),axis = 1)
+		# col 0 = time
+		# col 2 = eye x coord
+		# col 3 = eye y coord
+		# col 4 = run number
+
+		# EyeLink parsed events of the run
+		for el_key in el_runs.keys():
+			el_run = edf_data[el_key][np.logical_and(edf_data[el_key]['start']>=time_start_eye[0,t_run],edf_data[el_key]['start']<=time_end_eye[0,t_run])]
+			el_run['run'] = t_run
+			el_runs[el_key].append(el_run)
+
+		if t_run == 0:
+			eye_data_runs = eye_data_run
 		else:
-			os.system('{edf2asc_dir}/edf2asc{end_file} {edf_filename}.edf -e -y'.format(edf2asc_dir = edf2asc_dir,
-																			   end_file = end_file,
-																			   edf_filename = edf_filename))
-		os.rename('{}.asc'.format(edf_filename),'{}.msg'.format(edf_filename))
-
-	if not os.path.exists('{}.dat'.format(edf_filename)):
-		if platform.system() == 'Linux':
-			os.system('edf2asc {edf_filename}.edf -s -miss -1.0 -y'.format(edf_filename = edf_filename))
-		else:
-			os.system('{edf2asc_dir}/edf2asc{end_file} {edf_filename}.edf -s -miss -1.0 -y'.format( edf2asc_dir = edf2asc_dir,
-																						  end_file = end_file,
-																						  edf_filename = edf_filename))
-		os.rename('{}.asc'.format(edf_filename),'{}.dat'.format(edf_filename))
-
-	# get first and last time pf each run
-	msgfid = open('{}.msg'.format(edf_filename))
-	first_last_time = False
-	first_time = False
-	last_time = False
-	seq_num = 0
-	while not first_last_time:
-		line_read = msgfid.readline()
-		if not line_read == '':
-			la = line_read.split()
-
-
-		if re.search(r"MSG", line_read):
-			if line_read.find('sequence 1 started') != -1 and not first_time:
-				time_start_eye[0,t_run] = float(la[1])
-				print('first time true')
-				first_time = True
-
-			if line_read.find('sequence 9 stopped') != -1 and not last_time:
-				time_end_eye[0,t_run] = float(la[1])
-				print('last time true')
-				last_time = True
-
-			if re.search(r"sequence\s\d+\sstarted", line_read):
-				time_start_seq[seq_num,t_run] = float(la[1])
-				trial_num = 0
-
-			if re.search(r"sequence\s\d+\sstopped", line_read):
-				time_end_seq[seq_num,t_run] = float(la[1])
-				print('seq {} finished'.format(seq_num))
-				seq_num += 1
-
-			if re.search(r"trial\s\d+\sonset", line_read):
-				time_start_trial[trial_num,seq_num,t_run] = float(la[1])
-
-			if re.search(r"trial\s\d+\soffset", line_read):
-				time_end_trial[trial_num,seq_num,t_run] = float(la[1])
-				trial_num += 1
-
-		if first_time == True and last_time == True:
-			first_last_time = True
-			msgfid.close();
-
-
-	# load eye coord data
-	eye_dat = np.genfromtxt('{}.dat'.format(edf_filename),usecols=(0, 1, 2))
-	eye_data_run = eye_dat[np.logical_and(eye_dat[:,0]>=time_start_eye[0,t_run],eye_dat[:,0]<=time_end_eye[0,t_run])]
-
-	# add run number
-	eye_data_run = np.concatenate((eye_data_run,np.ones((eye_data_run.shape[0],1))*(t_run)),axis = 1)
-	# col 0 = time
-	# col 2 = eye x coord
-	# col 3 = eye y coord
-	# col 4 = run number
-
-	if t_run == 0:
-		eye_data_runs = eye_data_run
+			eye_data_runs = np.concatenate((eye_data_runs,eye_data_run), axis=0)
+
+	# Put nan for blink time
+	for el_key in el_runs.keys():
+		el_runs[el_key] = np.concatenate(el_runs[el_key])
+	if blink_source == 'eyelink':
+		# EyeLink EBLINK events (first to last missing sample), no sample scan
+		blink_onset_offset = np.column_stack((el_runs['blink_el']['start'],el_runs['blink_el']['end'])).astype('float64')
 	else:
-		eye_data_runs = np.concatenate((eye_data_runs,eye_data_run), axis=0)
-
-	# remove msg and dat
-	os.remove('{}.msg'.format(edf_filename))
-	os.remove('{}.dat'.format(edf_filename))
-
-# Put nan for blink time
-blinkNum = 0;
-blink_start = False;
-for tTime in np.arange(0,eye_data_runs.shape[0],1):
-
-	if not blink_start:
-		if eye_data_runs[tTime,1] == -1:
-
-			blinkNum += 1
-			timeBlinkOnset = eye_data_runs[tTime,0]
-			blink_start = True
-			if blinkNum == 1:
-				blink_onset_offset = np.matrix([timeBlinkOnset,np.nan])
-			else:
-				blink_onset_offset = np.vstack((blink_onset_offset,[timeBlinkOnset,np.nan]))
-
-	if blink_start:
-		if eye_data_runs[tTime,1] != -1:
-			timeBlinkOffset = eye_data_runs[tTime,0]
-			blink_start = 0
-			blink_onset_offset[blinkNum-1,1] = timeBlinkOffset
-
-# nan record around detected blinks
-eye_data_runs_nan_blink = np.copy(eye_data_runs)
-
-for tBlink in np.arange(0,blinkNum,1):
-
-	blink_onset_offset[tBlink,0] = blink_onset_offset[tBlink,0]
-	blink_onset_offset[tBlink,1] = blink_onset_offset[tBlink,1]
-
-	eye_data_runs_nan_blink[np.logical_and(eye_data_runs_nan_blink[:,0] >= blink_onset_offset[tBlink,0],eye_data_runs_nan_blink[:,0] <= blink_onset_offset[tBlink,1]),1] = np.nan
-	eye_data_runs_nan_blink[np.logical_and(eye_data_runs_nan_blink[:,0] >= blink_onset_offset[tBlink,0],eye_data_runs_nan_blink[:,0] <= blink_onset_offset[tBlink,1]),2] = np.nan
-
-# put eye coordinates in deg from center (flip y axis)
-matfile = scipy.io.loadmat(mat_filename)
-scr_sizeX = matfile['config']['scr'][0,0]['scr_sizeX'][0][0][0][0]
-scr_sizeY = matfile['config']['scr'][0,0]['scr_sizeY'][0][0][0][0]
-screen_size = np.array([scr_sizeX,scr_sizeY])
-ppd = matfile['config']['const'][0,0]['ppd'][0][0][0][0]
-
-
-eye_data_runs[:,1] = (eye_data_runs[:,1] - (screen_size[0]/2))/ppd;
-eye_data_runs[:,2] = -1.0*((eye_data_runs[:,2] - (screen_size[1]/2))/ppd);
-eye_data_runs_nan_blink[:,1] = (eye_data_runs_nan_blink[:,1] - (screen_size[0]/2))/ppd;
-eye_data_runs_nan_blink[:,2] = -1.0*((eye_data_runs_nan_blink[:,2] - (screen_size[1]/2))/ppd);
-amp_sequence = matfile['config']['expDes'][0,0]['amp_sequence'][0][0]
-
-
-# Save all
-# --------
-h5_file = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
-folder_alias = 'eye_traces'
-
-try: os.system('rm {h5_file}'.format(h5_file = h5_file))
-except: pass
-
-h5file = h5py.File(h5_file, "a")
-try:h5file.create_group(folder_alias)
-except:None
-
-h5file.create_dataset(  '{folder_alias}/eye_data_runs'.format(folder_alias = folder_alias),
-                        data = eye_data_runs,dtype ='float32')
-h5file.create_dataset(  '{folder_alias}/eye_data_runs_nan_blink'.format(folder_alias = folder_alias),
-                        data = eye_data_runs_nan_blink,dtype ='float32')
-
-h5file.create_dataset(  '{folder_alias}/time_start_eye'.format(folder_alias = folder_alias),
-                        data = time_start_eye,dtype ='float32')
-h5file.create_dataset(  '{folder_alias}/time_end_eye'.format(folder_alias = folder_alias),
-                        data = time_end_eye,dtype ='float32')
-
-h5file.create_dataset(  '{folder_alias}/time_start_seq'.format(folder_alias = folder_alias),
-                        data = time_start_seq,dtype ='float32')
-h5file.create_dataset(  '{folder_alias}/time_end_seq'.format(folder_alias = folder_alias),
-                        data = time_end_seq,dtype ='float32')
-
-h5file.create_dataset(  '{folder_alias}/time_start_trial'.format(folder_alias = folder_alias),
-                        data = time_start_trial,dtype ='float32')
-h5file.create_dataset(  '{folder_alias}/time_end_trial'.format(folder_alias = folder_alias),
-                        data = time_end_trial,dtype ='float32')
-
-h5file.create_dataset(  '{folder_alias}/amp_sequence'.format(folder_alias = folder_alias),
-                        data = amp_sequence,dtype ='float32')
+		# blink onset = first -1 sample, offset = first valid sample after it
+		blink_logic = (eye_data_runs[:,1] == -1).astype('int8')
+		blink_edges = np.diff(np.concatenate(([0], blink_logic, [0])))
+		blink_onset_idx = np.flatnonzero(blink_edges == 1)
+		blink_offset_idx = np.flatnonzero(blink_edges == -1)
+		blink_onset_offset = np.column_stack((eye_data_runs[blink_onset_idx,0],
+		                                      np.append(eye_data_runs[:,0],np.nan)[blink_offset_idx]))
+
+	# flag samples around detected blinks (offset sample included, blink still open at the end of the data is kept)
+	blink_closed = ~np.isnan(blink_onset_offset[:,1])
+	blink_start_idx = np.searchsorted(eye_data_runs[:,0], blink_onset_offset[blink_closed,0], side = 'left')
+	blink_end_idx = np.searchsorted(eye_data_runs[:,0], blink_onset_offset[blink_closed,1], side = 'right')
+	blink_mask = np.zeros(eye_data_runs.shape[0]+1, dtype = 'int32')
+	np.add.at(blink_mask, blink_start_idx, 1)
+	np.add.at(blink_mask, blink_end_idx, -1)
+	blink_mask = np.cumsum(blink_mask[:-1]) > 0
+	flags = blink_mask.astype('uint8')*FLAG_BLINK
+
+	# recorded samples (not lost by the tracker)
+	valid_logic = eye_data_runs[:,1] != -1
+
+	# put eye coordinates in deg from center (flip y axis)
+	matfile = scipy.io.loadmat(mat_filename)
+	scr_sizeX = matfile['config']['scr'][0,0]['scr_sizeX'][0][0][0][0]
+	scr_sizeY = matfile['config']['scr'][0,0]['scr_sizeY'][0][0][0][0]
+	screen_size = np.array([scr_sizeX,scr_sizeY])
+	ppd = matfile['config']['const'][0,0]['ppd'][0][0][0][0]
+
+
+	eye_data_runs[:,1] = (eye_data_runs[:,1] - (screen_size[0]/2))/ppd;
+	eye_data_runs[:,2] = -1.0*((eye_data_runs[:,2] - (screen_size[1]/2))/ppd);
+	for x_col in ['x_onset', 'x_offset', 'x']:
+		for el_key in el_runs.keys():
+			if x_col in el_runs[el_key].dtype.names:
+				el_runs[el_key][x_col] = (el_runs[el_key][x_col] - (screen_size[0]/2))/ppd
+				y_col = x_col.replace('x','y')
+				el_runs[el_key][y_col] = -1.0*((el_runs[el_key][y_col] - (screen_size[1]/2))/ppd)
+	amp_sequence = matfile['config']['expDes'][0,0]['amp_sequence'][0][0]
+
+
+	# Save all
+	# --------
+	folder_alias = 'eye_traces'
+
+	try: os.remove(h5_filename)
+	except: pass
+
+	h5file = h5py.File(h5_filename, "a")
+	try:h5file.create_group(folder_alias)
+	except:None
+
+	# one chunked group of sample columns per run and trial offsets index
+	time_runs = []
+	for t_run in np.arange(0,num_run,1):
+		run_logic = eye_data_runs[:,3] == t_run
+		time_runs.append(eye_data_runs[run_logic,0])
+		write_run(h5file, t_run, {'time': eye_data_runs[run_logic,0].astype('int64'),
+		                             'x': eye_data_runs[run_logic,1].astype('float32'),
+		                             'y': eye_data_runs[run_logic,2].astype('float32'),
+		                             'flags': flags[run_logic],
+		                             'run': eye_data_runs[run_logic,3].astype('uint8'),
+		                             'valid': valid_logic[run_logic].astype('uint8')}, folder_alias)
+	write_trial_index(h5file, make_trial_index(time_runs, time_start_trial, time_end_trial), folder_alias)
+
+	h5file.create_dataset(  '{folder_alias}/time_start_eye'.format(folder_alias = folder_alias),
+	                        data = time_start_eye,dtype ='int64')
+	h5file.create_dataset(  '{folder_alias}/time_end_eye'.format(folder_alias = folder_alias),
+	                        data = time_end_eye,dtype ='int64')
+
+	h5file.create_dataset(  '{folder_alias}/time_start_seq'.format(folder_alias = folder_alias),
+	                        data = time_start_seq,dtype ='int64')
+	h5file.create_dataset(  '{folder_alias}/time_end_seq'.format(folder_alias = folder_alias),
+	                        data = time_end_seq,dtype ='int64')
+
+	h5file.create_dataset(  '{folder_alias}/time_start_trial'.format(folder_alias = folder_alias),
+	                        data = time_start_trial,dtype ='int64')
+	h5file.create_dataset(  '{folder_alias}/time_end_trial'.format(folder_alias = folder_alias),
+	                        data = time_end_trial,dtype ='int64')
+
+	h5file.create_dataset(  '{folder_alias}/amp_sequence'.format(folder_alias = folder_alias),
+	                        data = amp_sequence,dtype ='float32')
+
+	# message event table (one dataset per column)
+	events_runs = np.concatenate(events_runs)
+	for column in events_runs.dtype.names:
+		h5file.create_dataset(  '{folder_alias}/events/{column}'.format(folder_alias = folder_alias, column = column),
+		                        data = events_runs[column])
+	h5file['{folder_alias}/events'.format(folder_alias = folder_alias)].attrs['kinds'] = EVENT_KINDS
+
+	# EyeLink parsed events intervals (coordinates in dva, amplitude in deg, peak velocity in deg/s)
+	for el_key, el_alias in zip(['blink_el', 'sacc_el', 'fix_el'], ['eyelink_blinks', 'eyelink_saccades', 'eyelink_fixations']):
+		for column in el_runs[el_key].dtype.names:
+			h5file.create_dataset(  '{folder_alias}/{el_alias}/{column}'.format(folder_alias = folder_alias, el_alias = el_alias, column = column),
+			                        data = el_runs[el_key][column])
+	h5file.close()
+
+	return h5_filename
+
+def extract_job(job):
+	"""
+	----------------------------------------------------------------------
+	extract_job(job)
+	----------------------------------------------------------------------
+	Goal of the function :
+	Batch mode job: extract_eyetraces of one subject and task, its error
+	reported instead of aborting the other jobs of the pool
+	----------------------------------------------------------------------
+	Input(s) :
+	job: [edf_filenames, mat_filename, h5_filename]
+	----------------------------------------------------------------------
+	Output(s) :
+	h5_filename: output h5 file
+	error: exception message (None if saved)
+	----------------------------------------------------------------------
+	"""
+	edf_filenames, mat_filename, h5_filename = job
+	try:
+		extract_eyetraces(edf_filenames, mat_filename, h5_filename)
+	except Exception as error:
+		return h5_filename, '{}: {}'.format(type(error).__name__, error)
+	return h5_filename, None
+
+if __name__ == '__main__':
+
+	if sys.argv[1] != 'all':
+		# Single subject and task
+		# -----------------------
+		subject = sys.argv[1]
+		task = sys.argv[2]
+		file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
+		list_filename = ['{sub}_task-{task}_run-{run:02d}'.format(sub = subject, task = task, run = run+1) for run in np.arange(0,analysis_info['num_run'],1)]
+		edf_filenames = ['{file_dir}/func/{filename}_eyeData.edf'.format(file_dir = file_dir, filename = filename) for filename in list_filename]
+		mat_filename = '{file_dir}/add/{filename}_matFile.mat'.format(file_dir = file_dir, filename = list_filename[-1])
+		h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
+		extract_eyetraces(edf_filenames, mat_filename, h5_filename)
 
+	else:
+		# Batch mode: every subject, session and task of the data folder
+		# ---------------------------------------------------------------
+		if len(sys.argv) > 2: num_workers = int(sys.argv[2])
+		else: num_workers = analysis_info['num_workers']
+		if num_workers <= 0: num_workers = multiprocessing.cpu_count()
+
+		jobs = {}
+		for edf_filename in sorted(glob.glob('{exp_dir}/data/sub-*/ses-*/func/*_eyeData.edf'.format(exp_dir = main_dir))):
+			name_match = re.match(r'(sub-[^_]+)_(ses-[^_]+)_task-([^_]+)_run-(\d+)_eyeData\.edf', os.path.basename(edf_filename))
+			if not name_match: continue
+			subject, session, task, run = name_match.groups()
+			ses_dir = os.path.dirname(os.path.dirname(edf_filename))
+			mat_filename = '{ses_dir}/add/{sub}_{ses}_task-{task}_run-{run}_matFile.mat'.format(ses_dir = ses_dir, sub = subject, ses = session, task = task, run = run)
+			h5_filename = '{ses_dir}/add/{sub}_{ses}_task-{task}_eyedata.h5'.format(ses_dir = ses_dir, sub = subject, ses = session, task = task)
+			if h5_filename not in jobs: jobs[h5_filename] = [[], mat_filename, h5_filename]
+			jobs[h5_filename][0].append(edf_filename)
+			jobs[h5_filename][1] = mat_filename
+
+		print('{} subject/task files, {} workers'.format(len(jobs), num_workers))
+		# every file written independently, failures listed at the end
+		failed = []
+		with multiprocessing.Pool(num_workers) as pool:
+			for h5_filename, error in pool.imap_unordered(extract_job, jobs.values(), chunksize = 1):
+				if error is None:
+					print('saved {}'.format(h5_filename))
+				else:
+					print('failed {} ({})'.format(h5_filename, error))
+					failed.append((h5_filename, error))
+
+		print('{}/{} subject/task files saved'.format(len(jobs) - len(failed), len(jobs)))
+		for h5_filename, error in sorted(failed):
+			print('failed: {} ({})'.format(h5_filename, error))
+		if failed: sys.exit(1)
@@ -0,0 +1,121 @@
+"""
+-----------------------------------------------------------------------------------------
+extract_quality.py
+-----------------------------------------------------------------------------------------
+Goal of the script:
+Screen the eye tracking data quality of a subject (one pass over the samples of each
+run): track loss, blink rate, RMS sample to sample precision and accuracy during the
+fixation trials (target at screen center)
+-----------------------------------------------------------------------------------------
+Input(s):
+sys.argv[1]: subject number (sub-01)
+sys.argv[2]: task (EyeMov)
+-----------------------------------------------------------------------------------------
+Output(s):
+h5 tables quality/quality_trial, quality/quality_sequence and quality/quality_run
+(sequence and trial nan when summed over)
+quality[:,0]:	run number
+quality[:,1]:	sequence number
+quality[:,2]:	trial number
+quality[:,3]:	number of fixation trials (target at screen center)
+quality[:,4]:	duration (ms)
+quality[:,5]:	track loss (proportion of samples without eye position)
+quality[:,6]:	number of blinks
+quality[:,7]:	blink rate (blinks/min)
+quality[:,8]:	RMS sample to sample precision in fixation trials (dva)
+quality[:,9]:	accuracy, mean distance to screen center in fixation trials (dva)
+(column names in the 'columns' attribute of the tables)
+-----------------------------------------------------------------------------------------
+To run:
+cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
+python behav_analysis/extract_quality.py sub-01 EyeMov
+-----------------------------------------------------------------------------------------
+"""
+
+# Stop warnings
+# -------------
+import warnings
+warnings.filterwarnings("ignore")
+
+# General imports
+# ---------------
+import sys
+import platform
+import json
+import time
+import numpy as np
+import h5py
+
+# Specific imports
+# ----------------
+from h5_utils import load_trial_index, load_run, write_table
+from quality_utils import QUALITY_COLUMNS, COUNT_COLUMNS, quality_counts, quality_table
+
+# Get inputs
+# ----------
+subject = sys.argv[1]
+task = sys.argv[2]
+
+# Define analysis parameters
+# --------------------------
+with open('./behavior_settings.json') as f:
+	json_s = f.read()
+	analysis_info = json.loads(json_s)
+
+# Platform settings
+# -----------------
+if platform.system() == 'Darwin':
+	main_dir = analysis_info['main_dir_mac']
+
+elif platform.system() == 'Windows':
+	main_dir = analysis_info['main_dir_pc']
+
+elif platform.system() == 'Linux':
+	main_dir = analysis_info['main_dir_unix']
+
+runs = np.arange(0,analysis_info['num_run'],1)
+sampling_rate = analysis_info['sampling_rate']
+
+# Load data
+# ---------
+file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
+h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
+h5_file = h5py.File(h5_filename,'a')
+folder_alias = 'eye_traces'
+trial_index = load_trial_index(h5_file, folder_alias)
+time_start_trial = np.array(h5_file['{folder_alias}/time_start_trial'.format(folder_alias = folder_alias)])
+time_end_trial = np.array(h5_file['{folder_alias}/time_end_trial'.format(folder_alias = folder_alias)])
+amp_sequence = np.array(h5_file['{folder_alias}/amp_sequence'.format(folder_alias = folder_alias)])[0]
+
+# Trial counts
+# ------------
+t_start = time.time()
+duration = (time_end_trial - time_start_trial)[trial_index['trial'],trial_index['sequence'],trial_index['run']].astype('float64')
+fix_logic = amp_sequence[trial_index['sequence']] == 5
+counts = np.zeros((trial_index.shape[0], len(COUNT_COLUMNS)))
+for run in runs:
+	run_logic = trial_index['run'] == run
+	run_data = load_run(h5_file, run, columns = ('time', 'x', 'y', 'valid', 'flags'), folder_alias = folder_alias)
+	counts[run_logic] = quality_counts( run_data['time'], run_data['x'], run_data['y'], run_data['valid'], run_data['flags'],
+										trial_index['start_idx'][run_logic], trial_index['stop_idx'][run_logic], sampling_rate)
+
+# Quality tables
+# --------------
+keys = np.column_stack((trial_index['run'], trial_index['sequence'], trial_index['trial'])).astype('float64')
+quality = {}
+for level, level_keys in zip(['trial', 'sequence', 'run'], [keys, keys*[1,1,np.nan], keys*[1,np.nan,np.nan]]):
+	quality[level] = quality_table(level_keys, duration, counts, fix_logic, sampling_rate)
+dur_quality = time.time() - t_start
+
+# Report
+# ------
+print('{:<6}{:>12}{:>12}{:>8}{:>12}{:>14}{:>10}'.format('run', 'track_loss', 'fix_trials', 'blinks', 'blink_rate', 'precision_rms', 'accuracy'))
+for run_quality in quality['run']:
+	print('{:<6.0f}{:>12.3f}{:>12.0f}{:>8.0f}{:>12.1f}{:>14.3f}{:>10.2f}'.format(run_quality[0]+1, *run_quality[[5,3,6,7,8,9]]))
+print('trials: {}, {:.2f} s'.format(trial_index.shape[0], dur_quality))
+
+# Save all
+# --------
+for level in ['trial', 'sequence', 'run']:
+	write_table(h5_file, 'quality/quality_{}'.format(level), quality[level], QUALITY_COLUMNS)
+h5_file.close()
@@ -22,7 +22,7 @@ vals_all[:,07]:	saccade offset y coordinate (dva from screen center)),
 vals_all[:,08]:	saccade onset time trigger
 vals_all[:,09]:	saccade offset time trigger
 vals_all[:,10]:	saccade onset time relative to trial onset (proportion of the trial)
-vals_all[:,11]:	saccade offset time relative to trial onset (proportion of the trial)
+vals_all[:,11]:	saccade offset time relative to trial onset (proportion of the trial, > 1 if landing after the trial end)
 vals_all[:,12]:	saccade duration (ms)
 vals_all[:,13]:	saccade velocity peak (dva/sec)
 vals_all[:,14]:	saccade distance (dva)
@@ -36,6 +36,21 @@ vals_all[:,21]:	trial with missing time stamps
 vals_all[:,22]:	saccade task with accurate saccade
 vals_all[:,23]:	trial with no_saccade detected,
 vals_all[:,24]:	microsaccade detected (<1 dva)
+vals_all[:,25]:	saccade around a blink (onset/offset within 10 ms of a blink)
+(column names in the 'columns' attribute of saccades/saccades_output)
+(detection_mode 'run': saccades detected within the continuous segments of the run, trials
+with missing time stamps analysed whatever gap_detection, 'skip' only applies to trial mode)
+h5 files with latency_all (saccades/latency_output), one row per target step
+latency_all[:,0]:	run number
+latency_all[:,1]:	sequence number
+latency_all[:,2]:	trial number
+latency_all[:,3]:	target step (1 = saccade onset, 2 = 2nd saccade onset message)
+latency_all[:,4]:	target step time trigger
+latency_all[:,5]:	saccade number of the first qualifying saccade (nan if none)
+latency_all[:,6]:	saccade onset time trigger
+latency_all[:,7]:	saccade latency (ms)
+latency_all[:,8]:	saccade gain (projected on the target step)
+latency_all[:,9]:	saccade landing error (dva from the stepped target)
 -----------------------------------------------------------------------------------------
 To run:
 cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
@@ -61,7 +76,12 @@ deb = ipdb.set_trace
 
 # Specific imports
 # ----------------
-from sac_utils import vecvel, microsacc_merge, saccpar, isincircle
+from sac_utils import SAC_DTYPE, vecvel_segments, run_detector, detect_segments, sequence_noise, segment_extrema, saccpar, isincircle, eyelink_sacc, match_saccades, split_segments, assign_trials
+from sac_utils import STEP_DTYPE, target_steps, saccade_latency
+from edf_utils import EVENT_KINDS
+from filter_utils import derivatives
+from h5_utils import load_trial_index, trial_slice, load_trial, load_run, write_run, nan_gaps, FLAG_BLINK, FLAG_INTERP
+from h5_utils import SACCADES_OUTPUT_COLUMNS, ColumnBuilder, write_saccades_output, LATENCY_OUTPUT_COLUMNS, write_table
 
 # Get inputs
 # ----------
@@ -100,13 +120,14 @@ file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
 h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
 h5_file = h5py.File(h5_filename,'a')
 folder_alias = 'eye_traces'
-eye_data_runs = np.array(h5_file['{folder_alias}/eye_data_runs'.format(folder_alias = folder_alias)])
-eye_data_runs_nan_blink = np.array(h5_file['{folder_alias}/eye_data_runs_nan_blink'.format(folder_alias = folder_alias)])
-time_start_seq = np.array(h5_file['{folder_alias}/time_start_seq'.format(folder_alias = folder_alias)])
-time_end_seq = np.array(h5_file['{folder_alias}/time_end_seq'.format(folder_alias = folder_alias)])
+trial_index = load_trial_index(h5_file, folder_alias)
 time_start_trial = np.array(h5_file['{folder_alias}/time_start_trial'.format(folder_alias = folder_alias)])
 time_end_trial = np.array(h5_file['{folder_alias}/time_end_trial'.format(folder_alias = folder_alias)])
 amp_sequence = np.array(h5_file['{folder_alias}/amp_sequence'.format(folder_alias = folder_alias)])[0]
+el_sacc = {column: np.array(h5_file['{folder_alias}/eyelink_saccades/{column}'.format(folder_alias = folder_alias, column = column)])
+		   for column in ['run', 'start', 'end', 'vpeak']}
+events = {column: np.array(h5_file['{folder_alias}/events/{column}'.format(folder_alias = folder_alias, column = column)])
+		  for column in ['kind', 'run', 'sequence', 'trial', 'time']}
 
 # Get saccade model
 # -----------------
@@ -115,27 +136,103 @@ velocity_th = analysis_info['velocity_th']
 min_dur = analysis_info['min_dur']
 merge_interval = analysis_info['merge_interval']
 tolerance_ratio = analysis_info['tolerance_ratio']
+saccade_source = analysis_info['saccade_source']
+detection_mode = analysis_info['detection_mode']
+noise_window = analysis_info['noise_window']
+gap_detection = analysis_info['gap_detection']
+velocity_filter = analysis_info['velocity_filter']
+saccades_num = analysis_info['saccades_num']
+latency_min = analysis_info['latency_min']
+latency_max = analysis_info['latency_max']
+latency_min_amp = analysis_info['latency_min_amp']
+sample_columns = ('time', 'x', 'y', 'valid', 'flags')
 
 # Main loop
 # ---------
-mat = 0
+# one row per saccade or per trial without saccade
+vals_all = ColumnBuilder(SACCADES_OUTPUT_COLUMNS, capacity = trial_index.shape[0]*2)
 for run in runs:
 	# print('run: {}'.format(run))
-	run_data_logic = eye_data_runs[:,3] == run
+	run_el_logic = el_sacc['run'] == run
+
+	# velocities filtered once over the run, sliced by segment or trial (vecvel: per block)
+	run_vxy = None
+	if detection_mode == 'run' or velocity_filter != 'vecvel':
+		run_data = load_run(h5_file, run, columns = sample_columns, folder_alias = folder_alias)
+
+		# samples without eye position set to nan: segments and velocities cut at blinks
+		run_det_x, run_det_y = run_data['x'], run_data['y']
+		if gap_detection == 'segments':
+			run_det_x, run_det_y = nan_gaps(run_data['x'], run_data['y'], run_data['valid'], run_data['flags'])
+	if velocity_filter != 'vecvel':
+		run_vxy = derivatives(run_data['time'], run_det_x, run_det_y, analysis_info)
+
+	if detection_mode == 'run':
+		# detect saccades once per continuous segment of the run (threshold of the segment)
+		run_ms = [np.zeros(0, dtype = SAC_DTYPE)]
+		for seg_start, seg_stop in zip(*split_segments(run_data['time'],sampling_rate,run_det_x,run_det_y)):
+			if seg_stop - seg_start < max(min_dur,6): continue
+			t, x, y = run_data['time'][seg_start:seg_stop],run_data['x'][seg_start:seg_stop],run_data['y'][seg_start:seg_stop]
+			if saccade_source == 'eyelink':
+				sac = eyelink_sacc(t,x,y,el_sacc['start'][run_el_logic],el_sacc['end'][run_el_logic],el_sacc['vpeak'][run_el_logic])
+			else:
+				seg_vxy = None if run_vxy is None else (run_vxy[0][seg_start:seg_stop], run_vxy[1][seg_start:seg_stop])
+				try:
+					sac = run_detector(x,y,analysis_info,vxy = seg_vxy)
+				except ValueError as error:
+					# no velocity noise (e.g. flat segment): segment without saccade
+					print('run {} samples {}-{}: {}'.format(run, seg_start, seg_stop, error))
+					continue
+			seg_ms = saccpar(sac)
+			seg_ms['onset'] += seg_start
+			seg_ms['offset'] += seg_start
+			run_ms.append(seg_ms)
+		run_ms = np.concatenate(run_ms)
+
+		# assign saccades to trials by onset time
+		run_trials = trial_index[trial_index['run'] == run]
+		run_ms_trial = assign_trials(run_data['time'][run_ms['onset']],
+									 time_start_trial[run_trials['trial'],run_trials['sequence'],run],
+									 time_end_trial[run_trials['trial'],run_trials['sequence'],run])
 
 	for sequence in sequences:
 		# print('sequence: {}'.format(sequence))
 		trials = np.arange(0,trials_seq[sequence],1)
-		seq_data_logic = np.logical_and(eye_data_runs[:,0] >= time_start_seq[sequence,run],\
-										eye_data_runs[:,0] <= time_end_seq[sequence,run])
+
+		# velocity noise of the sequence (threshold unit shared by its trials)
+		seq_data, seq_msd = {}, None
+		if noise_window == 'sequence' and detection_mode == 'trial':
+			seq_data = {trial: load_trial(h5_file, run, sequence, trial, columns = sample_columns, trial_index = trial_index) for trial in trials}
+			noise_trials = [trial for trial, trial_data in seq_data.items()
+							if trial_data['time'].shape[0] > 5 and np.sum(np.diff(trial_data['time'])>1000/sampling_rate) == 0]
+			seq_xy = [(seq_data[trial]['x'], seq_data[trial]['y']) for trial in noise_trials]
+			seq_v = None
+			if run_vxy is not None:
+				seq_v = [(run_vxy[0][trial_sl], run_vxy[1][trial_sl])
+						 for trial_sl in [trial_slice(trial_index, run, sequence, trial) for trial in noise_trials]]
+			elif gap_detection == 'segments':
+				# blinks and samples without eye position out of the pooled velocities (as detection)
+				seq_xy = [nan_gaps(seq_data[trial]['x'], seq_data[trial]['y'], seq_data[trial]['valid'], seq_data[trial]['flags'])
+						  for trial in noise_trials]
+				seq_v = [vecvel_segments(x, y, sampling_rate, seq_data[trial]['time']) for trial, (x, y) in zip(noise_trials, seq_xy)]
+			try:
+				seq_msd = sequence_noise(seq_xy, sampling_rate, seq_v)
+			except ValueError as error:
+				# no velocity noise of the sequence: noise of each trial
+				print('run {} sequence {}: {}'.format(run, sequence, error))
 
 		trial_with_sac = 0
 		for trial in trials:
 			print('trial: {}'.format(trial))
-			trial_data_logic = np.logical_and(eye_data_runs[:,0] >= time_start_trial[trial,sequence,run],\
-											  eye_data_runs[:,0] <= time_end_trial[trial,sequence,run])
-
-			data_logic = np.logical_and.reduce(np.array((run_data_logic,seq_data_logic,trial_data_logic)))
+			# read only the trial samples
+			trial_sl = trial_slice(trial_index, run, sequence, trial)
+			trial_vxy = None if run_vxy is None else (run_vxy[0][trial_sl], run_vxy[1][trial_sl])
+			if detection_mode == 'run':
+				trial_data = {column: run_data[column][trial_sl] for column in sample_columns}
+			elif trial in seq_data:
+				trial_data = seq_data[trial]
+			else:
+				trial_data = load_trial(h5_file, run, sequence, trial, columns = sample_columns, trial_index = trial_index)
 
 			# fixation target position
 			if (amp_sequence[sequence] == 5) :
@@ -153,7 +250,6 @@ for run in runs:
 			t_trial_start = time_start_trial[trial,sequence,run]
 			t_trial_end = time_end_trial[trial,sequence,run]
 			dur_trial = t_trial_end - t_trial_start
-			time_prct = ((eye_data_runs[data_logic][:,0]- t_trial_start)/dur_trial)
 
 			# Indicators
 			saccade_task = 0	 #0 saccade task
@@ -174,50 +270,59 @@ for run in runs:
 					trial_with_sac += 1
 
 			#1 Missing data point
-			if np.sum(np.diff(eye_data_runs[trial_data_logic,0])>1000/sampling_rate) > 0:
+			if np.sum(np.diff(trial_data['time'])>1000/sampling_rate) > 0:
 				miss_time = 1
 
 
 
-			#2 saccade detection
-			if not miss_time:
-				t, p, x, y = eye_data_runs[trial_data_logic,0],time_prct,eye_data_runs[trial_data_logic,1],eye_data_runs[trial_data_logic,2]
-				vx, vy = vecvel(x,y,sampling_rate)
-				sac = microsacc_merge(x,y,vx,vy,velocity_th,min_dur,merge_interval)
-				ms = saccpar(sac)
-
-				if np.isnan(ms[0,0]):
+			#2 saccade detection (gap_detection 'segments': within the continuous parts of trials with missing
+			#  time stamps, blinks or samples without eye position, 'skip': trials with missing time stamps skipped,
+			#  except in run mode where the saccades of the continuous run segments are always kept)
+			if not miss_time or gap_detection == 'segments' or detection_mode == 'run':
+				t, x, y = trial_data['time'],trial_data['x'],trial_data['y']
+				if detection_mode == 'run':
+					# run saccades started in the trial, onset/offset in run samples (landing after the trial end kept)
+					trial_num = np.flatnonzero(np.logical_and(run_trials['sequence'] == sequence, run_trials['trial'] == trial))
+					ms = run_ms[run_ms_trial == trial_num[0]] if trial_num.shape[0] else np.zeros(0, dtype = SAC_DTYPE)
+					t, x, y = run_data['time'],run_data['x'],run_data['y']
+				else:
+					try:
+						if saccade_source == 'eyelink':
+							sac = eyelink_sacc(t,x,y,el_sacc['start'][run_el_logic],el_sacc['end'][run_el_logic],el_sacc['vpeak'][run_el_logic])
+						elif gap_detection == 'segments' and (miss_time or np.any(trial_data['valid'] == 0) or np.any(trial_data['flags'] & FLAG_BLINK)):
+							x_gap, y_gap = nan_gaps(x, y, trial_data['valid'], trial_data['flags'])
+							sac = detect_segments(t,x_gap,y_gap,analysis_info,msd = seq_msd,vxy = trial_vxy)
+						else:
+							sac = run_detector(x,y,analysis_info,msd = seq_msd,vxy = trial_vxy)
+					except ValueError as error:
+						# no velocity noise (e.g. flat trace): trial not analysed (nan row)
+						print('run {} sequence {} trial {}: {}'.format(run, sequence, trial, error))
+						vals_all.append(run = run, sequence = sequence, trial = trial, fix_cor = fix_cor, sac_cor = sac_cor,
+										saccade_task = saccade_task, miss_time = miss_time, sac_accuracy = sac_accuracy,
+										no_saccade = no_saccade, microsaccade = microsaccade, blink_saccade = blink_saccade)
+						continue
+					ms = saccpar(sac)
+
+				if ms.shape[0] == 0:
 					#4 no saccade
 					no_saccade = 1
 					s1 = 0
-					if mat == 0:
-						vals_all = np.array([	run,			sequence,		trial,			np.nan,			np.nan,\
-												np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-												np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-												np.nan,			np.nan,			np.nan,			fix_cor,		sac_cor,\
-												saccade_task, 	miss_time,		sac_accuracy,	no_saccade,		microsaccade,\
-												blink_saccade])
-
-						mat = 1
-					else:
-						vals_all = np.vstack((vals_all,np.array([	run,			sequence,		trial,			np.nan,			np.nan,\
-																	np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-																	np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-																	np.nan,			np.nan,			np.nan,			fix_cor,		sac_cor,\
-																	saccade_task, 	miss_time,		sac_accuracy,	no_saccade,		microsaccade,\
-																	blink_saccade])))
+					vals_all.append(run = run, sequence = sequence, trial = trial, fix_cor = fix_cor, sac_cor = sac_cor,
+									saccade_task = saccade_task, miss_time = miss_time, sac_accuracy = sac_accuracy,
+									no_saccade = no_saccade, microsaccade = microsaccade, blink_saccade = blink_saccade)
 
 				else:
 					n_sac_tot = ms.shape[0]
 					s1 = 0
 					while s1 < n_sac_tot:
-						sac_x_onset,	sac_x_offset	=	x[int(ms[s1,0])], 	x[int(ms[s1,1])]
-						sac_y_onset,	sac_y_offset	=	y[int(ms[s1,0])], 	y[int(ms[s1,1])]
-						sac_t_onset,	sac_t_offset	=	t[int(ms[s1,0])], 	t[int(ms[s1,1])]
-						sac_p_onset,	sac_p_offset	=	p[int(ms[s1,0])], 	p[int(ms[s1,1])]
-						sac_dur,		sac_vpeak		=	ms[s1,2],			ms[s1,3]
-						sac_dist,		sac_amp			= 	ms[s1,4],			ms[s1,6]
-						sac_dist_ang,	sac_amp_ang		= 	ms[s1,5],			ms[s1,7]
+						sac_onset,		sac_offset		=	ms['onset'][s1],	ms['offset'][s1]
+						sac_x_onset,	sac_x_offset	=	x[sac_onset], 		x[sac_offset]
+						sac_y_onset,	sac_y_offset	=	y[sac_onset], 		y[sac_offset]
+						sac_t_onset,	sac_t_offset	=	t[sac_onset], 		t[sac_offset]
+						sac_p_onset,	sac_p_offset	=	(sac_t_onset - t_trial_start)/dur_trial, (sac_t_offset - t_trial_start)/dur_trial
+						sac_dur,		sac_vpeak		=	ms['dur'][s1],		ms['vpeak'][s1]
+						sac_dist,		sac_amp			= 	ms['dist'][s1],		ms['amp'][s1]
+						sac_dist_ang,	sac_amp_ang		= 	ms['angle'][s1],	ms['amp_angle'][s1]
 
 						fix_cor = isincircle(sac_x_onset,sac_y_onset,fix_pos_x,fix_pos_y,sac_fix_rad)
 						sac_cor = isincircle(sac_x_offset,sac_y_offset,sac_pos_x,sac_pos_y,sac_fix_rad)
@@ -229,106 +334,117 @@ for run in runs:
 						if sac_amp <= 1.0:microsaccade = 1
 
 						# extract metrics
-						if mat == 0:
-							vals_all = np.array([	run,			sequence,		trial,			s1,				sac_x_onset,\
-													sac_x_offset,	sac_y_onset,	sac_y_offset,	sac_t_onset,	sac_t_offset,\
-													sac_p_onset,	sac_p_offset,	sac_dur,		sac_vpeak,		sac_dist,\
-													sac_amp,		sac_dist_ang,	sac_amp_ang,	fix_cor,		sac_cor,\
-													saccade_task, 	miss_time,		sac_accuracy,	no_saccade,		microsaccade,\
-													blink_saccade])
-							mat = 1
-						else:
-						    vals_all = np.vstack((vals_all,np.array([	run,			sequence,		trial,			s1,				sac_x_onset,\
-																		sac_x_offset,	sac_y_onset,	sac_y_offset,	sac_t_onset,	sac_t_offset,\
-																		sac_p_onset,	sac_p_offset,	sac_dur,		sac_vpeak,		sac_dist,\
-																		sac_amp,		sac_dist_ang,	sac_amp_ang,	fix_cor,		sac_cor,\
-																		saccade_task, 	miss_time,		sac_accuracy,	no_saccade,		microsaccade,\
-																		blink_saccade])))
+						vals_all.append(run = run, sequence = sequence, trial = trial, sac_num = s1, sac_x_onset = sac_x_onset,
+										sac_x_offset = sac_x_offset, sac_y_onset = sac_y_onset, sac_y_offset = sac_y_offset, sac_t_onset = sac_t_onset, sac_t_offset = sac_t_offset,
+										sac_p_onset = sac_p_onset, sac_p_offset = sac_p_offset, sac_dur = sac_dur, sac_vpeak = sac_vpeak, sac_dist = sac_dist,
+										sac_amp = sac_amp, sac_dist_ang = sac_dist_ang, sac_amp_ang = sac_amp_ang, fix_cor = fix_cor, sac_cor = sac_cor,
+										saccade_task = saccade_task, miss_time = miss_time, sac_accuracy = sac_accuracy, no_saccade = no_saccade, microsaccade = microsaccade,
+										blink_saccade = blink_saccade)
 						s1 += 1
 			else:
-				if mat == 0:
-					vals_all = np.array([	run,			sequence,		trial,			np.nan,			np.nan,\
-											np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-											np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-											np.nan,			np.nan,			np.nan,			fix_cor,		sac_cor,\
-											saccade_task, 	miss_time,		sac_accuracy,	no_saccade,		microsaccade,\
-											blink_saccade])
-					mat = 1
-				else:
-					vals_all = np.vstack((vals_all,np.array([	run,			sequence,		trial,			np.nan,			np.nan,\
-																np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-																np.nan,			np.nan,			np.nan,			np.nan,			np.nan,\
-																np.nan,			np.nan,			np.nan,			fix_cor,		sac_cor,\
-																saccade_task, 	miss_time,		sac_accuracy,	no_saccade,		microsaccade,\
-																blink_saccade])))
+				vals_all.append(run = run, sequence = sequence, trial = trial, fix_cor = fix_cor, sac_cor = sac_cor,
+								saccade_task = saccade_task, miss_time = miss_time, sac_accuracy = sac_accuracy,
+								no_saccade = no_saccade, microsaccade = microsaccade, blink_saccade = blink_saccade)
+vals_all = vals_all.to_array()
 
+# Cross-check with EyeLink parsed saccades
+for run in runs:
+	run_sac_logic = np.logical_and(vals_all[:,0] == run, ~np.isnan(vals_all[:,8]))
+	run_el_logic = el_sacc['run'] == run
+	match_idx = match_saccades(vals_all[run_sac_logic,8],vals_all[run_sac_logic,9],el_sacc['start'][run_el_logic],el_sacc['end'][run_el_logic])
+	print('run {}: {}/{} saccades matched by EyeLink ESACC'.format(run, np.sum(match_idx >= 0), match_idx.shape[0]))
 
 #5 blink saccades
-
-# Detect and put nan during blink saccades
-blinkNum = 0
-blink_start = False
-for tTime in np.arange(0,eye_data_runs_nan_blink.shape[0],1):
-	if not blink_start:
-		if np.isnan(eye_data_runs_nan_blink[tTime,1]):
-
-			blinkNum += 1
-			timeBlinkOnset = eye_data_runs_nan_blink[tTime,0]
-			blink_start = True
-			if blinkNum == 1:
-				blink_onset_offset = np.matrix([timeBlinkOnset,np.nan])
-			else:
-				blink_onset_offset = np.vstack((blink_onset_offset,[timeBlinkOnset,np.nan]))
-
-	if blink_start:
-		if not np.isnan(eye_data_runs_nan_blink[tTime,1]):
-			timeBlinkOffset = eye_data_runs_nan_blink[tTime,0]
-			blink_start = 0
-			blink_onset_offset[blinkNum-1,1] = timeBlinkOffset
-
-
-# nan saccade time around detected blinks and replace by interpolations
+# session sample times and blink samples (flags of the runs)
+blink_runs = [load_run(h5_file, run, columns = ('time', 'flags'), folder_alias = folder_alias) for run in runs]
+run_first_idx = np.cumsum([0] + [run_data['time'].shape[0] for run_data in blink_runs])
+time_session = np.concatenate([run_data['time'] for run_data in blink_runs])
+blink_logic = np.concatenate([(run_data['flags'] & FLAG_BLINK) > 0 for run_data in blink_runs]).astype('int8')
+
+# blink onset = first blink sample, offset = first sample after it (nan if none)
+blink_edges = np.diff(np.concatenate(([0], blink_logic, [0])))
+blink_onset = time_session[np.flatnonzero(blink_edges == 1)].astype('float64')
+blink_offset = np.append(time_session, np.nan)[np.flatnonzero(blink_edges == -1)]
+
+# saccades ending around a blink onset (pre) or starting around a blink offset (post)
 buffer_dur = 20
-sac_t_onset_col = 8
-sac_t_offset_col = 9
-blink_saccade_col = 25
-eye_data_runs_int_blink = np.copy(eye_data_runs_nan_blink)
-for tBlink in np.arange(0,blinkNum,1):
-
-
-
-	blink_pre_sac_logic = np.logical_and(vals_all[:,sac_t_offset_col] >= blink_onset_offset[tBlink,0] - buffer_dur/2,\
-										 vals_all[:,sac_t_offset_col] <= blink_onset_offset[tBlink,0] + buffer_dur/2)
-
-	blink_post_sac_logic = np.logical_and(vals_all[:,sac_t_onset_col] >= blink_onset_offset[tBlink,1] - buffer_dur/2,\
-										  vals_all[:,sac_t_onset_col] <= blink_onset_offset[tBlink,1] + buffer_dur/2)
-
-	vals_all[blink_pre_sac_logic,blink_saccade_col] += 1
-	vals_all[blink_post_sac_logic,blink_saccade_col] += 1
-
-
-	if np.logical_and(np.sum(blink_pre_sac_logic),np.sum(blink_post_sac_logic)):
-		blink_pre_sac_vals = vals_all[blink_pre_sac_logic]
-		blink_pre_sac_t_onset = blink_pre_sac_vals[0,sac_t_onset_col]
-		blink_pre_sac_t_offset = blink_pre_sac_vals[0,sac_t_offset_col]
-
-		blink_post_sac_vals = vals_all[blink_post_sac_logic]
-		blink_post_sac_t_onset = blink_post_sac_vals[0,sac_t_onset_col]
-		blink_post_sac_t_offset = blink_post_sac_vals[0,sac_t_offset_col]
-
-		blink_sac_x_coord = eye_data_runs_int_blink[np.logical_and(eye_data_runs_int_blink[:,0] >= blink_pre_sac_t_onset,eye_data_runs_int_blink[:,0] <= blink_post_sac_t_offset),1]
-		blink_sac_y_coord = eye_data_runs_int_blink[np.logical_and(eye_data_runs_int_blink[:,0] >= blink_pre_sac_t_onset,eye_data_runs_int_blink[:,0] <= blink_post_sac_t_offset),2]
-
-		# linear interporlation
-		eye_data_runs_int_blink[np.logical_and(	eye_data_runs_int_blink[:,0] >= blink_pre_sac_t_onset,\
-											  	eye_data_runs_int_blink[:,0] <= blink_post_sac_t_offset),1] =\
-												np.linspace(blink_sac_x_coord[0],blink_sac_x_coord[-1],blink_sac_x_coord.shape[0])
-
-		eye_data_runs_int_blink[np.logical_and(	eye_data_runs_int_blink[:,0] >= blink_pre_sac_t_onset,\
-											  	eye_data_runs_int_blink[:,0] <= blink_post_sac_t_offset),2] =\
-												np.linspace(blink_sac_y_coord[0],blink_sac_y_coord[-1],blink_sac_y_coord.shape[0])
-
-
+sac_t_onset_col = SACCADES_OUTPUT_COLUMNS.index('sac_t_onset')
+sac_t_offset_col = SACCADES_OUTPUT_COLUMNS.index('sac_t_offset')
+blink_saccade_col = SACCADES_OUTPUT_COLUMNS.index('blink_saccade')
+sac_t_onset, sac_t_offset = vals_all[:,sac_t_onset_col], vals_all[:,sac_t_offset_col]
+
+# interval join: blinks within buffer_dur/2 of each saccade time (sorted times and searchsorted)
+blink_onset_sorted = np.sort(blink_onset)
+blink_offset_sorted = np.sort(blink_offset[~np.isnan(blink_offset)])
+vals_all[:,blink_saccade_col] += np.searchsorted(blink_onset_sorted, sac_t_offset + buffer_dur/2, side = 'right') - \
+								 np.searchsorted(blink_onset_sorted, sac_t_offset - buffer_dur/2, side = 'left')
+vals_all[:,blink_saccade_col] += np.searchsorted(blink_offset_sorted, sac_t_onset + buffer_dur/2, side = 'right') - \
+								 np.searchsorted(blink_offset_sorted, sac_t_onset - buffer_dur/2, side = 'left')
+
+# first saccade (in vals_all order) of each blink window: minimum row over the sorted window
+def first_saccade(sac_t, blink_t):
+	"""
+	----------------------------------------------------------------------
+	first_saccade(sac_t, blink_t)
+	----------------------------------------------------------------------
+	Goal of the function :
+	Find the first saccade row with a time within buffer_dur/2 of each
+	blink time
+	----------------------------------------------------------------------
+	Input(s) :
+	sac_t: saccade times (vals_all column, nan if no saccade)
+	blink_t: blink times
+	----------------------------------------------------------------------
+	Output(s) :
+	sac_row: row of vals_all (-1 if none)
+	----------------------------------------------------------------------
+	Function created by Martin SZINTE (mail@martinszinte.net)
+	----------------------------------------------------------------------
+	"""
+	sac_order = np.argsort(sac_t, kind = 'stable')
+	sac_t_sorted = sac_t[sac_order]
+	win_start = np.searchsorted(sac_t_sorted, blink_t - buffer_dur/2, side = 'left')
+	win_stop = np.searchsorted(sac_t_sorted, blink_t + buffer_dur/2, side = 'right')
+	win_logic = np.logical_and(win_stop > win_start, ~np.isnan(blink_t))
+	sac_row = np.full(blink_t.shape[0], -1)
+	if np.sum(win_logic):
+		sac_row[win_logic], _, _, _ = segment_extrema(sac_order, win_start[win_logic], win_stop[win_logic])
+	return sac_row
+
+# linear interpolation from the pre saccade onset to the post saccade offset
+# (samples interval saved, applied by h5_utils.apply_view)
+pre_sac_row = first_saccade(sac_t_offset, blink_onset)
+post_sac_row = first_saccade(sac_t_onset, blink_offset)
+interp_logic = np.logical_and(pre_sac_row >= 0, post_sac_row >= 0)
+interp_intervals = np.column_stack((np.searchsorted(time_session, sac_t_onset[pre_sac_row[interp_logic]], side = 'left'),
+									np.searchsorted(time_session, sac_t_offset[post_sac_row[interp_logic]], side = 'right'))).astype('int64')
+interp_intervals = interp_intervals[interp_intervals[:,1] > interp_intervals[:,0]]
+
+#6 saccade latency
+# target steps: saccade onset and 2nd saccade onset messages
+step_logic = np.isin(events['kind'], [EVENT_KINDS.index('saccade_onset'), EVENT_KINDS.index('saccade2_onset')])
+step_num = np.where(events['kind'][step_logic] == EVENT_KINDS.index('saccade_onset'), 1, 2)
+step_seq, step_trial = events['sequence'][step_logic], events['trial'][step_logic]
+steps = np.zeros(step_num.shape[0], dtype = STEP_DTYPE)
+steps['run'], steps['time'] = events['run'][step_logic], events['time'][step_logic]
+
+# peripheral target and screen center (saccades_num 1: center to periphery on even trials, back on odd ones)
+step_amp = np.array(rads)[amp_sequence[step_seq].astype(int)]
+steps['x_from'], steps['y_from'], steps['x_to'], steps['y_to'] = target_steps(step_num, step_trial, step_amp, polar_ang, saccades_num)
+
+# first qualifying saccade of each step (blink saccades excluded)
+col = SACCADES_OUTPUT_COLUMNS.index
+sac = {	'run': vals_all[:,col('run')],
+		't_onset': np.where(vals_all[:,col('blink_saccade')] > 0, np.nan, vals_all[:,col('sac_t_onset')]),
+		'x_onset': vals_all[:,col('sac_x_onset')], 'y_onset': vals_all[:,col('sac_y_onset')],
+		'x_offset': vals_all[:,col('sac_x_offset')], 'y_offset': vals_all[:,col('sac_y_offset')]}
+latency = saccade_latency(steps, sac, latency_min, latency_max, latency_min_amp)
+sac_row = np.append(vals_all, np.full((1,vals_all.shape[1]), np.nan), axis = 0)[latency['sac_idx']]
+latency_all = np.column_stack((	steps['run'], step_seq, step_trial, step_num, steps['time'],
+								sac_row[:,col('sac_num')], sac_row[:,col('sac_t_onset')],
+								latency['latency'], latency['gain'], latency['landing_error']))
+print('saccade latency: {}/{} target steps matched, median {:.0f} ms'.format(np.sum(latency['sac_idx'] >= 0), steps.shape[0],
+																			   np.nanmedian(latency['latency']) if np.sum(latency['sac_idx'] >= 0) else np.nan))
 
 # Save all
 # --------
@@ -336,13 +452,15 @@ h5_file = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_d
 
 h5file = h5py.File(h5_file, "a")
 folder_alias = 'eye_traces'
-h5file.create_dataset(  '{folder_alias}/eye_data_runs_int_blink'.format(folder_alias = folder_alias),
-						data = eye_data_runs_int_blink,dtype ='float32')
-
-folder_alias = 'saccades'
-try:h5file.create_group(folder_alias)
-except:None
-
-h5file.create_dataset(  '{folder_alias}/saccades_output'.format(folder_alias = folder_alias),
-						data = vals_all,dtype ='float32')
+for run in runs:
+	# interpolation intervals in run samples and interpolated samples flag
+	run_num_samples = run_first_idx[run+1] - run_first_idx[run]
+	run_intervals = interp_intervals[np.logical_and(interp_intervals[:,0] >= run_first_idx[run], interp_intervals[:,0] < run_first_idx[run+1])] - run_first_idx[run]
+	run_intervals[:,1] = np.minimum(run_intervals[:,1], run_num_samples)
+	interp_mask = np.cumsum(np.bincount(run_intervals[:,0], minlength = run_num_samples+1) - np.bincount(run_intervals[:,1], minlength = run_num_samples+1))[:run_num_samples] > 0
+	flags = (blink_runs[run]['flags'] & ~np.uint8(FLAG_INTERP)) | (interp_mask.astype('uint8')*np.uint8(FLAG_INTERP))
+	write_run(h5file, run, {'flags': flags, 'interp_intervals': run_intervals}, folder_alias)
+
+write_saccades_output(h5file, vals_all, folder_alias = 'saccades')
+write_table(h5file, 'saccades/latency_output', latency_all, LATENCY_OUTPUT_COLUMNS)
 
@@ -0,0 +1,128 @@
+import numpy as np
+import scipy.signal
+
+from sac_utils import split_segments, vecvel_segments
+
+def derivative_kernel(velocity_filter, sampling_rate, deriv = 1, savgol_window = 21, savgol_polyorder = 2, fir_numtaps = 31, fir_cutoff = 75):
+    """
+    ----------------------------------------------------------------------
+    derivative_kernel(velocity_filter, sampling_rate, deriv = 1,
+                      savgol_window = 21, savgol_polyorder = 2,
+                      fir_numtaps = 31, fir_cutoff = 75)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Convolution kernel of a derivative filter (velocity or acceleration)
+    ----------------------------------------------------------------------
+    Input(s) :
+    velocity_filter: 'vecvel' (5 points moving difference), 'savgol'
+                     (Savitzky-Golay derivative) or 'fir' (low-pass FIR
+                     followed by a central difference)
+    sampling_rate: eye tracking sampling rate
+    deriv: derivative order (1 = velocity, 2 = acceleration)
+    savgol_window: Savitzky-Golay window length (samples, odd)
+    savgol_polyorder: Savitzky-Golay polynomial order
+    fir_numtaps: FIR low-pass length (samples, odd)
+    fir_cutoff: FIR low-pass cutoff frequency (Hz)
+    ----------------------------------------------------------------------
+    Output(s) :
+    kernel: convolution kernel (odd length, centered)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if velocity_filter == 'savgol':
+        return scipy.signal.savgol_coeffs(savgol_window, savgol_polyorder, deriv = deriv, delta = 1/sampling_rate, use = 'conv')
+
+    if velocity_filter == 'vecvel':
+        diff_kernel = sampling_rate/6*np.array([1, 1, 0, -1, -1])
+        kernel = np.array([1.0])
+    elif velocity_filter == 'fir':
+        diff_kernel = sampling_rate/2*np.array([1, 0, -1])
+        kernel = scipy.signal.firwin(fir_numtaps, fir_cutoff, fs = sampling_rate)
+    else:
+        raise ValueError('unknown velocity_filter "{}" (vecvel, savgol or fir)'.format(velocity_filter))
+
+    for deriv_num in np.arange(0, deriv, 1):
+        kernel = np.convolve(kernel, diff_kernel)
+
+    return kernel
+
+def filter_segments(v, kernel, seg_start, seg_stop, method = 'auto'):
+    """
+    ----------------------------------------------------------------------
+    filter_segments(v, kernel, seg_start, seg_stop, method = 'auto')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Convolve a whole time series at once, keeping only the samples whose
+    filter window lies within one continuous segment
+    ----------------------------------------------------------------------
+    Input(s) :
+    v: time series
+    kernel: convolution kernel (odd length, centered)
+    seg_start: segments first sample index
+    seg_stop: segments last sample index + 1
+    method: scipy.signal.convolve method ('direct', 'fft' or 'auto')
+    ----------------------------------------------------------------------
+    Output(s) :
+    v_filt: filtered time series (0 at the segment edges, nan out of the
+            segments)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    # samples out of the segments (e.g. nan) set to 0 not to spread in the convolution
+    seg_len = seg_stop - seg_start
+    seg_num = np.repeat(np.arange(seg_start.shape[0]), seg_len)
+    idx = np.arange(seg_num.shape[0]) - (np.cumsum(seg_len) - seg_len)[seg_num] + seg_start[seg_num]
+    v_seg = np.zeros(v.shape[0], dtype = 'float64')
+    v_seg[idx] = v[idx]
+
+    v_conv = scipy.signal.convolve(v_seg, kernel, mode = 'same', method = method)
+
+    # edges: filter window crossing the segment start or end
+    half_len = kernel.shape[0]//2
+    edge_logic = np.logical_or(idx - seg_start[seg_num] < half_len, seg_stop[seg_num] - 1 - idx < half_len)
+    v_filt = np.full(v.shape[0], np.nan, dtype = v.dtype)
+    v_filt[idx] = np.where(edge_logic, 0, v_conv[idx])
+
+    return v_filt
+
+def derivatives(t, x, y, analysis_info, deriv = 1):
+    """
+    ----------------------------------------------------------------------
+    derivatives(t, x, y, analysis_info, deriv = 1)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Eye velocity or acceleration of a whole run with the filter selected
+    in the settings (velocity_filter), convolved once over the run with
+    the edges of its continuous segments, to be sliced by trial
+    ----------------------------------------------------------------------
+    Input(s) :
+    t: time stamps of the time series (ms)
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    analysis_info: analysis settings
+    deriv: derivative order (1 = velocity, 2 = acceleration)
+    ----------------------------------------------------------------------
+    Output(s) :
+    dx: derivative, horizontal component
+    dy: derivative, vertical component
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    sampling_rate = analysis_info['sampling_rate']
+    velocity_filter = analysis_info['velocity_filter']
+
+    # vecvel velocity with its own edges
+    if velocity_filter == 'vecvel' and deriv == 1:
+        return vecvel_segments(x, y, sampling_rate, t)
+
+    kernel = derivative_kernel( velocity_filter, sampling_rate, deriv,
+                                analysis_info['savgol_window'], analysis_info['savgol_polyorder'],
+                                analysis_info['fir_numtaps'], analysis_info['fir_cutoff'])
+    seg_start, seg_stop = split_segments(t, sampling_rate, x, y)
+    dx = filter_segments(x, kernel, seg_start, seg_stop, analysis_info['filter_method'])
+    dy = filter_segments(y, kernel, seg_start, seg_stop, analysis_info['filter_method'])
+
+    return dx, dy
@@ -0,0 +1,526 @@
+# chunk length of the per-run sample datasets (~1 s at 1000 Hz)
+CHUNK_SAMPLES = 1024
+
+# bits of the per-sample flags column
+FLAG_BLINK = 1          # sample masked by a blink (nan in the nan_blink view)
+FLAG_INTERP = 2         # sample linearly interpolated over a blink saccade (int_blink view)
+
+TRIAL_INDEX_DTYPE = [('run', 'u1'), ('sequence', 'u1'), ('trial', 'u1'),
+                     ('start_idx', 'i8'), ('stop_idx', 'i8')]
+
+# columns of saccades/saccades_output (see extract_saccades.py)
+SACCADES_OUTPUT_COLUMNS = ( 'run', 'sequence', 'trial', 'sac_num', 'sac_x_onset',
+                            'sac_x_offset', 'sac_y_onset', 'sac_y_offset', 'sac_t_onset', 'sac_t_offset',
+                            'sac_p_onset', 'sac_p_offset', 'sac_dur', 'sac_vpeak', 'sac_dist',
+                            'sac_amp', 'sac_dist_ang', 'sac_amp_ang', 'fix_cor', 'sac_cor',
+                            'saccade_task', 'miss_time', 'sac_accuracy', 'no_saccade', 'microsaccade',
+                            'blink_saccade')
+
+# columns of saccades/latency_output (see extract_saccades.py)
+LATENCY_OUTPUT_COLUMNS = (  'run', 'sequence', 'trial', 'step', 'step_time', 'sac_num', 'sac_t_onset',
+                            'latency', 'gain', 'landing_error')
+
+def run_alias(run, folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    run_alias(run, folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Get the h5 group name of a run
+    ----------------------------------------------------------------------
+    Input(s) :
+    run: run number (0 = first)
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    run_txt: h5 group name (e.g. eye_traces/run-01)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    return '{folder_alias}/run-{run:02d}'.format(folder_alias = folder_alias, run = int(run)+1)
+
+def write_run(h5file, run, run_data, folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    write_run(h5file, run, run_data, folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Write the sample columns of a run in chunked and compressed datasets
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    run: run number (0 = first)
+    run_data: dictionary of column name: array (samples or intervals first)
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    none
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    for column, data in run_data.items():
+        dataset_name = '{run_alias}/{column}'.format(run_alias = run_alias(run, folder_alias), column = column)
+        if dataset_name in h5file:
+            del h5file[dataset_name]
+        if data.shape[0] == 0:
+            h5file.create_dataset(dataset_name, data = data)
+        else:
+            h5file.create_dataset(  dataset_name, data = data,
+                                    chunks = (min(CHUNK_SAMPLES, data.shape[0]),) + data.shape[1:],
+                                    compression = 'gzip', compression_opts = 4, shuffle = True)
+
+def make_trial_index(time_runs, time_start_trial, time_end_trial):
+    """
+    ----------------------------------------------------------------------
+    make_trial_index(time_runs, time_start_trial, time_end_trial)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Compute the sample offsets of each trial in its run datasets
+    ----------------------------------------------------------------------
+    Input(s) :
+    time_runs: list of the sample time stamps of each run (sorted)
+    time_start_trial: trial onset times [trial, sequence, run] (0 = none)
+    time_end_trial: trial offset times [trial, sequence, run] (0 = none)
+    ----------------------------------------------------------------------
+    Output(s) :
+    trial_index: structured array (TRIAL_INDEX_DTYPE), samples of a trial
+                 are [start_idx:stop_idx] (onset <= time <= offset)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    trial, sequence, run = np.nonzero(time_end_trial)
+    trial_index = np.zeros(trial.shape[0], dtype = TRIAL_INDEX_DTYPE)
+    trial_index['run'], trial_index['sequence'], trial_index['trial'] = run, sequence, trial
+
+    for t_run, time_run in enumerate(time_runs):
+        run_logic = run == t_run
+        trial_index['start_idx'][run_logic] = np.searchsorted(time_run, time_start_trial[trial[run_logic],sequence[run_logic],t_run], side = 'left')
+        trial_index['stop_idx'][run_logic] = np.searchsorted(time_run, time_end_trial[trial[run_logic],sequence[run_logic],t_run], side = 'right')
+
+    return np.sort(trial_index, order = ['run', 'sequence', 'trial'])
+
+def write_trial_index(h5file, trial_index, folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    write_trial_index(h5file, trial_index, folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Write the (run, sequence, trial) -> (start_idx, stop_idx) index
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    trial_index: trial index (from make_trial_index)
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    none
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    dataset_name = '{folder_alias}/trial_index'.format(folder_alias = folder_alias)
+    if dataset_name in h5file:
+        del h5file[dataset_name]
+    h5file.create_dataset(dataset_name, data = trial_index)
+
+def load_trial_index(h5file, folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    load_trial_index(h5file, folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Load the trial index of an h5 file
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    trial_index: structured array (TRIAL_INDEX_DTYPE)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    return h5file['{folder_alias}/trial_index'.format(folder_alias = folder_alias)][()]
+
+def trial_slice(trial_index, run, sequence, trial):
+    """
+    ----------------------------------------------------------------------
+    trial_slice(trial_index, run, sequence, trial)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Get the sample slice of a trial in its run datasets
+    ----------------------------------------------------------------------
+    Input(s) :
+    trial_index: trial index (from load_trial_index)
+    run: run number (0 = first)
+    sequence: sequence number (0 = first)
+    trial: trial number (0 = first)
+    ----------------------------------------------------------------------
+    Output(s) :
+    trial_sl: slice of the trial samples (empty if the trial is missing)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    key = np.array((run, sequence, trial, 0, 0), dtype = TRIAL_INDEX_DTYPE)
+    pos = np.searchsorted(trial_index[['run', 'sequence', 'trial']], key[['run', 'sequence', 'trial']])
+    if pos < trial_index.shape[0] and trial_index['run'][pos] == run and \
+       trial_index['sequence'][pos] == sequence and trial_index['trial'][pos] == trial:
+        return slice(int(trial_index['start_idx'][pos]), int(trial_index['stop_idx'][pos]))
+    else:
+        return slice(0, 0)
+
+def apply_view(x, y, flags, interp_intervals, view = 'raw'):
+    """
+    ----------------------------------------------------------------------
+    apply_view(x, y, flags, interp_intervals, view = 'raw')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Derive the blink views of the eye coordinates from the sample flags
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: eye x coordinates (raw)
+    y: eye y coordinates (raw)
+    flags: sample flags (FLAG_BLINK, FLAG_INTERP bits)
+    interp_intervals: [start_idx, stop_idx] of the linear interpolations
+                      (relative to x, applied in order)
+    view: 'raw', 'nan_blink' (nan during blinks) or 'int_blink' (nan
+          during blinks, blink saccades linearly interpolated)
+    ----------------------------------------------------------------------
+    Output(s) :
+    x: eye x coordinates of the view
+    y: eye y coordinates of the view
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    if view == 'raw':
+        return x, y
+
+    blink_logic = (flags & FLAG_BLINK) > 0
+    x, y = np.where(blink_logic, np.nan, x), np.where(blink_logic, np.nan, y)
+
+    if view == 'int_blink' and len(interp_intervals):
+        interp_intervals = np.asarray(interp_intervals, dtype = 'int64').reshape(-1,2)
+
+        # intervals overlapping others (chained: applied in order, each starting from the previous one)
+        # or with a nan end sample (all nan) are interpolated one by one
+        interval_order = np.argsort(interp_intervals[:,0], kind = 'stable')
+        start_sorted, stop_sorted = interp_intervals[interval_order,0], interp_intervals[interval_order,1]
+        new_group = np.append(True, start_sorted[1:] >= np.maximum.accumulate(stop_sorted)[:-1])
+        group_num = np.cumsum(new_group) - 1
+        chained_logic = np.zeros(interp_intervals.shape[0], dtype = bool)
+        chained_logic[interval_order] = np.bincount(group_num)[group_num] > 1
+        for end_idx in [interp_intervals[:,0], interp_intervals[:,1]-1]:
+            chained_logic = chained_logic | np.isnan(x[end_idx]) | np.isnan(y[end_idx])
+
+        # other intervals: inner samples filled from the interval end samples in one interpolation
+        single_intervals = interp_intervals[np.logical_and(~chained_logic, interp_intervals[:,1] - interp_intervals[:,0] > 2)]
+        num_samples = x.shape[0]
+        inside_logic = np.cumsum(np.bincount(single_intervals[:,0]+1, minlength = num_samples+1) -
+                                 np.bincount(single_intervals[:,1]-1, minlength = num_samples+1))[:num_samples] > 0
+        inside_idx, anchor_idx = np.flatnonzero(inside_logic), np.flatnonzero(~inside_logic)
+        x[inside_idx] = np.interp(inside_idx, anchor_idx, x[anchor_idx])
+        y[inside_idx] = np.interp(inside_idx, anchor_idx, y[anchor_idx])
+
+        for start_idx, stop_idx in interp_intervals[chained_logic]:
+            num_samples = stop_idx - start_idx
+            x[start_idx:stop_idx] = np.linspace(x[start_idx], x[stop_idx-1], num_samples)
+            y[start_idx:stop_idx] = np.linspace(y[start_idx], y[stop_idx-1], num_samples)
+
+    return x, y
+
+def nan_gaps(x, y, valid, flags):
+    """
+    ----------------------------------------------------------------------
+    nan_gaps(x, y, valid, flags)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Set the samples without eye position (blinks, lost tracking) to nan,
+    e.g. to split the raw view in continuous segments
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: eye x coordinates
+    y: eye y coordinates
+    valid: sample with an eye position (EyeLink sample not missing)
+    flags: sample flags (FLAG_BLINK bit)
+    ----------------------------------------------------------------------
+    Output(s) :
+    x: eye x coordinates (nan without eye position)
+    y: eye y coordinates (nan without eye position)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    gap_logic = np.logical_or(valid == 0, (flags & FLAG_BLINK) > 0)
+    return np.where(gap_logic, np.nan, x).astype(x.dtype), np.where(gap_logic, np.nan, y).astype(y.dtype)
+
+def load_samples(h5file, run, sample_sl, columns = ('time', 'x', 'y'), view = 'raw', folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    load_samples(h5file, run, sample_sl, columns = ('time', 'x', 'y'),
+                 view = 'raw', folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Read a slice of samples of a run (only the chunks of the slice are read)
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    run: run number (0 = first)
+    sample_sl: slice of the run samples
+    columns: sample columns to read
+    view: 'raw', 'nan_blink' or 'int_blink' view of x and y (see apply_view)
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    sample_data: dictionary of column name: 1d array
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    run_group = h5file[run_alias(run, folder_alias)]
+    start_idx, stop_idx, _ = sample_sl.indices(run_group['time'].shape[0])
+    stop_idx = max(start_idx, stop_idx)
+
+    if view == 'raw' or not ('x' in columns or 'y' in columns):
+        return {column: run_group[column][start_idx:stop_idx] for column in columns}
+
+    # extend the read to the interpolations chained with the slice
+    interp_intervals = np.zeros((0,2), dtype = 'int64')
+    if view == 'int_blink' and 'interp_intervals' in run_group:
+        interp_intervals = run_group['interp_intervals'][()]
+    read_start, read_stop = start_idx, stop_idx
+    while interp_intervals.shape[0]:
+        overlap_logic = np.logical_and(interp_intervals[:,0] < read_stop, interp_intervals[:,1] > read_start)
+        if not np.sum(overlap_logic):
+            break
+        new_start = min(read_start, interp_intervals[overlap_logic,0].min())
+        new_stop = max(read_stop, interp_intervals[overlap_logic,1].max())
+        if new_start == read_start and new_stop == read_stop:
+            break
+        read_start, read_stop = new_start, new_stop
+    if interp_intervals.shape[0]:
+        interp_intervals = interp_intervals[np.logical_and(interp_intervals[:,0] < read_stop, interp_intervals[:,1] > read_start)] - read_start
+
+    x, y = apply_view(  run_group['x'][read_start:read_stop], run_group['y'][read_start:read_stop],
+                        run_group['flags'][read_start:read_stop], interp_intervals, view)
+    view_data = {'x': x[start_idx-read_start:stop_idx-read_start], 'y': y[start_idx-read_start:stop_idx-read_start]}
+
+    return {column: view_data[column] if column in view_data else run_group[column][start_idx:stop_idx] for column in columns}
+
+def load_trial(h5file, run, sequence, trial, columns = ('time', 'x', 'y'), view = 'raw', trial_index = None, folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    load_trial(h5file, run, sequence, trial, columns = ('time', 'x', 'y'),
+               view = 'raw', trial_index = None, folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Read the samples of one trial (only the chunks of the trial are read)
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    run: run number (0 = first)
+    sequence: sequence number (0 = first)
+    trial: trial number (0 = first)
+    columns: sample columns to read
+    view: 'raw', 'nan_blink' or 'int_blink' view of x and y (see apply_view)
+    trial_index: trial index (None: read from the file)
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    trial_data: dictionary of column name: 1d array
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if trial_index is None:
+        trial_index = load_trial_index(h5file, folder_alias)
+
+    trial_sl = trial_slice(trial_index, run, sequence, trial)
+
+    return load_samples(h5file, run, trial_sl, columns, view, folder_alias)
+
+def load_run(h5file, run, columns = ('time', 'x', 'y'), view = 'raw', folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    load_run(h5file, run, columns = ('time', 'x', 'y'), view = 'raw',
+             folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Read the samples of one run
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    run: run number (0 = first)
+    columns: sample columns to read
+    view: 'raw', 'nan_blink' or 'int_blink' view of x and y (see apply_view)
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    run_data: dictionary of column name: 1d array
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    return load_samples(h5file, run, slice(0, None), columns, view, folder_alias)
+
+def num_runs(h5file, folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    num_runs(h5file, folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Count the runs saved in an h5 file
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    run_num: number of runs
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    return len([name for name in h5file[folder_alias].keys() if name.startswith('run-')])
+
+def load_eye_data(h5file, columns = ('time', 'x', 'y'), view = 'raw', folder_alias = 'eye_traces'):
+    """
+    ----------------------------------------------------------------------
+    load_eye_data(h5file, columns = ('time', 'x', 'y'), view = 'raw',
+                  folder_alias = 'eye_traces')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Read all runs as one matrix (former eye_data_runs layout)
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    columns: sample columns to read
+    view: 'raw', 'nan_blink' or 'int_blink' view of x and y (see apply_view)
+    folder_alias: h5 folder of the eye traces
+    ----------------------------------------------------------------------
+    Output(s) :
+    eye_data: matrix [samples, columns + run number]
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    eye_data = []
+    for run in np.arange(0, num_runs(h5file, folder_alias), 1):
+        run_data = load_run(h5file, run, columns, view, folder_alias)
+        run_col = np.ones(run_data[columns[0]].shape[0])*run
+        eye_data.append(np.column_stack([run_data[column] for column in columns] + [run_col]))
+
+    return np.concatenate(eye_data, axis = 0)
+
+class ColumnBuilder(object):
+    """
+    ----------------------------------------------------------------------
+    ColumnBuilder(columns, capacity = 1024, dtype = 'float64')
+    ----------------------------------------------------------------------
+    Goal of the class :
+    Collect result rows in growable typed column buffers (capacity doubled
+    when full, O(n) total cost instead of a vstack per row)
+    ----------------------------------------------------------------------
+    Input(s) :
+    columns: column names
+    capacity: initial number of rows
+    dtype: type of the columns
+    ----------------------------------------------------------------------
+    Output(s) :
+    append(**values): add a row, columns not given are nan
+    to_array(): matrix [rows, columns]
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    def __init__(self, columns, capacity = 1024, dtype = 'float64'):
+        import numpy as np
+
+        self.columns = tuple(columns)
+        self.col_idx = {column: col_num for col_num, column in enumerate(self.columns)}
+        self.buffer = np.full((len(self.columns), max(int(capacity), 1)), np.nan, dtype = dtype)
+        self.num_rows = 0
+
+    def __len__(self):
+        return self.num_rows
+
+    def append(self, **values):
+        import numpy as np
+
+        if self.num_rows == self.buffer.shape[1]:
+            buffer = np.full((self.buffer.shape[0], self.buffer.shape[1]*2), np.nan, dtype = self.buffer.dtype)
+            buffer[:,:self.num_rows] = self.buffer
+            self.buffer = buffer
+        for column, value in values.items():
+            self.buffer[self.col_idx[column], self.num_rows] = value
+        self.num_rows += 1
+
+    def to_array(self):
+        return self.buffer[:,:self.num_rows].T.copy()
+
+def write_table(h5file, dataset_name, vals, columns):
+    """
+    ----------------------------------------------------------------------
+    write_table(h5file, dataset_name, vals, columns)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Write a result matrix with its column names (attribute 'columns'),
+    replacing a previous table
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    dataset_name: h5 dataset of the table (e.g. saccades/saccades_output)
+    vals: matrix [rows, columns]
+    columns: column names
+    ----------------------------------------------------------------------
+    Output(s) :
+    none
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if dataset_name in h5file:
+        del h5file[dataset_name]
+    dataset = h5file.create_dataset(dataset_name, data = vals, dtype = 'float64')
+    dataset.attrs['columns'] = [column.encode() for column in columns]
+
+def write_saccades_output(h5file, vals_all, columns = SACCADES_OUTPUT_COLUMNS, folder_alias = 'saccades'):
+    """
+    ----------------------------------------------------------------------
+    write_saccades_output(h5file, vals_all, columns = SACCADES_OUTPUT_COLUMNS,
+                          folder_alias = 'saccades')
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Write the saccade metrics matrix with its column names (attribute
+    'columns'), replacing a previous output
+    ----------------------------------------------------------------------
+    Input(s) :
+    h5file: open h5py file
+    vals_all: matrix [rows, columns]
+    columns: column names
+    folder_alias: h5 folder of the saccade metrics
+    ----------------------------------------------------------------------
+    Output(s) :
+    none
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    write_table(h5file, '{folder_alias}/saccades_output'.format(folder_alias = folder_alias), vals_all, columns)
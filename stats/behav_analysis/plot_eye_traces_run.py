@@ -41,6 +41,7 @@ deb = ipdb.set_trace
 # Specific imports
 # ----------------
 from sac_utils import draw_bg_trial
+from h5_utils import load_run
 
 # Get inputs
 # ----------
@@ -73,14 +74,13 @@ file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
 h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
 h5_file = h5py.File(h5_filename,'r')
 folder_alias = 'eye_traces'
-eye_data = np.array(h5_file['{folder_alias}/eye_data_runs_int_blink'.format(folder_alias = folder_alias)])
 
 # Draw figure
 # -----------
 axis_width = 0.75
 # eye trace analysis per run
 for run in runs:
-	run_eye_data_logic = eye_data[:,3] == run
+	run_data = load_run(h5_file, run, columns = ('time', 'x', 'y'), view = 'int_blink', folder_alias = folder_alias)
 
 	if run > 10:run_txt = '{}'.format(run+1)
 	else:run_txt = '0{}'.format(run+1)
@@ -91,13 +91,13 @@ for run in runs:
 	except: pass
 	ax1,ax2,ax3,_ = draw_bg_trial(analysis_info)
 	
-	dur_run = (eye_data[run_eye_data_logic][-1,0]-eye_data[run_eye_data_logic][0,0])
-	time_prct = (eye_data[run_eye_data_logic][:,0]- eye_data[run_eye_data_logic][0,0])/dur_run
+	dur_run = (run_data['time'][-1]-run_data['time'][0])
+	time_prct = (run_data['time']- run_data['time'][0])/dur_run
 	
 
-	ax1.plot(time_prct,eye_data[run_eye_data_logic,1],color = [0.5,0.5,0.5],linewidth = axis_width*1.5)
-	ax2.plot(time_prct,eye_data[run_eye_data_logic,2],color = [0.5,0.5,0.5],linewidth = axis_width*1.5)
-	ax3.plot(eye_data[run_eye_data_logic,1],eye_data[run_eye_data_logic,2],color = [0.5,0.5,0.5],linewidth = axis_width*1.5)
+	ax1.plot(time_prct,run_data['x'],color = [0.5,0.5,0.5],linewidth = axis_width*1.5)
+	ax2.plot(time_prct,run_data['y'],color = [0.5,0.5,0.5],linewidth = axis_width*1.5)
+	ax3.plot(run_data['x'],run_data['y'],color = [0.5,0.5,0.5],linewidth = axis_width*1.5)
 	ax3.text(8, -10, 'Run {run}'.format(run = run+1), horizontalalignment = 'left', verticalalignment = 'center', fontsize = 14)
 
 	plt.savefig("{file_dir}/add/figures/{task}/run-{run_txt}/{sub}_task-{task}_run-{run_txt}_eyetraces.png".format(
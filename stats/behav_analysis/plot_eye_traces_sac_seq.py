@@ -43,6 +43,7 @@ deb = ipdb.set_trace
 # Specific imports
 # ----------------
 from sac_utils import draw_bg_trial
+from h5_utils import load_trial_index, load_trial
 
 # Get inputs
 # ----------
@@ -78,7 +79,7 @@ file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
 h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
 h5_file = h5py.File(h5_filename,'r')
 folder_alias = 'eye_traces'
-eye_data = np.array(h5_file['{folder_alias}/eye_data_runs_int_blink'.format(folder_alias = folder_alias)])
+trial_index = load_trial_index(h5_file, folder_alias)
 time_start_seq = np.array(h5_file['{folder_alias}/time_start_seq'.format(folder_alias = folder_alias)])
 time_end_seq = np.array(h5_file['{folder_alias}/time_end_seq'.format(folder_alias = folder_alias)])
 
@@ -113,8 +114,6 @@ trials_seq = saccades_tr
 axis_width = 0.75
 # eye trace analysis per run
 for run in runs:
-	run_eye_data_logic = eye_data[:,3] == run
-
 	if run > 10:run_txt = '{}'.format(run+1)
 	else:run_txt = '0{}'.format(run+1)
 
@@ -126,8 +125,6 @@ for run in runs:
 	for sequence in eye_mov_seq:
 
 		trials = np.arange(0,trials_seq[sequence],1)
-		seq_eye_data_logic = np.logical_and(eye_data[:,0] >= time_start_seq[sequence,run],\
-		                                    eye_data[:,0] <= time_end_seq[sequence,run])
 
 		dur_seq = time_end_seq[sequence,run]-time_start_seq[sequence,run]
 
@@ -139,18 +136,15 @@ for run in runs:
 		for trial_num,trial_plot in enumerate(trials_seq):
 
 
-			trial_eye_data_logic = np.logical_and( 	eye_data[:,0] >= time_start_trial[trial_plot,sequence,run],
-													eye_data[:,0] <= time_end_trial[trial_plot,sequence,run])
-
-			data_logic = np.logical_and.reduce(np.array((run_eye_data_logic,seq_eye_data_logic,trial_eye_data_logic)))
+			trial_data = load_trial(h5_file, run, sequence, trial_plot, columns = ('time', 'x', 'y'), view = 'int_blink', trial_index = trial_index)
 
 
-			time_prct = ((eye_data[data_logic][:,0]- time_start_seq[sequence,run])/dur_seq)
+			time_prct = ((trial_data['time']- time_start_seq[sequence,run])/dur_seq)
 			plot_color = saccade_col_mat[trial_num,:]
 
-			ax1.plot(time_prct,eye_data[data_logic,1],color = plot_color,linewidth = axis_width*1.5)
-			ax2.plot(time_prct,eye_data[data_logic,2],color = plot_color,linewidth = axis_width*1.5)
-			ax3.plot(eye_data[data_logic,1],eye_data[data_logic,2],color = plot_color,linewidth = axis_width*1.5)
+			ax1.plot(time_prct,trial_data['x'],color = plot_color,linewidth = axis_width*1.5)
+			ax2.plot(time_prct,trial_data['y'],color = plot_color,linewidth = axis_width*1.5)
+			ax3.plot(trial_data['x'],trial_data['y'],color = plot_color,linewidth = axis_width*1.5)
 			ax3.text(5, -10, 'Run {run_txt} - Seq {sequence_txt}'.format(run_txt = run+1, sequence_txt = sequence+1), horizontalalignment = 'left', verticalalignment = 'center', fontsize = 14)
 
 		plt.savefig("{file_dir}/add/figures/{task}/run-{run_txt}/{sub}_task-{task}_run-{run_txt}_seq-{sequence_txt}_eyetraces.png".format(
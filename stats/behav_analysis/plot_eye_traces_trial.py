@@ -43,6 +43,7 @@ deb = ipdb.set_trace
 # Specific imports
 # ----------------
 from sac_utils import draw_bg_trial
+from h5_utils import load_trial_index, load_trial
 
 # Get inputs
 # ----------
@@ -81,8 +82,7 @@ file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
 h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
 h5_file = h5py.File(h5_filename,'r')
 eye_traces_alias = 'eye_traces'
-eye_data = np.array(h5_file['{folder_alias}/eye_data_runs'.format(folder_alias = eye_traces_alias)])
-eye_data_int_blink = np.array(h5_file['{folder_alias}/eye_data_runs_int_blink'.format(folder_alias = eye_traces_alias)])
+trial_index = load_trial_index(h5_file, eye_traces_alias)
 time_start_seq = np.array(h5_file['{folder_alias}/time_start_seq'.format(folder_alias = eye_traces_alias)])
 time_end_seq = np.array(h5_file['{folder_alias}/time_end_seq'.format(folder_alias = eye_traces_alias)])
 
@@ -98,15 +98,12 @@ linewidth_sac = axis_width*4
 screen_val =  12.5
 
 for run in runs:
-	run_eye_data_logic = eye_data[:,3] == run
 	run_saccade_logic = saccades_output[:,0] == run
 	if run >= 9:run_txt = '{}'.format(run+1)
 	else:run_txt = '0{}'.format(run+1)
 
 	for sequence in sequences:
 		trials = np.arange(0,trials_seq[sequence],1)
-		seq_eye_data_logic = np.logical_and(eye_data[:,0] >= time_start_seq[sequence,run],\
-											eye_data[:,0] <= time_end_seq[sequence,run])
 		sequence_saccade_logic = saccades_output[:,1] == sequence
 
 		if sequence >= 9:sequence_txt = '{}'.format(sequence+1)
@@ -123,18 +120,18 @@ for run in runs:
 
 			t_trial_start = time_start_trial[trial,sequence,run]
 			t_trial_end = time_end_trial[trial,sequence,run]
-			trial_eye_data_logic = np.logical_and(  eye_data[:,0] >= t_trial_start,\
-													eye_data[:,0] <= t_trial_end)
 			trial_saccade_logic = saccades_output[:,2] == trial
             
-			eye_data_logic = np.logical_and.reduce(np.array((run_eye_data_logic,seq_eye_data_logic,trial_eye_data_logic)))
+			trial_data = load_trial(h5_file, run, sequence, trial, trial_index = trial_index, folder_alias = eye_traces_alias)
+			trial_data_int_blink = load_trial(h5_file, run, sequence, trial, columns = ('x', 'y'), view = 'int_blink',
+			                                  trial_index = trial_index, folder_alias = eye_traces_alias)
 			saccade_logic = np.logical_and.reduce(np.array((run_saccade_logic,sequence_saccade_logic,trial_saccade_logic)))
 
 			# trial start and end
 			# define trial start and trial end
-			time_prct = ((eye_data[eye_data_logic][:,0]- t_trial_start)/(t_trial_end - t_trial_start))
-			t, p, x, y = eye_data[eye_data_logic,0],time_prct,eye_data[eye_data_logic,1],eye_data[eye_data_logic,2]
-			xnb, ynb = eye_data_int_blink[eye_data_logic,1],eye_data_int_blink[eye_data_logic,2]
+			time_prct = ((trial_data['time']- t_trial_start)/(t_trial_end - t_trial_start))
+			t, p, x, y = trial_data['time'],time_prct,trial_data['x'],trial_data['y']
+			xnb, ynb = trial_data_int_blink['x'],trial_data_int_blink['y']
 
 			ax1,ax2,ax3,cbar_axis = draw_bg_trial(analysis_info,True)
 			# plot whole trial
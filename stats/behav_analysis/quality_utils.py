@@ -0,0 +1,125 @@
+import numpy as np
+
+from h5_utils import FLAG_BLINK
+
+# columns of the quality/quality_{trial,sequence,run} tables (see extract_quality.py)
+QUALITY_COLUMNS = ( 'run', 'sequence', 'trial', 'fix_trials', 'duration', 'track_loss', 'blinks',
+                    'blink_rate', 'precision_rms', 'accuracy')
+
+# per trial counts of quality_counts (summed over trials by quality_table)
+COUNT_COLUMNS = ('valid', 'blinks', 's2s_sq', 's2s_num', 'dist', 'dist_num')
+
+def quality_counts(t, x, y, valid, flags, trial_start, trial_stop, sampling_rate):
+    """
+    ----------------------------------------------------------------------
+    quality_counts(t, x, y, valid, flags, trial_start, trial_stop,
+                   sampling_rate)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Sum the data quality counts of all trials of a run in one pass over
+    its samples (trial label of each sample and weighted bincounts)
+    ----------------------------------------------------------------------
+    Input(s) :
+    t: time stamps of the run samples (ms)
+    x: eye x coordinates (raw, dva from screen center)
+    y: eye y coordinates (raw, dva from screen center)
+    valid: sample with an eye position (EyeLink sample not missing)
+    flags: sample flags (FLAG_BLINK bit)
+    trial_start: trials first sample index (sorted, not overlapping)
+    trial_stop: trials last sample index + 1
+    sampling_rate: eye tracking sampling rate
+    ----------------------------------------------------------------------
+    Output(s) :
+    counts: matrix [trials, COUNT_COLUMNS]
+    counts[:,0]: samples with an eye position
+    counts[:,1]: blinks starting in the trial
+    counts[:,2]: sum of the squared sample to sample distances (dva2)
+    counts[:,3]: number of sample to sample distances
+    counts[:,4]: sum of the distances to screen center (dva)
+    counts[:,5]: number of distances to screen center
+    (distances between consecutive samples with an eye position, out of
+    blinks, without missing time stamps)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    num_samples, num_trials = t.shape[0], trial_start.shape[0]
+
+    # trial of each sample (num_trials = out of the trials)
+    sample_idx = np.arange(num_samples)
+    label = np.searchsorted(trial_start, sample_idx, side = 'right') - 1
+    in_logic = label >= 0
+    in_logic[in_logic] = sample_idx[in_logic] < trial_stop[label[in_logic]]
+    label = np.where(in_logic, label, num_trials)
+
+    def trial_sum(label, weights):
+        return np.bincount(label, weights = weights, minlength = num_trials+1)[:num_trials]
+
+    blink_logic = (flags & FLAG_BLINK) > 0
+    blink_onset = np.logical_and(blink_logic, np.append(False, ~blink_logic[:-1]))
+    usable_logic = np.logical_and(valid > 0, ~blink_logic)
+    x, y = x.astype('float64'), y.astype('float64')
+
+    # sample to sample distances within the trials
+    s2s_logic = np.logical_and.reduce((usable_logic[1:], usable_logic[:-1], label[1:] == label[:-1],
+                                       np.diff(t) == 1000/sampling_rate))
+    s2s_sq = np.where(s2s_logic, np.diff(x)**2 + np.diff(y)**2, 0)
+
+    dist = np.where(usable_logic, np.hypot(x, y), 0)
+
+    return np.column_stack((trial_sum(label, valid > 0), trial_sum(label, blink_onset),
+                            trial_sum(label[1:], s2s_sq), trial_sum(label[1:], s2s_logic),
+                            trial_sum(label, dist), trial_sum(label, usable_logic)))
+
+def quality_table(keys, duration, counts, fix_logic, sampling_rate):
+    """
+    ----------------------------------------------------------------------
+    quality_table(keys, duration, counts, fix_logic, sampling_rate)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Data quality metrics of groups of trials (trials, sequences or runs),
+    from the summed counts of their trials
+    ----------------------------------------------------------------------
+    Input(s) :
+    keys: matrix [trials, 3] of run, sequence and trial numbers, with nan
+          for the levels summed over (e.g. trial = nan: per sequence)
+    duration: trials duration (ms, onset <= time <= offset)
+    counts: trials counts (from quality_counts)
+    fix_logic: fixation trials (target at screen center), the only ones
+               used for precision and accuracy
+    sampling_rate: eye tracking sampling rate
+    ----------------------------------------------------------------------
+    Output(s) :
+    table: matrix [groups, QUALITY_COLUMNS]
+    table[:,3]: number of fixation trials
+    table[:,4]: duration (ms)
+    table[:,5]: track loss (proportion of samples without eye position)
+    table[:,6]: blinks
+    table[:,7]: blink rate (blinks/min)
+    table[:,8]: RMS sample to sample precision in fixation trials (dva)
+    table[:,9]: accuracy, mean distance to the target at screen center in
+                fixation trials (dva)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    group_keys, group_num = np.unique(np.nan_to_num(keys, nan = -1), axis = 0, return_inverse = True)
+    group_num = group_num.ravel()
+
+    def group_sum(weights):
+        return np.bincount(group_num, weights = weights, minlength = group_keys.shape[0])
+
+    expected = duration*sampling_rate/1000 + 1
+    fix_counts = counts*fix_logic[:,np.newaxis]
+    group_dur, group_expected = group_sum(duration), group_sum(expected)
+    group_blinks = group_sum(counts[:,1])
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        table = np.column_stack((   np.where(group_keys < 0, np.nan, group_keys),
+                                    group_sum(fix_logic), group_dur,
+                                    np.clip(1 - group_sum(counts[:,0])/group_expected, 0, 1),
+                                    group_blinks, group_blinks/(group_dur/60000),
+                                    np.sqrt(group_sum(fix_counts[:,2])/group_sum(fix_counts[:,3])),
+                                    group_sum(fix_counts[:,4])/group_sum(fix_counts[:,5])))
+
+    return table
@@ -0,0 +1,135 @@
+"""
+-----------------------------------------------------------------------------------------
+replay_online.py
+-----------------------------------------------------------------------------------------
+Goal of the script:
+Replay the samples of an EyeLink recording through the online saccade detector
+(sac_utils.OnlineSaccadeDetector) in blocks, at real-time rate, as during acquisition,
+and check that it finds the saccades of the batch detection
+-----------------------------------------------------------------------------------------
+Input(s):
+sys.argv[1]: eye tracking file (.edf or .asc converted with edf2asc -miss -1.0)
+sys.argv[2]: replay speed (optional, default 1 = real time, 0 = no waiting)
+sys.argv[3]: block duration in ms (optional, default 10)
+-----------------------------------------------------------------------------------------
+Output(s):
+saccades printed when detected (gaze in pixels), detection latency and batch check
+-----------------------------------------------------------------------------------------
+To run:
+cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
+python behav_analysis/replay_online.py ../data/sub-01/func/sub-01_task-EyeMov_run-01_eyeData.edf
+-----------------------------------------------------------------------------------------
+"""
+
+# Stop warnings
+# -------------
+import warnings
+warnings.filterwarnings("ignore")
+
+# General imports
+# ---------------
+import sys
+import platform
+import json
+import time
+import numpy as np
+
+# Specific imports
+# ----------------
+from sac_utils import OnlineSaccadeDetector, detect_saccades, vecvel, velocity_noise, split_segments
+from edf_utils import parse_asc, load_edf_data
+
+# Get inputs
+# ----------
+eye_filename = sys.argv[1]
+if len(sys.argv) > 2: replay_speed = float(sys.argv[2])
+else: replay_speed = 1.0
+if len(sys.argv) > 3: block_dur = float(sys.argv[3])
+else: block_dur = 10.0
+
+# Define analysis parameters
+# --------------------------
+with open('behavior_settings.json') as f:
+	json_s = f.read()
+	analysis_info = json.loads(json_s)
+sampling_rate = analysis_info['sampling_rate']
+velocity_th = analysis_info['velocity_th']
+min_dur = analysis_info['min_dur']
+merge_interval = analysis_info['merge_interval']
+block_samples = max(int(block_dur*sampling_rate/1000), 1)
+
+# Platform settings
+# -----------------
+if platform.system() == 'Darwin':
+	edf2asc_cmd = '{}/edf2asc'.format(analysis_info['edf2asc_dir_mac'])
+	edfapi_lib = analysis_info['edfapi_lib_mac']
+
+elif platform.system() == 'Windows':
+	edf2asc_cmd = '{}/edf2asc.exe'.format(analysis_info['edf2asc_dir_win'])
+	edfapi_lib = analysis_info['edfapi_lib_win']
+
+elif platform.system() == 'Linux':
+	edf2asc_cmd = 'edf2asc'
+	edfapi_lib = analysis_info['edfapi_lib_unix']
+
+# Load samples
+# ------------
+if eye_filename.endswith('.asc'):
+	edf_data = parse_asc(eye_filename)
+else:
+	edf_data, _ = load_edf_data(eye_filename, analysis_info['edf_reader'], edfapi_lib, edf2asc_cmd)
+
+# continuous streams of valid samples (missing samples and time jumps end a stream)
+valid_logic = edf_data['x'] != -1
+t = edf_data['time'][valid_logic]
+x = edf_data['x'][valid_logic].astype('float32')
+y = edf_data['y'][valid_logic].astype('float32')
+seg_starts, seg_stops = split_segments(t, sampling_rate)
+print('samples: {}, streams: {}, blocks of {} samples, speed: {}'.format(t.shape[0], seg_starts.shape[0], block_samples, replay_speed))
+
+# Real-time replay
+# ----------------
+# running noise estimate, as during acquisition (kept across the streams split by blinks)
+detector = OnlineSaccadeDetector(sampling_rate, velocity_th, min_dur, merge_interval)
+latency = []
+num_sac = 0
+wall_start = time.time()
+for seg_start, seg_stop in zip(seg_starts, seg_stops):
+	for block_start in np.arange(seg_start, seg_stop, block_samples):
+		block_stop = min(block_start + block_samples, seg_stop)
+
+		# wait for the time of the last sample of the block
+		if replay_speed > 0:
+			wait_dur = (t[block_stop-1] - t[0])/1000/replay_speed - (time.time() - wall_start)
+			if wait_dur > 0: time.sleep(wait_dur)
+
+		sac = detector.push(x[block_start:block_stop], y[block_start:block_stop])
+		if block_stop == seg_stop:
+			sac = np.concatenate((sac, detector.finish()))
+
+		for sac_onset, sac_offset, sac_amp_x, sac_amp_y in zip(sac['onset'], sac['offset'], sac['amp_x'], sac['amp_y']):
+			num_sac += 1
+			latency.append((block_stop - seg_start - 1 - sac_offset)*1000/sampling_rate)
+			print('{} ms: saccade of {:.0f} ms, amplitude {:.1f} pixels'.format(t[seg_start+sac_onset], (sac_offset-sac_onset)*1000/sampling_rate, np.hypot(sac_amp_x, sac_amp_y)))
+replay_dur = time.time() - wall_start
+
+# Batch check
+# -----------
+# same noise estimate as the batch detection of each stream: identical saccades expected
+same_sac = True
+for seg_start, seg_stop in zip(seg_starts, seg_stops):
+	seg_x, seg_y = x[seg_start:seg_stop], y[seg_start:seg_stop]
+	if seg_x.shape[0] < 6: continue
+	msd = velocity_noise(*vecvel(seg_x, seg_y, sampling_rate))
+	detector = OnlineSaccadeDetector(sampling_rate, velocity_th, min_dur, merge_interval, msd = msd)
+	sac_online = [detector.push(seg_x[block_start:block_start+block_samples], seg_y[block_start:block_start+block_samples])
+				  for block_start in np.arange(0, seg_x.shape[0], block_samples)]
+	sac_online = np.concatenate(sac_online + [detector.finish()])
+	sac_batch = detect_saccades(seg_x, seg_y, sampling_rate, velocity_th, min_dur, merge_interval, use_kernel = False, msd = msd)
+	same_sac = same_sac and np.array_equal(sac_online, sac_batch)
+
+# Report
+# ------
+print('replay: {:.1f} s for {:.1f} s of recording'.format(replay_dur, (t[-1]-t[0])/1000))
+print('saccades: {}, latency after offset: {:.1f} ms (max {:.1f} ms)'.format(num_sac, np.mean(latency) if num_sac else np.nan, np.max(latency) if num_sac else np.nan))
+print('identical saccades with the batch detection (fixed noise): {}'.format(same_sac))
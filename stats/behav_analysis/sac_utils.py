@@ -1,3 +1,25 @@
+import numpy as np
+
+# optional compiled saccade detection kernel (numpy code path if numba is missing)
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# detected saccades (microsacc_merge, eyelink_sacc, detect_saccades), sample indices
+MSAC_DTYPE = [('onset', 'i8'), ('offset', 'i8'), ('vpeak', 'f8'), ('dx', 'f8'), ('dy', 'f8'),
+              ('amp_x', 'f8'), ('amp_y', 'f8')]
+
+# saccade parameters (saccpar)
+SAC_DTYPE = [('onset', 'i8'), ('offset', 'i8'), ('dur', 'f8'), ('vpeak', 'f8'), ('dist', 'f8'),
+             ('angle', 'f8'), ('amp', 'f8'), ('amp_angle', 'f8')]
+
+# target steps (saccade_latency), time in ms and positions in dva
+STEP_DTYPE = [('run', 'i8'), ('time', 'f8'), ('x_from', 'f8'), ('y_from', 'f8'), ('x_to', 'f8'), ('y_to', 'f8')]
+
+# saccade of each target step (saccade_latency)
+LATENCY_DTYPE = [('sac_idx', 'i8'), ('latency', 'f8'), ('gain', 'f8'), ('landing_error', 'f8')]
+
 def vecvel(x,y,sampling_rate):
     """
     ----------------------------------------------------------------------
@@ -36,10 +58,137 @@ def vecvel(x,y,sampling_rate):
 
     return vx,vy
 
-def microsacc_merge(x,y,vx,vy,velocity_th,min_dur,merge_interval):
+def vecvel_segments(x,y,sampling_rate,t = None):
+    """
+    ----------------------------------------------------------------------
+    vecvel_segments(x,y,sampling_rate,t = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Compute eye velocity within the continuous segments of the time
+    series (split at nan samples and missing time stamps), the vecvel
+    stencil and edges applied to every segment in one pass
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    sampling_rate: eye tracking sampling rate
+    t: time stamps of the time series (ms, optional)
+    ----------------------------------------------------------------------
+    Output(s) :
+    vx: velocity, horizontal component (nan out of the segments, 0 in
+        segments shorter than 3 samples)
+    vy: velocity, vertical component
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if t is None:
+        t = np.arange(x.shape[0])*1000/sampling_rate
+    seg_start, seg_stop = split_segments(t,sampling_rate,x,y)
+
+    # position of the samples in their segment
+    seg_len = seg_stop - seg_start
+    seg_num = np.repeat(np.arange(seg_start.shape[0]), seg_len)
+    idx = np.arange(seg_num.shape[0]) - (np.cumsum(seg_len) - seg_len)[seg_num] + seg_start[seg_num]
+    idx_seg, len_seg = idx - seg_start[seg_num], seg_len[seg_num]
+
+    vx, vy = np.full_like(x, np.nan), np.full_like(y, np.nan)
+    vx[idx], vy[idx] = 0, 0
+
+    # 5 points stencil inside the segments (as vecvel: v[2:n-3])
+    i = idx[np.logical_and(idx_seg >= 2, idx_seg <= len_seg-4)]
+    vx[i] = sampling_rate/6 * (x[i+2] + x[i+1] - x[i-1] - x[i-2])
+    vy[i] = sampling_rate/6 * (y[i+2] + y[i+1] - y[i-1] - y[i-2])
+
+    # second and second to last samples of the segments (as vecvel: v[1], v[n-2])
+    i = idx[np.logical_and(len_seg >= 3, np.logical_or(idx_seg == 1, idx_seg == len_seg-2))]
+    vx[i] = sampling_rate/2*(x[i+1] - x[i-1])
+    vy[i] = sampling_rate/2*(y[i+1] - y[i-1])
+
+    return vx, vy
+
+def velocity_noise(vx,vy):
+    """
+    ----------------------------------------------------------------------
+    velocity_noise(vx,vy)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Median based estimate of the velocity noise (saccade threshold unit),
+    medians by selection (np.partition, O(n)) instead of sorting
+    ----------------------------------------------------------------------
+    Input(s) :
+    vx: velocity horizontal components of the time series
+    vy: velocity vertical components of the time series
+    ----------------------------------------------------------------------
+    Output(s):
+    msdx: horizontal velocity noise
+    msdy: vertical velocity noise
+    (mean based estimate if the median one is 0 or nan, ValueError if it
+    is 0 too)
+    ----------------------------------------------------------------------
+    Function created by Martin Rolfs
+    adapted by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    def select_median(v):
+        n = v.shape[0]
+        if n == 0 or np.isnan(v).any():
+            return v.dtype.type(np.nan)
+        part = np.partition(v, [(n-1)//2, n//2])
+        return (part[(n-1)//2] + part[n//2])/v.dtype.type(2)
+
+    msdx = np.sqrt(select_median(vx*vx) - select_median(vx)**2)
+    msdy = np.sqrt(select_median(vy*vy) - select_median(vy)**2)
+
+    if not msdx >= np.nextafter(0,1):
+        msdx = np.sqrt(np.mean(vx**2) - (np.mean(vx))**2)
+        if not msdx >= np.nextafter(0,1):
+            raise ValueError('msdx < realmin: no horizontal velocity noise')
+
+    if not msdy >= np.nextafter(0,1):
+        msdy = np.sqrt(np.mean(vy**2) - (np.mean(vy))**2 )
+        if not msdy >= np.nextafter(0,1):
+            raise ValueError('msdy < realmin: no vertical velocity noise')
+
+    return msdx, msdy
+
+def sequence_noise(trials_xy,sampling_rate,trials_v = None):
+    """
+    ----------------------------------------------------------------------
+    sequence_noise(trials_xy,sampling_rate,trials_v = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Velocity noise of a block of trials (sequence), estimated once on the
+    pooled trial velocities and reused as threshold unit of every trial
+    ----------------------------------------------------------------------
+    Input(s) :
+    trials_xy: list of (x, y) raw data of the trials
+    sampling_rate: eye tracking sampling rate
+    trials_v: list of (vx, vy) velocities of the trials (vecvel of
+              trials_xy if None, nan samples e.g. blinks not pooled)
+    ----------------------------------------------------------------------
+    Output(s):
+    msd: velocity noise (msdx, msdy), None without trials
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if trials_v is None: v_trials = [vecvel(x,y,sampling_rate) for x, y in trials_xy]
+    else: v_trials = list(trials_v)
+    if len(v_trials) == 0:
+        return None
+
+    vx = np.concatenate([vx for vx, vy in v_trials])
+    vy = np.concatenate([vy for vx, vy in v_trials])
+    valid_logic = ~np.isnan(vx)
+
+    return velocity_noise(vx[valid_logic],vy[valid_logic])
+
+def microsacc_merge(x,y,vx,vy,velocity_th,min_dur,merge_interval,msd = None):
     """
     ----------------------------------------------------------------------
-    microsacc_merge(x,y,vx,vy,velocity_th,min_duration,merge_interval)
+    microsacc_merge(x,y,vx,vy,velocity_th,min_duration,merge_interval,
+                    msd = None)
     ----------------------------------------------------------------------
     Goal of the function :
     Detection of monocular candidates for microsaccades
@@ -52,37 +201,30 @@ def microsacc_merge(x,y,vx,vy,velocity_th,min_dur,merge_interval):
     velocity_th: velocity threshold
     min_dur: saccade minimum duration
     merge_interval: merge interval for subsequent saccade candidates
+    msd: velocity noise (msdx, msdy) of the block (velocity_noise of vx,vy
+         if None)
     ----------------------------------------------------------------------
     Output(s):
-    out_val(0:num,0)   onset of saccade
-    out_val(0:num,1)   end of saccade
-    out_val(1:num,2)   peak velocity of saccade (vpeak)
-    out_val(1:num,3)   saccade vector horizontal component
-    out_val(1:num,4)   saccade vector vertical component
-    out_val(1:num,5)   saccade horizontal amplitude whole sequence
-    out_val(1:num,6)   saccade vertical amplitude whole sequence
+    out_val: structured array (MSAC_DTYPE), one record per saccade
+    out_val['onset']   onset of saccade
+    out_val['offset']  end of saccade
+    out_val['vpeak']   peak velocity of saccade (vpeak)
+    out_val['dx']      saccade vector horizontal component
+    out_val['dy']      saccade vector vertical component
+    out_val['amp_x']   saccade horizontal amplitude whole sequence
+    out_val['amp_y']   saccade vertical amplitude whole sequence
     ----------------------------------------------------------------------
     Function created by Martin Rolfs
     adapted by Martin SZINTE (mail@martinszinte.net)
     ----------------------------------------------------------------------
     """
     import numpy as np
-    import os
-
 
     # compute threshold
-    msdx = np.sqrt(np.median(vx**2) - (np.median(vx))**2)
-    msdy = np.sqrt(np.median(vy**2) - (np.median(vy))**2)
-
-    if np.isnan(msdx):
-        msdx = np.sqrt(np.mean(vx**2) - (np.mean(vx))**2)
-        if msdx < np.nextafter(0,1):
-            os.error('msdx < realmin')
-
-    if np.isnan(msdy):
-        msdy = np.sqrt(np.mean(vy**2) - (np.mean(vy))**2 )
-        if msdy < np.nextafter(0,1):
-            os.error('msdy < realmin')
+    if msd is None:
+        msdx, msdy = velocity_noise(vx,vy)
+    else:
+        msdx, msdy = msd
 
     radiusx = velocity_th*msdx;
     radiusy = velocity_th*msdy;
@@ -91,92 +233,730 @@ def microsacc_merge(x,y,vx,vy,velocity_th,min_dur,merge_interval):
     test = (vx/radiusx)**2 + (vy/radiusy)**2;
     indx = np.where(test>1)[0];
 
-    # determine saccades
-    N, nsac, dur, a, k = indx.shape[0], 0, 0, 0, 0
-
-    while k < N-1:
-        if indx[k+1]-indx[k]==1:
-            dur += 1
-        else:
-            if dur >= min_dur:
-                nsac += 1
-                b = k
-                if nsac == 1:
-                    sac = np.array([indx[a],indx[b]])
-                else:
-                    sac = np.vstack((sac, np.array([indx[a],indx[b]])))
-            a = k+1
-            dur = 1
-
-        k += 1
+    # determine saccades (runs of consecutive indices above threshold)
+    N = indx.shape[0]
+    run_bound = np.flatnonzero(np.diff(indx) != 1)
+    run_start = np.append(0, run_bound + 1)
+    run_end = np.append(run_bound, N - 1)
+    run_dur = run_end - run_start + 1
+    run_dur[0] -= 1     # first run counted from its second sample (as in the former loop)
 
     # check for minimum duration
-    if dur >= min_dur:
-        nsac += 1;
-        b = k;
-        if nsac == 1:
-            sac = np.array([indx[a],indx[b]])
-        else:
-            sac = np.vstack((sac, np.array([indx[a],indx[b]])))
+    dur_logic = run_dur >= min_dur
+    sac = np.column_stack((indx[run_start[dur_logic]], indx[run_end[dur_logic]]))
+    nsac = sac.shape[0]
 
-    # merge saccades
+    # merge saccades separated by less than merge_interval samples
     if nsac > 0:
-        msac = np.copy(sac)
-        s    = 0
-        sss  = True
-        nsac = 1
-        while s < nsac-1:
-            if sss == False:
-                nsac += 1
-                msac[nsac,:] = sac[s,:]
-            if sac[s+1,0]-sac[s,1] <= merge_interval:
-                msac[1] = sac[s+1,1]
-                sss = True
-            else:
-                sss = False
-            s += 1
-        if sss == False:
-            nsac += 1
-            msac[nsac,:] = sac[s,:]
+        merge_logic = (sac[1:,0] - sac[:-1,1]) <= merge_interval
+        msac = np.column_stack((sac[np.append(True, ~merge_logic),0], sac[np.append(~merge_logic, True),1]))
     else:
-        msac = []
-        nsac = 0
+        msac = sac
 
     # compute peak velocity, horizonal and vertical components
+    out_val = sacc_records(x, y, np.sqrt(vx**2 + vy**2), msac[:,0], msac[:,1])
+
+    return out_val
+
+def segment_extrema(v,seg_start,seg_stop):
+    """
+    ----------------------------------------------------------------------
+    segment_extrema(v,seg_start,seg_stop)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Minimum and maximum of a time series within segments, and index of
+    their first occurrence, for all segments in a fixed number of passes
+    ----------------------------------------------------------------------
+    Input(s) :
+    v: time series
+    seg_start: segments first sample index
+    seg_stop: segments last sample index + 1 (at least one sample used)
+    ----------------------------------------------------------------------
+    Output(s):
+    seg_min: minimum of each segment
+    seg_argmin: index in v of the first minimum of each segment
+    seg_max: maximum of each segment
+    seg_argmax: index in v of the first maximum of each segment
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    seg_start = np.asarray(seg_start, dtype = 'int64')
+    seg_len = np.maximum(np.asarray(seg_stop, dtype = 'int64') - seg_start, 1)
+
+    # samples of all segments put end to end
+    seg_first = np.cumsum(seg_len) - seg_len
+    seg_num = np.repeat(np.arange(seg_len.shape[0]), seg_len)
+    seg_idx = np.arange(seg_num.shape[0]) - seg_first[seg_num] + seg_start[seg_num]
+    seg_v = v[seg_idx]
+
+    seg_min = np.minimum.reduceat(seg_v, seg_first)
+    seg_max = np.maximum.reduceat(seg_v, seg_first)
+
+    # first sample equal to the segment extremum (segment start if none, e.g. nan)
+    seg_arg = []
+    for seg_ext in [seg_min, seg_max]:
+        ext_pos = np.flatnonzero(seg_v == seg_ext[seg_num])
+        ext_num, ext_first = np.unique(seg_num[ext_pos], return_index = True)
+        seg_argext = np.copy(seg_first)
+        seg_argext[ext_num] = ext_pos[ext_first]
+        seg_arg.append(seg_idx[seg_argext])
+
+    return seg_min, seg_arg[0], seg_max, seg_arg[1]
+
+def sacc_amplitude(x,y,seg_start,seg_stop):
+    """
+    ----------------------------------------------------------------------
+    sacc_amplitude(x,y,seg_start,seg_stop)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Compute saccades amplitude components (whole sequence extent)
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    seg_start: saccades first sample index
+    seg_stop: saccades last sample index + 1
+    ----------------------------------------------------------------------
+    Output(s):
+    dX: saccade horizontal amplitude (positive if maximum after minimum)
+    dY: saccade vertical amplitude (positive if maximum after minimum)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    minx, minix, maxx, maxix = segment_extrema(x, seg_start, seg_stop)
+    miny, miniy, maxy, maxiy = segment_extrema(y, seg_start, seg_stop)
+    dX = np.sign(maxix-minix)*(maxx-minx)
+    dY = np.sign(maxiy-miniy)*(maxy-miny)
+
+    return dX, dY
+
+def sacc_records(x,y,v,sac_onset,sac_offset):
+    """
+    ----------------------------------------------------------------------
+    sacc_records(x,y,v,sac_onset,sac_offset)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Saccade records of detected onsets/offsets, metrics over
+    [onset, offset[ (common output of the saccade detectors)
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    v: velocity norm of the time series
+    sac_onset: saccades first sample index
+    sac_offset: saccades last sample index
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: structured array (MSAC_DTYPE), one record per saccade
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    out_val = np.zeros(len(sac_onset), dtype = MSAC_DTYPE)
+
+    if out_val.shape[0] > 0:
+        a, b = np.asarray(sac_onset, dtype = 'int64'), np.asarray(sac_offset, dtype = 'int64')
+
+        # onset and offset
+        out_val['onset'], out_val['offset'] = a, b
+
+        # saccade peak velocity (vpeak)
+        _, _, out_val['vpeak'], _ = segment_extrema(v, a, b)
+
+        # saccade vector (dx,dy)
+        out_val['dx'] = x[b]-x[a]
+        out_val['dy'] = y[b]-y[a]
+
+        # saccade amplitude (dX,dY)
+        out_val['amp_x'], out_val['amp_y'] = sacc_amplitude(x, y, a, b)
+
+    return out_val
+
+def above_runs(above,min_dur,merge_interval):
+    """
+    ----------------------------------------------------------------------
+    above_runs(above,min_dur,merge_interval)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Runs of consecutive samples above a threshold lasting at least
+    min_dur samples, merged when separated by at most merge_interval
+    samples
+    ----------------------------------------------------------------------
+    Input(s) :
+    above: boolean time series (sample above threshold)
+    min_dur: minimum duration (samples)
+    merge_interval: merge interval for subsequent runs (samples)
+    ----------------------------------------------------------------------
+    Output(s):
+    run_onset: runs first sample index
+    run_offset: runs last sample index
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    edges = np.diff(np.concatenate(([0], np.asarray(above, dtype = 'int8'), [0])))
+    run_onset, run_offset = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+    dur_logic = run_offset - run_onset + 1 >= min_dur
+    run_onset, run_offset = run_onset[dur_logic], run_offset[dur_logic]
+
+    if run_onset.shape[0] > 0:
+        merge_logic = (run_onset[1:] - run_offset[:-1]) <= merge_interval
+        run_onset, run_offset = run_onset[np.append(True, ~merge_logic)], run_offset[np.append(~merge_logic, True)]
+
+    return run_onset, run_offset
+
+def _ek_kernel(x,y,sampling_rate,velocity_th,min_dur,merge_interval,msdx,msdy):
+    """
+    ----------------------------------------------------------------------
+    _ek_kernel(x,y,sampling_rate,velocity_th,min_dur,merge_interval,msdx,msdy)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Single kernel version of vecvel + microsacc_merge (compiled by numba
+    when available): velocity pass, threshold, then one pass emitting the
+    merged saccades with their metrics, without intermediate arrays
+    (velocity noise checked by velocity_noise before the call)
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    sampling_rate: eye tracking sampling rate
+    velocity_th: velocity threshold
+    min_dur: saccade minimum duration
+    merge_interval: merge interval for subsequent saccade candidates
+    msdx, msdy: velocity noise of the block (velocity_noise)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: saccades [num, 7] (same columns as microsacc_merge)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    n = x.shape[0]
+
+    # velocity (same stencil and precision as vecvel)
+    coef = np.empty(2, dtype = x.dtype)
+    coef[0], coef[1] = sampling_rate/6, sampling_rate/2
+    vx, vy = np.zeros_like(x), np.zeros_like(y)
+    for i in range(2, n-3):
+        vx[i] = coef[0] * (x[i+2] + x[i+1] - x[i-1] - x[i-2])
+        vy[i] = coef[0] * (y[i+2] + y[i+1] - y[i-1] - y[i-2])
+    vx[1], vx[n-2] = coef[1]*(x[2] - x[0]), coef[1]*(x[n-1] - x[n-3])
+    vy[1], vy[n-2] = coef[1]*(y[2] - y[0]), coef[1]*(y[n-1] - y[n-3])
+
+    # threshold (computed in the precision of x, as microsacc_merge)
+    th = np.empty(4, dtype = x.dtype)
+    th[0], th[1] = velocity_th, velocity_th
+    th[2], th[3] = msdx, msdy
+    radiusx, radiusy = th[0]*th[2], th[1]*th[3]
+
+    # candidates (runs above threshold), merged on the fly
+    out_val = np.zeros((n//2+1, 7))
+    nsac, run_num, run_start, cur_on, cur_off = 0, 0, -1, -1, -1
+    for i in range(n+1):
+        above = False
+        if i < n:
+            test_x, test_y = vx[i]/radiusx, vy[i]/radiusy
+            above = test_x*test_x + test_y*test_y > 1
+        if above and run_start < 0:
+            run_start = i
+        elif not above and run_start >= 0:
+            run_dur = i - run_start
+            if run_num == 0:
+                run_dur -= 1    # first run counted from its second sample (as microsacc_merge)
+            run_num += 1
+            if run_dur >= min_dur:
+                if cur_on >= 0 and run_start - cur_off <= merge_interval:
+                    cur_off = i-1
+                else:
+                    if cur_on >= 0:
+                        out_val[nsac,0], out_val[nsac,1] = cur_on, cur_off
+                        nsac += 1
+                    cur_on, cur_off = run_start, i-1
+            run_start = -1
+    if cur_on >= 0:
+        out_val[nsac,0], out_val[nsac,1] = cur_on, cur_off
+        nsac += 1
+
+    # metrics over [onset, offset[ (as microsacc_merge)
+    for s in range(nsac):
+        a, b = int(out_val[s,0]), int(out_val[s,1])
+        vpeak = -np.inf
+        minx, maxx, miny, maxy = x[a], x[a], y[a], y[a]
+        minix, maxix, miniy, maxiy = a, a, a, a
+        for i in range(a, max(b, a+1)):
+            vpeak = max(vpeak, np.sqrt(vx[i]*vx[i] + vy[i]*vy[i]))
+            if x[i] < minx: minx, minix = x[i], i
+            if x[i] > maxx: maxx, maxix = x[i], i
+            if y[i] < miny: miny, miniy = y[i], i
+            if y[i] > maxy: maxy, maxiy = y[i], i
+        out_val[s,2] = vpeak
+        out_val[s,3], out_val[s,4] = x[b]-x[a], y[b]-y[a]
+        out_val[s,5] = np.sign(maxix-minix)*(maxx-minx)
+        out_val[s,6] = np.sign(maxiy-miniy)*(maxy-miny)
+
+    return out_val[:nsac]
+
+if numba is not None:
+    _ek_kernel = numba.njit(cache = True, error_model = 'numpy')(_ek_kernel)
+
+def detect_saccades(x,y,sampling_rate,velocity_th,min_dur,merge_interval,use_kernel = True,msd = None,vxy = None):
+    """
+    ----------------------------------------------------------------------
+    detect_saccades(x,y,sampling_rate,velocity_th,min_dur,merge_interval,
+                    use_kernel = True, msd = None, vxy = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Detect saccades (vecvel + microsacc_merge), with the compiled kernel
+    when numba is installed
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    sampling_rate: eye tracking sampling rate
+    velocity_th: velocity threshold
+    min_dur: saccade minimum duration
+    merge_interval: merge interval for subsequent saccade candidates
+    use_kernel: use the numba kernel if numba is installed
+    msd: velocity noise (msdx, msdy) of the block, e.g. sequence_noise
+         (noise of x,y if None)
+    vxy: velocities (vx, vy) of x,y, e.g. filter_utils.derivatives
+         (vecvel if None, numpy code path if given)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: same as microsacc_merge
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if vxy is not None:
+        out_val = microsacc_merge(x,y,vxy[0],vxy[1],velocity_th,min_dur,merge_interval,msd)
+    elif use_kernel and numba is not None:
+        # velocity noise out of the kernel (same zero noise ValueError as microsacc_merge)
+        if msd is None: msdx, msdy = velocity_noise(*vecvel(x,y,sampling_rate))
+        else: msdx, msdy = msd
+        sac = _ek_kernel(np.ascontiguousarray(x), np.ascontiguousarray(y), float(sampling_rate),
+                         float(velocity_th), int(min_dur), float(merge_interval), float(msdx), float(msdy))
+        out_val = np.zeros(sac.shape[0], dtype = MSAC_DTYPE)
+        for col_num, column in enumerate(out_val.dtype.names):
+            out_val[column] = sac[:,col_num]
+    else:
+        vx, vy = vecvel(x,y,sampling_rate)
+        out_val = microsacc_merge(x,y,vx,vy,velocity_th,min_dur,merge_interval,msd)
+
+    return out_val
+
+def detect_ivt(x,y,sampling_rate,velocity_th,min_dur,merge_interval,vxy = None):
+    """
+    ----------------------------------------------------------------------
+    detect_ivt(x,y,sampling_rate,velocity_th,min_dur,merge_interval,
+               vxy = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Velocity threshold identification (I-VT): saccades are the runs of
+    samples with a velocity norm above a fixed threshold
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    sampling_rate: eye tracking sampling rate
+    velocity_th: velocity threshold (dva/sec)
+    min_dur: saccade minimum duration
+    merge_interval: merge interval for subsequent saccade candidates
+    vxy: velocities (vx, vy) of x,y (vecvel if None)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: same as microsacc_merge
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    vx, vy = vecvel(x,y,sampling_rate) if vxy is None else vxy
+    v = np.sqrt(vx**2 + vy**2)
+    sac_onset, sac_offset = above_runs(v > velocity_th, min_dur, merge_interval)
+
+    return sacc_records(x, y, v, sac_onset, sac_offset)
+
+def detect_idt(x,y,sampling_rate,dispersion_th,fix_min_dur,min_dur,vxy = None):
+    """
+    ----------------------------------------------------------------------
+    detect_idt(x,y,sampling_rate,dispersion_th,fix_min_dur,min_dur,
+               vxy = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Dispersion threshold identification (I-DT): fixation samples are the
+    ones covered by a fix_min_dur window of dispersion (x range + y range)
+    below threshold, saccades the intervals between two fixations
+    (sliding windows computed at once instead of growing each window)
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    sampling_rate: eye tracking sampling rate
+    dispersion_th: dispersion threshold (dva)
+    fix_min_dur: fixation minimum duration (samples)
+    min_dur: saccade minimum duration
+    vxy: velocities (vx, vy) of x,y, for the peak velocities (vecvel if
+         None)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: same as microsacc_merge
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+    n, win = x.shape[0], max(int(fix_min_dur), 1)
+    vx, vy = vecvel(x,y,sampling_rate) if vxy is None else vxy
+    v = np.sqrt(vx**2 + vy**2)
+    if n < win:
+        return sacc_records(x, y, v, [], [])
+
+    # dispersion of the windows [s, s+win[ (centered filters shifted by win//2)
+    win_sl = slice(win//2, win//2 + n - win + 1)
+    dispersion = (maximum_filter1d(x, win)[win_sl] - minimum_filter1d(x, win)[win_sl]) + \
+                 (maximum_filter1d(y, win)[win_sl] - minimum_filter1d(y, win)[win_sl])
+
+    # samples covered by a fixation window
+    fix_start = np.flatnonzero(dispersion <= dispersion_th)
+    fix_logic = np.cumsum(np.bincount(fix_start, minlength = n+1) - np.bincount(fix_start+win, minlength = n+1))[:n] > 0
 
-    msac = np.matrix(msac)
-    out_val = np.matrix(np.zeros((msac.shape[0],7))*np.nan)
+    # saccades between two fixations
+    sac_onset, sac_offset = above_runs(~fix_logic, min_dur, 0)
+    between_logic = np.logical_and(sac_onset > 0, sac_offset < n-1)
 
-    if msac.shape[1]>0:
-        for s in np.arange(0,msac.shape[0],1):
+    return sacc_records(x, y, v, sac_onset[between_logic], sac_offset[between_logic])
 
-            # onset and offset
-            out_val[s,0],a = msac[s,0], msac[s,0]
-            out_val[s,1],b = msac[s,1], msac[s,1]
+def detect_adaptive(x,y,sampling_rate,peak_th,min_dur,peak_sd = 6,onset_sd = 3,vxy = None):
+    """
+    ----------------------------------------------------------------------
+    detect_adaptive(x,y,sampling_rate,peak_th,min_dur,peak_sd = 6,
+                    onset_sd = 3, vxy = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Adaptive velocity threshold (Nystrom & Holmqvist, 2010): the peak
+    threshold is iterated to mean + peak_sd * sd of the velocities below
+    it, saccades are the runs above mean + onset_sd * sd reaching the
+    peak threshold
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    sampling_rate: eye tracking sampling rate
+    peak_th: initial peak velocity threshold (dva/sec)
+    min_dur: saccade minimum duration
+    peak_sd: peak threshold in sd of the noise velocities
+    onset_sd: onset/offset threshold in sd of the noise velocities
+    vxy: velocities (vx, vy) of x,y (vecvel if None)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: same as microsacc_merge
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    vx, vy = vecvel(x,y,sampling_rate) if vxy is None else vxy
+    v = np.sqrt(vx**2 + vy**2)
+
+    # threshold iterations (until a change below 1 dva/sec)
+    noise_mean, noise_sd = np.mean(v), np.std(v)
+    for iter_num in np.arange(0,100,1):
+        noise_v = v[v < peak_th]
+        if noise_v.shape[0] == 0: break
+        noise_mean, noise_sd = np.mean(noise_v), np.std(noise_v)
+        peak_th_new = noise_mean + peak_sd*noise_sd
+        if np.abs(peak_th_new - peak_th) < 1:
+            peak_th = peak_th_new
+            break
+        peak_th = peak_th_new
 
-            # saccade peak velocity (vpeak)
-            vpeak = np.max(np.sqrt(vx[a:b]**2 + vy[a:b]**2))
-            out_val[s,2] = vpeak
+    # runs above the onset threshold reaching the peak threshold
+    sac_onset, sac_offset = above_runs(v > noise_mean + onset_sd*noise_sd, min_dur, 0)
+    _, _, run_vpeak, _ = segment_extrema(v, sac_onset, sac_offset+1)
+    peak_logic = run_vpeak > peak_th
 
-            # saccade vector (dx,dy)
-            dx = x[b]-x[a]
-            dy = y[b]-y[a]
-            out_val[s,3] = dx
-            out_val[s,4] = dy
+    return sacc_records(x, y, v, sac_onset[peak_logic], sac_offset[peak_logic])
 
-            # saccade amplitude (dX,dY)
-            minx,  maxx = np.min(x[a:b]),np.max(x[a:b])
-            minix, maxix = np.where(x == minx)[0][0], np.where(x == maxx)[0][0]
-            miny,  maxy = np.min(y[a:b]),np.max(y[a:b])
-            miniy, maxiy = np.where(y == miny)[0][0], np.where(y == maxy)[0][0]
-            dX = np.sign(maxix-minix)*(maxx-minx);
-            dY = np.sign(maxiy-miniy)*(maxy-miny);
-            out_val[s,5] = dX
-            out_val[s,6] = dY
+def run_detector(x,y,analysis_info,msd = None,vxy = None):
+    """
+    ----------------------------------------------------------------------
+    run_detector(x,y,analysis_info,msd = None,vxy = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Detect saccades with the detector selected in the settings
+    (saccade_detector: 'ek', 'ivt', 'idt' or 'adaptive')
+    ----------------------------------------------------------------------
+    Input(s) :
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    analysis_info: analysis settings
+    msd: velocity noise (msdx, msdy) of the block ('ek' only)
+    vxy: velocities (vx, vy) of x,y, e.g. filter_utils.derivatives of the
+         run (vecvel if None)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: same as microsacc_merge
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    detector = analysis_info['saccade_detector']
+    sampling_rate = analysis_info['sampling_rate']
+    min_dur = analysis_info['min_dur']
+    merge_interval = analysis_info['merge_interval']
 
+    if detector == 'ek':
+        out_val = detect_saccades(x,y,sampling_rate,analysis_info['velocity_th'],min_dur,merge_interval,msd = msd,vxy = vxy)
+    elif detector == 'ivt':
+        out_val = detect_ivt(x,y,sampling_rate,analysis_info['ivt_velocity_th'],min_dur,merge_interval,vxy = vxy)
+    elif detector == 'idt':
+        out_val = detect_idt(x,y,sampling_rate,analysis_info['idt_dispersion_th'],analysis_info['idt_fix_min_dur'],min_dur,vxy = vxy)
+    elif detector == 'adaptive':
+        out_val = detect_adaptive(x,y,sampling_rate,analysis_info['adaptive_peak_th'],min_dur,vxy = vxy)
+    else:
+        raise ValueError('unknown saccade_detector "{}" (ek, ivt, idt or adaptive)'.format(detector))
 
     return out_val
 
+def detect_segments(t,x,y,analysis_info,msd = None,vxy = None):
+    """
+    ----------------------------------------------------------------------
+    detect_segments(t,x,y,analysis_info,msd = None,vxy = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Detect saccades (run_detector) within the continuous segments of a
+    time series with missing time stamps or nan samples (e.g. blinks),
+    with the velocities of vecvel_segments (one pass, never across a
+    gap) and the velocity noise of all its segments ('ek')
+    ----------------------------------------------------------------------
+    Input(s) :
+    t: time stamps of the time series (ms)
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    analysis_info: analysis settings
+    msd: velocity noise (msdx, msdy) of the block (noise of the segments
+         velocities if None)
+    vxy: velocities (vx, vy) of x,y (nan out of the segments, e.g.
+         filter_utils.derivatives, vecvel_segments if None)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: same as microsacc_merge (sample indices of x and y)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    sampling_rate = analysis_info['sampling_rate']
+    seg_start, seg_stop = split_segments(t,sampling_rate,x,y)
+
+    if vxy is None:
+        vxy = vecvel_segments(x,y,sampling_rate,t)
+    if msd is None and analysis_info['saccade_detector'] == 'ek':
+        valid_logic = ~np.isnan(vxy[0])
+        msd = velocity_noise(vxy[0][valid_logic],vxy[1][valid_logic])
+
+    out_val = [np.zeros(0, dtype = MSAC_DTYPE)]
+    for start_idx, stop_idx in zip(seg_start, seg_stop):
+        if stop_idx - start_idx < max(analysis_info['min_dur'],6): continue
+        seg_vxy = (vxy[0][start_idx:stop_idx], vxy[1][start_idx:stop_idx])
+        seg_sac = run_detector(x[start_idx:stop_idx],y[start_idx:stop_idx],analysis_info,msd = msd,vxy = seg_vxy)
+        seg_sac['onset'] += start_idx
+        seg_sac['offset'] += start_idx
+        out_val.append(seg_sac)
+
+    return np.concatenate(out_val)
+
+class OnlineSaccadeDetector(object):
+    """
+    ----------------------------------------------------------------------
+    OnlineSaccadeDetector(sampling_rate, velocity_th, min_dur, merge_interval,
+                          msd = None, noise_window = 2000, noise_update = 100)
+    ----------------------------------------------------------------------
+    Goal of the class :
+    Incremental version of vecvel + microsacc_merge for samples arriving
+    in small blocks (e.g. during acquisition). Keeps the last samples of
+    the vecvel stencil, the samples of the pending saccade and a ring
+    buffer of velocities for a running noise estimate. A saccade is
+    emitted once no later candidate can merge with it, i.e. about
+    merge_interval + 3 samples after its offset.
+    With a fixed msd, the saccades of a stream are the ones of
+    detect_saccades(x, y, ..., msd = msd) on the whole stream; with the
+    running estimate they follow the noise of the last noise_window
+    samples instead of the whole stream
+    ----------------------------------------------------------------------
+    Input(s) :
+    sampling_rate: eye tracking sampling rate
+    velocity_th: velocity threshold
+    min_dur: saccade minimum duration
+    merge_interval: merge interval for subsequent saccade candidates
+    msd: fixed velocity noise (msdx, msdy), running estimate if None
+    noise_window: number of last velocity samples of the running estimate
+    noise_update: number of new samples between running estimate updates
+    ----------------------------------------------------------------------
+    Output(s) :
+    push(x, y): structured array (MSAC_DTYPE) of the saccades completed by
+                the block, onset/offset in samples since the stream start
+    finish(): same for the end of the stream (stream state reset
+              afterwards, the running noise estimate is kept for the
+              next stream, e.g. after a blink)
+    reset(): forget the stream and the running noise estimate
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    def __init__(self, sampling_rate, velocity_th, min_dur, merge_interval, msd = None, noise_window = 2000, noise_update = 100):
+        self.sampling_rate = sampling_rate
+        self.velocity_th = velocity_th
+        self.min_dur = min_dur
+        self.merge_interval = merge_interval
+        self.fixed_msd = msd
+        self.noise_window = noise_window
+        self.noise_update = noise_update
+        self.reset()
+
+    def reset(self):
+        self.msd = self.fixed_msd
+        self.noise_vx, self.noise_vy = None, None
+        self.noise_num, self.noise_new = 0, 0
+        self.new_stream()
+
+    def new_stream(self):
+        self.num_samples = 0                # samples received
+        self.num_vel = 0                    # velocities computed (final)
+        self.tail_x, self.tail_y = None, None
+        self.hist_start = 0                 # stream index of the first kept sample
+        self.hist_x, self.hist_y, self.hist_v = None, None, None
+        self.run_num, self.run_start, self.cur_on, self.cur_off = 0, -1, -1, -1
+
+    def push(self, x, y):
+        x, y = np.asarray(x), np.asarray(y)
+        if x.shape[0] == 0:
+            return np.zeros(0, dtype = MSAC_DTYPE)
+        if self.tail_x is None:
+            self.tail_x, self.tail_y = x[:0], y[:0]
+        if self.noise_vx is None:
+            self.noise_vx = np.zeros(self.noise_window, dtype = x.dtype)
+            self.noise_vy = np.zeros(self.noise_window, dtype = y.dtype)
+        self.num_samples += x.shape[0]
+
+        # stencil samples: 2 before the first velocity to compute, up to the last sample
+        x, y = np.concatenate((self.tail_x, x)), np.concatenate((self.tail_y, y))
+        x_first = self.num_samples - x.shape[0]
+        vel_stop = max(self.num_samples - 3, self.num_vel)      # v[i] is final once x[i+3] is known (v[n-3] = 0)
+        vx, vy = np.zeros(0, dtype = x.dtype), np.zeros(0, dtype = y.dtype)
+        if vel_stop > self.num_vel:
+            vel_idx = np.arange(self.num_vel, vel_stop)
+            vx, vy = np.zeros(vel_idx.shape[0], dtype = x.dtype), np.zeros(vel_idx.shape[0], dtype = y.dtype)
+            mid = vel_idx >= 2
+            i = vel_idx[mid] - x_first
+            vx[mid] = self.sampling_rate/6 * (x[i+2] + x[i+1] - x[i-1] - x[i-2])
+            vy[mid] = self.sampling_rate/6 * (y[i+2] + y[i+1] - y[i-1] - y[i-2])
+            if vel_idx[0] <= 1 < vel_stop:
+                vx[1-vel_idx[0]] = self.sampling_rate/2*(x[2-x_first] - x[0-x_first])
+                vy[1-vel_idx[0]] = self.sampling_rate/2*(y[2-x_first] - y[0-x_first])
+        sac = self._detect(x[self.num_vel-x_first:vel_stop-x_first], y[self.num_vel-x_first:vel_stop-x_first], vx, vy, False)
+
+        keep = max(self.num_samples - 5, 0)
+        self.tail_x, self.tail_y = x[keep-x_first:], y[keep-x_first:]
+        return sac
+
+    def finish(self):
+        sac = np.zeros(0, dtype = MSAC_DTYPE)
+        n = self.num_samples
+        if n >= 6:
+            # last velocities of the stream (as vecvel: v[n-3] = v[n-1] = 0)
+            x, y = self.tail_x, self.tail_y
+            x_first = n - x.shape[0]
+            vx, vy = np.zeros(n - self.num_vel, dtype = x.dtype), np.zeros(n - self.num_vel, dtype = y.dtype)
+            vx[n-2-self.num_vel] = self.sampling_rate/2*(x[n-1-x_first] - x[n-3-x_first])
+            vy[n-2-self.num_vel] = self.sampling_rate/2*(y[n-1-x_first] - y[n-3-x_first])
+            sac = self._detect(x[self.num_vel-x_first:], y[self.num_vel-x_first:], vx, vy, True)
+        self.new_stream()
+        return sac
+
+    def _detect(self, x, y, vx, vy, stream_end):
+        first = self.num_vel
+        self.num_vel += vx.shape[0]
+
+        # samples kept for the metrics of the pending saccade
+        if self.hist_x is None:
+            self.hist_x, self.hist_y, self.hist_v = x, y, np.sqrt(vx**2 + vy**2)
+        else:
+            self.hist_x = np.concatenate((self.hist_x, x))
+            self.hist_y = np.concatenate((self.hist_y, y))
+            self.hist_v = np.concatenate((self.hist_v, np.sqrt(vx**2 + vy**2)))
+
+        # running noise estimate (ring buffer of the last velocities)
+        if self.fixed_msd is None and vx.shape[0] > 0:
+            ring_idx = np.arange(self.noise_num, self.noise_num + vx.shape[0]) % self.noise_window
+            self.noise_vx[ring_idx[-self.noise_window:]] = vx[-self.noise_window:]
+            self.noise_vy[ring_idx[-self.noise_window:]] = vy[-self.noise_window:]
+            self.noise_num += vx.shape[0]
+            self.noise_new += vx.shape[0]
+            if self.noise_new >= self.noise_update:
+                num = min(self.noise_num, self.noise_window)
+                try:
+                    self.msd = velocity_noise(self.noise_vx[:num], self.noise_vy[:num])
+                except ValueError:
+                    pass    # no velocity noise yet (e.g. flat trace): previous estimate kept
+                self.noise_new = 0
+
+        # test criterion: ellipse equation
+        if self.msd is None:
+            above = np.zeros(vx.shape[0], dtype = bool)
+        else:
+            radiusx = self.velocity_th*self.msd[0]
+            radiusy = self.velocity_th*self.msd[1]
+            above = (vx/radiusx)**2 + (vy/radiusy)**2 > 1
+
+        # candidates (runs above threshold), merged on the fly
+        sac = []
+        for i, above_i in enumerate(list(above) + [False]*stream_end, first):
+            if above_i and self.run_start < 0:
+                self.run_start = i
+            elif not above_i and self.run_start >= 0:
+                run_dur = i - self.run_start
+                if self.run_num == 0:
+                    run_dur -= 1    # first run counted from its second sample (as microsacc_merge)
+                self.run_num += 1
+                if run_dur >= self.min_dur:
+                    if self.cur_on >= 0 and self.run_start - self.cur_off <= self.merge_interval:
+                        self.cur_off = i-1
+                    else:
+                        if self.cur_on >= 0:
+                            sac.append((self.cur_on, self.cur_off))
+                        self.cur_on, self.cur_off = self.run_start, i-1
+                self.run_start = -1
+
+            # no later run can be merged with the pending saccade
+            next_start = self.run_start if self.run_start >= 0 else i+1
+            if self.cur_on >= 0 and next_start - self.cur_off > self.merge_interval:
+                sac.append((self.cur_on, self.cur_off))
+                self.cur_on, self.cur_off = -1, -1
+        if stream_end and self.cur_on >= 0:
+            sac.append((self.cur_on, self.cur_off))
+
+        # metrics over [onset, offset[ (as microsacc_merge)
+        sac = np.array(sac, dtype = 'int64').reshape(-1,2) - self.hist_start
+        out_val = sacc_records(self.hist_x, self.hist_y, self.hist_v, sac[:,0], sac[:,1])
+        out_val['onset'] += self.hist_start
+        out_val['offset'] += self.hist_start
+
+        # drop the samples before the pending saccade or current run
+        keep = min([idx for idx in [self.cur_on, self.run_start] if idx >= 0] + [self.num_vel])
+        self.hist_x = self.hist_x[keep-self.hist_start:]
+        self.hist_y = self.hist_y[keep-self.hist_start:]
+        self.hist_v = self.hist_v[keep-self.hist_start:]
+        self.hist_start = keep
+
+        return out_val
+
 def saccpar(sac):
     """
     ----------------------------------------------------------------------
@@ -186,56 +966,293 @@ def saccpar(sac):
     Arange data from microsaccade detection
     ----------------------------------------------------------------------
     Input(s) :
-    sac: monocular microsaccades matrix (from microsacc_merge)
+    sac: monocular microsaccades (MSAC_DTYPE, from microsacc_merge)
     ----------------------------------------------------------------------
     Output(s):
-    out_val(0:num,0)   saccade onset
-    out_val(0:num,1)   saccade offset
-    out_val(1:num,2)   saccade duration
-    out_val(1:num,3)   saccade velocity peak
-    out_val(1:num,4)   saccade vector distance
-    out_val(1:num,5)   saccade vector angle
-    out_val(1:num,6)   saccade whole sequence amplitude
-    out_val(1:num,7)   saccade whole sequence angle
+    out_val: structured array (SAC_DTYPE), one record per saccade
+    out_val['onset']       saccade onset
+    out_val['offset']      saccade offset
+    out_val['dur']         saccade duration
+    out_val['vpeak']       saccade velocity peak
+    out_val['dist']        saccade vector distance
+    out_val['angle']       saccade vector angle
+    out_val['amp']         saccade whole sequence amplitude
+    out_val['amp_angle']   saccade whole sequence angle
     ----------------------------------------------------------------------
     Function created by Martin Rolfs
     adapted by Martin SZINTE (mail@martinszinte.net)
     ----------------------------------------------------------------------
     """
+    out_val = np.zeros(sac.shape[0], dtype = SAC_DTYPE)
+
+    # 0. Saccade onset
+    out_val['onset'] = sac['onset']
+
+    # 1. Saccade offset
+    out_val['offset'] = sac['offset']
+
+    # 2. Saccade duration
+    out_val['dur'] = sac['offset'] - sac['onset']
+
+    # 3. Saccade peak velocity
+    out_val['vpeak'] = sac['vpeak']
+
+    # 4. Saccade vector distance
+    out_val['dist'] = np.sqrt(sac['dx']**2 + sac['dy']**2)
+
+    # 5. Saccade vector angle
+    out_val['angle'] = np.arctan2(sac['dy'],sac['dx'])
+
+    # 6. Saccade whole sequence amplitude
+    out_val['amp'] = np.sqrt(sac['amp_x']**2 + sac['amp_y']**2)
+
+    # 7. Saccade whole sequence angle
+    out_val['amp_angle'] = np.arctan2(sac['amp_y'],sac['amp_x'])
+
+    return out_val
+
+def eyelink_sacc(t,x,y,sac_onset,sac_offset,sac_vpeak):
+    """
+    ----------------------------------------------------------------------
+    eyelink_sacc(t,x,y,sac_onset,sac_offset,sac_vpeak)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Arrange EyeLink parsed saccades (ESACC) of a trial as microsacc_merge
+    output
+    ----------------------------------------------------------------------
+    Input(s) :
+    t: time stamps of the time series
+    x: raw data, horizontal components of the time series
+    y: raw data, vertical components of the time series
+    sac_onset: EyeLink saccade onset time stamps
+    sac_offset: EyeLink saccade offset time stamps
+    sac_vpeak: EyeLink saccade peak velocity
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: same as microsacc_merge (saccades within the time series)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
     import numpy as np
 
-    if sac.shape[0] > 0:
-        # 0. Saccade onset
-        sac_onset = np.array(sac[:,0])
+    # saccades fully within the time series
+    in_series = np.logical_and(sac_onset >= t[0], sac_offset <= t[-1])
+    onset_idx = np.searchsorted(t, sac_onset[in_series], side = 'left')
+    offset_idx = np.searchsorted(t, sac_offset[in_series], side = 'right') - 1
+    sac_vpeak = sac_vpeak[in_series]
 
-        # 1. Saccade offset
-        sac_offset = np.array(sac[:,1])
+    nsac = onset_idx.shape[0]
+    out_val = np.zeros(nsac, dtype = MSAC_DTYPE)
+    if nsac > 0:
+        a, b = onset_idx, offset_idx
+        out_val['onset'], out_val['offset'] = a, b
+        out_val['vpeak'] = sac_vpeak
+        out_val['dx'] = x[b]-x[a]
+        out_val['dy'] = y[b]-y[a]
+        # amplitude over [onset, offset[ (as sacc_records)
+        out_val['amp_x'], out_val['amp_y'] = sacc_amplitude(x, y, a, b)
 
-        # 2. Saccade duration
-        sac_dur = np.array(sac[:,1] - sac[:,0])
+    return out_val
+
+def match_saccades(sac_onset,sac_offset,ref_onset,ref_offset):
+    """
+    ----------------------------------------------------------------------
+    match_saccades(sac_onset,sac_offset,ref_onset,ref_offset)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Match detected saccades to reference saccades (e.g. EyeLink ESACC)
+    overlapping in time
+    ----------------------------------------------------------------------
+    Input(s) :
+    sac_onset: detected saccade onset times
+    sac_offset: detected saccade offset times
+    ref_onset: reference saccade onset times (sorted)
+    ref_offset: reference saccade offset times
+    ----------------------------------------------------------------------
+    Output(s):
+    match_idx: index of the overlapping reference saccade (-1 if none)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
+
+    # last reference saccade starting before the detected saccade offset
+    match_idx = np.searchsorted(ref_onset, sac_offset, side = 'right') - 1
+    overlap = match_idx >= 0
+    overlap[overlap] = ref_offset[match_idx[overlap]] >= sac_onset[overlap]
+    match_idx[~overlap] = -1
+
+    return match_idx
+
+def split_segments(t,sampling_rate,x = None,y = None):
+    """
+    ----------------------------------------------------------------------
+    split_segments(t,sampling_rate,x = None,y = None)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Split a time series in continuous segments (no missing time stamps,
+    and no nan samples if x and y are given)
+    ----------------------------------------------------------------------
+    Input(s) :
+    t: time stamps of the time series (ms)
+    sampling_rate: eye tracking sampling rate
+    x: horizontal components of the time series (optional, nan excluded)
+    y: vertical components of the time series (optional, nan excluded)
+    ----------------------------------------------------------------------
+    Output(s):
+    seg_start: segments first sample index
+    seg_stop: segments last sample index + 1
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
 
-        # 3. Saccade peak velocity
-        sac_pvel = np.array(sac[:,2])
+    if x is None:
+        gap_idx = np.flatnonzero(np.diff(t) > 1000/sampling_rate) + 1
+        seg_start = np.append(0, gap_idx)
+        seg_stop = np.append(gap_idx, t.shape[0])
+    else:
+        valid_logic = ~np.logical_or(np.isnan(x), np.isnan(y))
+        jump_logic = np.diff(t) > 1000/sampling_rate
+        seg_start = np.flatnonzero(np.logical_and(valid_logic, np.append(True, np.logical_or(~valid_logic[:-1], jump_logic))))
+        seg_stop = np.flatnonzero(np.logical_and(valid_logic, np.append(np.logical_or(~valid_logic[1:], jump_logic), True))) + 1
 
-        # 4. Saccade vector distance and angle
-        sac_dist = np.sqrt(np.array(sac[:,3])**2 + np.array(sac[:,4])**2)
+    return seg_start, seg_stop
 
-        # 5. Saccade vector angle
-        sac_angd = np.arctan2(np.array(sac[:,4]),np.array(sac[:,3]))
+def assign_trials(sac_onset,trial_onset,trial_offset):
+    """
+    ----------------------------------------------------------------------
+    assign_trials(sac_onset,trial_onset,trial_offset)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Find the trial during which each saccade started
+    ----------------------------------------------------------------------
+    Input(s) :
+    sac_onset: saccade onset times
+    trial_onset: trial onset times (sorted)
+    trial_offset: trial offset times
+    ----------------------------------------------------------------------
+    Output(s):
+    trial_idx: index of the trial of each saccade (-1 if none)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    import numpy as np
 
-        # 6. Saccade whole sequence amplitude
-        sac_ampl = np.sqrt(np.array(sac[:,5])**2 + np.array(sac[:,6])**2)
+    # last trial starting before the saccade onset
+    trial_idx = np.searchsorted(trial_onset, sac_onset, side = 'right') - 1
+    in_trial = trial_idx >= 0
+    in_trial[in_trial] = sac_onset[in_trial] <= trial_offset[trial_idx[in_trial]]
+    trial_idx[~in_trial] = -1
 
-        # 7. Saccade whole sequence amplitude
-        sac_anga = np.arctan2(np.array(sac[:,6]),np.array(sac[:,5]))
+    return trial_idx
 
-        # make matrix
-        out_val = np.matrix(np.hstack((sac_onset,sac_offset,sac_dur,sac_pvel,sac_dist,sac_angd,sac_ampl,sac_anga)))
+def target_steps(step_num,step_trial,step_amp,polar_ang,saccades_num):
+    """
+    ----------------------------------------------------------------------
+    target_steps(step_num,step_trial,step_amp,polar_ang,saccades_num)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Target positions before and after each target step of the saccade
+    sequences (constConfig.m saccade_matX/Y layout)
+    saccades_num = 1: even trials step from center to periphery, odd
+    trials back to center, direction of trial//2
+    saccades_num = 2: step 1 from center to periphery, step 2 back to
+    center, direction of trial%16
+    ----------------------------------------------------------------------
+    Input(s) :
+    step_num: step of the trial (1 = saccade onset, 2 = 2nd saccade onset)
+    step_trial: trial number in sequence (0 = first)
+    step_amp: step amplitude (dva)
+    polar_ang: target directions (rad)
+    saccades_num: number of saccades per saccade trial (1 or 2)
+    ----------------------------------------------------------------------
+    Output(s):
+    x_from, y_from: target position before the step (dva)
+    x_to, y_to: target position after the step (dva)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    if saccades_num == 1:
+        step_ang = polar_ang[(step_trial//2) % polar_ang.shape[0]]
+        from_periph = step_trial % 2 == 1
     else:
-        out_val = np.matrix([]);
+        step_ang = polar_ang[step_trial % polar_ang.shape[0]]
+        from_periph = step_num == 2
 
-    return out_val
+    periph_x, periph_y = np.round(np.cos(step_ang)*step_amp,decimals=3), np.round(np.sin(step_ang)*step_amp,decimals=3)
+    x_from, y_from = np.where(from_periph, periph_x, 0), np.where(from_periph, periph_y, 0)
+    x_to, y_to = np.where(from_periph, 0, periph_x), np.where(from_periph, 0, periph_y)
+
+    return x_from, y_from, x_to, y_to
 
+def saccade_latency(steps,sac,latency_min,latency_max,min_amp):
+    """
+    ----------------------------------------------------------------------
+    saccade_latency(steps,sac,latency_min,latency_max,min_amp)
+    ----------------------------------------------------------------------
+    Goal of the function :
+    Match each target step to the first qualifying saccade of its run
+    (amplitude above min_amp, onset within [latency_min, latency_max] ms
+    after the step), all steps at once with a searchsorted on the sorted
+    saccade onsets
+    ----------------------------------------------------------------------
+    Input(s) :
+    steps: target steps (STEP_DTYPE)
+    sac: dictionary of saccade arrays (run, t_onset, x_onset, y_onset,
+         x_offset, y_offset), t_onset nan for rows to ignore
+    latency_min: minimum latency (ms, anticipations excluded)
+    latency_max: maximum latency (ms)
+    min_amp: saccade minimum amplitude (dva, onset to offset)
+    ----------------------------------------------------------------------
+    Output(s):
+    out_val: structured array (LATENCY_DTYPE), one row per step
+        out_val['sac_idx']: index of the saccade in sac (-1 if none)
+        out_val['latency']: saccade onset - step time (ms)
+        out_val['gain']: saccade vector projected on the target step
+                         vector, relative to the step amplitude
+        out_val['landing_error']: distance of the saccade offset to the
+                                  stepped target (dva)
+    ----------------------------------------------------------------------
+    Function created by Martin SZINTE (mail@martinszinte.net)
+    ----------------------------------------------------------------------
+    """
+    sac_dx, sac_dy = sac['x_offset'] - sac['x_onset'], sac['y_offset'] - sac['y_onset']
+    qual_idx = np.flatnonzero(np.logical_and(~np.isnan(sac['t_onset']), np.hypot(sac_dx, sac_dy) >= min_amp))
+
+    # one time line for all runs (runs separated by more than latency_max)
+    all_t = np.concatenate((steps['time'], sac['t_onset'][qual_idx]))
+    t_min = np.min(all_t) if all_t.shape[0] else 0
+    run_span = (np.max(all_t) - t_min if all_t.shape[0] else 0) + latency_max + 1
+    sac_key = sac['t_onset'][qual_idx] - t_min + sac['run'][qual_idx]*run_span
+    sac_order = np.argsort(sac_key, kind = 'stable')
+    sac_key = sac_key[sac_order]
+    step_key = steps['time'] - t_min + steps['run']*run_span
+
+    # first qualifying saccade after the minimum latency
+    out_val = np.zeros(steps.shape[0], dtype = LATENCY_DTYPE)
+    out_val['sac_idx'] = -1
+    first_pos = np.searchsorted(sac_key, step_key + latency_min, side = 'left')
+    match_logic = first_pos < sac_key.shape[0]
+    match_logic[match_logic] = sac_key[first_pos[match_logic]] <= step_key[match_logic] + latency_max
+    out_val['sac_idx'][match_logic] = qual_idx[sac_order[first_pos[match_logic]]]
+
+    sac_idx = out_val['sac_idx'][match_logic]
+    step_dx = steps['x_to'][match_logic] - steps['x_from'][match_logic]
+    step_dy = steps['y_to'][match_logic] - steps['y_from'][match_logic]
+    out_val['latency'], out_val['gain'], out_val['landing_error'] = np.nan, np.nan, np.nan
+    out_val['latency'][match_logic] = sac['t_onset'][sac_idx] - steps['time'][match_logic]
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        out_val['gain'][match_logic] = (sac_dx[sac_idx]*step_dx + sac_dy[sac_idx]*step_dy)/(step_dx**2 + step_dy**2)
+    out_val['landing_error'][match_logic] = np.hypot(sac['x_offset'][sac_idx] - steps['x_to'][match_logic],
+                                                     sac['y_offset'][sac_idx] - steps['y_to'][match_logic])
+
+    return out_val
 
 def isincircle(x,y,xc,yc,rad):
     """
@@ -0,0 +1,230 @@
+"""
+-----------------------------------------------------------------------------------------
+sweep_saccades.py
+-----------------------------------------------------------------------------------------
+Goal of the script:
+Evaluate a grid of saccade detection parameters (velocity_th, min_dur, merge_interval)
+in a single pass: trial velocities (velocity_filter, filtered once over each run) and
+velocity noise are computed once, then only the detector selected in the settings
+(saccade_detector) is rerun for each setting (trial detection mode, velocity_th swept
+as the 'ek' threshold only). savgol and fir velocities are smoother than vecvel ones,
+their noise estimate is lower and velocity_th has to be retuned (e.g. ~5 instead of 1.5)
+-----------------------------------------------------------------------------------------
+Input(s):
+sys.argv[1]: subject number (sub-01)
+sys.argv[2]: task (EyeMov)
+-----------------------------------------------------------------------------------------
+Output(s):
+tsv table with one row per setting
+sweep[:,0]:	velocity threshold
+sweep[:,1]:	saccade minimum duration
+sweep[:,2]:	merge interval
+sweep[:,3]:	number of trials analysed (without missing time stamps if gap_detection is 'skip')
+sweep[:,4]:	number of saccades detected
+sweep[:,5]:	saccades per trial
+sweep[:,6]:	proportion of trials with no saccade detected
+sweep[:,7]:	proportion of accurate saccades (start and end within boundary)
+sweep[:,8]:	proportion of saccade task trials with an accurate saccade
+sweep[:,9]:	proportion of microsaccades (<1 dva)
+-----------------------------------------------------------------------------------------
+To run:
+cd /Users/martin/Dropbox/Experiments/pMFexp/stats/
+python behav_analysis/sweep_saccades.py sub-01 EyeMov
+-----------------------------------------------------------------------------------------
+"""
+
+# Stop warnings
+# -------------
+import warnings
+warnings.filterwarnings("ignore")
+
+# General imports
+# ---------------
+import sys
+import platform
+import itertools
+import time
+import numpy as np
+import json
+import h5py
+
+# Specific imports
+# ----------------
+from sac_utils import vecvel, vecvel_segments, velocity_noise, sequence_noise, run_detector, detect_segments, saccpar
+from filter_utils import derivatives
+from h5_utils import load_trial_index, trial_slice, load_run, nan_gaps, FLAG_BLINK
+
+# Get inputs
+# ----------
+subject = sys.argv[1]
+task = sys.argv[2]
+
+# Define analysis parameters
+# --------------------------
+with open('./behavior_settings.json') as f:
+	json_s = f.read()
+	analysis_info = json.loads(json_s)
+
+# Platform settings
+# -----------------
+if platform.system() == 'Darwin':
+	main_dir = analysis_info['main_dir_mac']
+
+elif platform.system() == 'Windows':
+	main_dir = analysis_info['main_dir_pc']
+
+elif platform.system() == 'Linux':
+	main_dir = analysis_info['main_dir_unix']
+
+runs = np.arange(0,analysis_info['num_run'],1)
+sequences = np.arange(0,analysis_info['num_seq'],1)
+trials_seq = analysis_info['trials_seq']
+rads = analysis_info['rads']
+polar_ang = np.deg2rad(np.arange(0,360,analysis_info['ang_steps']))
+saccades_tr = np.arange(1,analysis_info['seq_trs'],2)
+seq_type = analysis_info['seq_type']
+sampling_rate = analysis_info['sampling_rate']
+tolerance_ratio = analysis_info['tolerance_ratio']
+noise_window = analysis_info['noise_window']
+saccade_detector = analysis_info['saccade_detector']
+velocity_filter = analysis_info['velocity_filter']
+gap_detection = analysis_info['gap_detection']
+sample_columns = ('time', 'x', 'y', 'valid', 'flags')
+sweep_grid = list(itertools.product(analysis_info['sweep_velocity_th'],
+									analysis_info['sweep_min_dur'],
+									analysis_info['sweep_merge_interval']))
+
+# Load data
+# ---------
+file_dir = '{exp_dir}/data/{sub}'.format(exp_dir = main_dir, sub = subject)
+h5_filename = "{file_dir}/add/{sub}_task-{task}_eyedata.h5".format(file_dir = file_dir, sub = subject, task = task)
+h5_file = h5py.File(h5_filename,'r')
+folder_alias = 'eye_traces'
+trial_index = load_trial_index(h5_file, folder_alias)
+amp_sequence = np.array(h5_file['{folder_alias}/amp_sequence'.format(folder_alias = folder_alias)])[0]
+
+# Velocity cache
+# --------------
+t_start = time.time()
+trials_cache = []
+for run in runs:
+	# velocities filtered once over the run, sliced by trial (vecvel: per trial)
+	run_data = load_run(h5_file, run, columns = sample_columns, folder_alias = folder_alias)
+	run_det_x, run_det_y = run_data['x'], run_data['y']
+	if gap_detection == 'segments':
+		run_det_x, run_det_y = nan_gaps(run_data['x'], run_data['y'], run_data['valid'], run_data['flags'])
+	run_vxy = None
+	if velocity_filter != 'vecvel':
+		run_vxy = derivatives(run_data['time'], run_det_x, run_det_y, analysis_info)
+
+	for sequence in sequences:
+		trials = np.arange(0,trials_seq[sequence],1)
+		seq_cache = []
+
+		trial_with_sac = 0
+		for trial in trials:
+			trial_sl = trial_slice(trial_index, run, sequence, trial)
+			trial_data = {column: run_data[column][trial_sl] for column in sample_columns}
+
+			# fixation target position
+			if (amp_sequence[sequence] == 5) :
+				amp_sac = 0
+				fix_pos_x, fix_pos_y = 0,0
+			else:
+				amp_sac = rads[int(amp_sequence[sequence])]
+				fix_pos_x, fix_pos_y = np.round(np.cos(polar_ang[trial_with_sac])*amp_sac,decimals=3),\
+									   np.round(np.sin(polar_ang[trial_with_sac])*amp_sac,decimals=3)
+
+			saccade_task = 0
+			if seq_type[sequence] == 1:
+				if np.sum(saccades_tr==trial):
+					saccade_task = 1
+					trial_with_sac += 1
+
+			# trials with missing time stamps are not analysed (gap_detection 'skip')
+			if trial_data['time'].shape[0] < 6:
+				continue
+			miss_time = np.sum(np.diff(trial_data['time'])>1000/sampling_rate) > 0
+			if miss_time and gap_detection != 'segments':
+				continue
+
+			# trials with missing data detected within their continuous parts (gap_detection 'segments')
+			t, x, y = trial_data['time'], trial_data['x'], trial_data['y']
+			vxy = None if run_vxy is None else (run_vxy[0][trial_sl], run_vxy[1][trial_sl])
+			segments = gap_detection == 'segments' and (miss_time or np.any(trial_data['valid'] == 0) or np.any(trial_data['flags'] & FLAG_BLINK))
+			try:
+				if segments:
+					x, y = nan_gaps(x, y, trial_data['valid'], trial_data['flags'])
+					if vxy is None: vxy = vecvel_segments(x,y,sampling_rate,t)
+					valid_logic = ~np.isnan(vxy[0])
+					msd = velocity_noise(vxy[0][valid_logic],vxy[1][valid_logic]) if np.sum(valid_logic) > 5 else None
+				else:
+					if vxy is None: vxy = vecvel(x,y,sampling_rate)
+					msd = velocity_noise(vxy[0],vxy[1])
+			except ValueError:
+				continue	# no velocity noise (e.g. flat trace): trial not analysed
+			seq_cache.append({	't': t, 'x': x, 'y': y, 'vxy': vxy, 'msd': msd, 'segments': segments, 'miss_time': miss_time,
+								'fix_pos': (fix_pos_x, fix_pos_y), 'sac_fix_rad': tolerance_ratio*amp_sac,
+								'saccade_task': saccade_task})
+
+		# velocity noise of the sequence (trials without missing time stamps)
+		if noise_window == 'sequence':
+			noise_cache = [trial_cache for trial_cache in seq_cache if not trial_cache['miss_time']]
+			try:
+				seq_msd = sequence_noise([(trial_cache['x'], trial_cache['y']) for trial_cache in noise_cache], sampling_rate,
+										 [trial_cache['vxy'] for trial_cache in noise_cache])
+				for trial_cache in seq_cache:
+					trial_cache['msd'] = seq_msd
+			except ValueError:
+				pass	# no velocity noise of the sequence: noise of each trial
+
+		trials_cache += seq_cache
+dur_cache = time.time() - t_start
+
+# Parameter sweep
+# ---------------
+if saccade_detector != 'ek':
+	print('warning: velocity_th is the \'ek\' threshold, not swept with saccade_detector "{}"'.format(saccade_detector))
+t_start = time.time()
+sweep = np.zeros((len(sweep_grid), 10))
+for setting_num, (velocity_th, min_dur, merge_interval) in enumerate(sweep_grid):
+	num_sac, num_no_sac, num_accurate, num_microsac, num_task, num_task_accurate = 0, 0, 0, 0, 0, 0
+	setting_info = dict(analysis_info, velocity_th = velocity_th, min_dur = min_dur, merge_interval = merge_interval)
+	for trial_cache in trials_cache:
+		x, y = trial_cache['x'], trial_cache['y']
+		if trial_cache['segments']:
+			ms = saccpar(detect_segments(trial_cache['t'],x,y,setting_info,msd = trial_cache['msd'],vxy = trial_cache['vxy']))
+		else:
+			ms = saccpar(run_detector(x,y,setting_info,msd = trial_cache['msd'],vxy = trial_cache['vxy']))
+
+		# saccade start around fixation target and end at screen center
+		fix_cor = np.hypot(x[ms['onset']]-trial_cache['fix_pos'][0], y[ms['onset']]-trial_cache['fix_pos'][1]) < trial_cache['sac_fix_rad']
+		sac_cor = np.hypot(x[ms['offset']], y[ms['offset']]) < trial_cache['sac_fix_rad']
+		sac_accuracy = np.logical_and(fix_cor, sac_cor)
+
+		num_sac += ms.shape[0]
+		num_no_sac += ms.shape[0] == 0
+		num_accurate += np.sum(sac_accuracy)
+		num_microsac += np.sum(ms['amp'] <= 1.0)
+		num_task += trial_cache['saccade_task']
+		num_task_accurate += trial_cache['saccade_task'] and np.any(sac_accuracy)
+
+	num_trials = len(trials_cache)
+	sweep[setting_num] = [	velocity_th, min_dur, merge_interval, num_trials, num_sac,
+							num_sac/max(num_trials,1), num_no_sac/max(num_trials,1), num_accurate/max(num_sac,1),
+							num_task_accurate/max(num_task,1), num_microsac/max(num_sac,1)]
+dur_sweep = time.time() - t_start
+
+# Report
+# ------
+header = '\t'.join(['velocity_th', 'min_dur', 'merge_interval', 'trials', 'saccades', 'sac_per_trial',
+					'no_saccade', 'sac_accuracy', 'task_accuracy', 'microsaccade'])
+print(header)
+for setting in sweep:
+	print('{:.2f}\t{:.0f}\t{:.0f}\t{:.0f}\t{:.0f}\t{:.2f}\t{:.3f}\t{:.3f}\t{:.3f}\t{:.3f}'.format(*setting))
+print('velocity cache: {:.2f} s, {} settings: {:.2f} s'.format(dur_cache, len(sweep_grid), dur_sweep))
+
+# Save all
+# --------
+sweep_filename = "{file_dir}/add/{sub}_task-{task}_saccade_sweep.tsv".format(file_dir = file_dir, sub = subject, task = task)
+np.savetxt(sweep_filename, sweep, fmt = '%g', delimiter = '\t', header = header, comments = '')
@@ -0,0 +1,64 @@
+import numpy as np
+
+from sac_utils import SAC_DTYPE, STEP_DTYPE, target_steps, saccade_latency, run_detector, saccpar, split_segments, assign_trials
+
+polar_ang = np.deg2rad(np.arange(0,360,22.5))
+
+def two_step_latency(step_num, step_trial, saccades_num, step_amp = 5.0, latency = 200.0):
+    # one saccade landing on the target of each step, `latency` ms after it
+    steps = np.zeros(step_num.shape[0], dtype = STEP_DTYPE)
+    steps['time'] = np.arange(step_num.shape[0])*1000.0
+    steps['x_from'], steps['y_from'], steps['x_to'], steps['y_to'] = target_steps(
+        step_num, step_trial, np.full(step_num.shape[0], step_amp), polar_ang, saccades_num)
+    sac = { 'run': np.zeros(step_num.shape[0]), 't_onset': steps['time'] + latency,
+            'x_onset': steps['x_from'], 'y_onset': steps['y_from'],
+            'x_offset': steps['x_to'], 'y_offset': steps['y_to']}
+    return steps, saccade_latency(steps, sac, 80, 600, 1.0)
+
+def test_one_saccade_per_trial_steps():
+    steps, latency = two_step_latency(np.array([1, 1]), np.array([0, 1]), saccades_num = 1)
+    # trial 0 center to periphery, trial 1 back to center (same direction)
+    assert steps['x_from'][0] == 0 and steps['y_from'][0] == 0
+    assert steps['x_to'][1] == 0 and steps['y_to'][1] == 0
+    assert np.allclose((steps['x_to'][0], steps['y_to'][0]), (steps['x_from'][1], steps['y_from'][1]))
+    assert np.allclose(latency['gain'], 1, atol = 1e-3)
+    assert np.allclose(latency['landing_error'], 0)
+    assert np.allclose(latency['latency'], 200)
+
+def test_two_saccades_per_trial_steps():
+    steps, latency = two_step_latency(np.array([1, 2]), np.array([3, 3]), saccades_num = 2)
+    assert np.allclose((steps['x_to'][0], steps['y_to'][0]), (5*np.cos(polar_ang[3]), 5*np.sin(polar_ang[3])), atol = 1e-3)
+    assert steps['x_to'][1] == 0 and steps['y_to'][1] == 0
+    assert np.allclose(latency['gain'], 1, atol = 1e-3)
+
+def test_direction_index():
+    # saccades_num 1: direction of trial//2, saccades_num 2: direction of trial%16
+    x_from, y_from, x_to, y_to = target_steps(np.ones(2, dtype = int), np.array([6, 7]), np.full(2, 5.0), polar_ang, 1)
+    assert np.allclose((x_to[0], y_to[0]), (x_from[1], y_from[1]))
+    assert np.isclose(np.arctan2(y_to[0], x_to[0]), polar_ang[3], atol = 1e-3)
+    x_from, y_from, x_to, y_to = target_steps(np.ones(1, dtype = int), np.array([19]), np.full(1, 5.0), polar_ang, 2)
+    assert np.isclose(np.arctan2(y_to[0], x_to[0]), polar_ang[3], atol = 1e-3)
+
+def test_run_mode_keeps_saccades_of_gappy_trials():
+    # two trials of a run (1000 Hz), 50 missing time stamps in the first one between its two saccades
+    rng = np.random.default_rng(0)
+    t = np.delete(np.arange(4000), np.arange(1500, 1550)).astype('float64')
+    x = 0.01*rng.standard_normal(t.shape[0])
+    for sac_t in [500, 1800, 2500]:
+        x += 2/(1 + np.exp(-np.clip(t - sac_t, -300, 300)/3))
+    y = 0.01*rng.standard_normal(t.shape[0])
+    analysis_info = {'saccade_detector': 'ek', 'sampling_rate': 1000, 'velocity_th': 6, 'min_dur': 6, 'merge_interval': 20}
+
+    # detection within the continuous run segments, saccades assigned to trials by onset (extract_saccades run mode)
+    run_ms = [np.zeros(0, dtype = SAC_DTYPE)]
+    for seg_start, seg_stop in zip(*split_segments(t, 1000)):
+        seg_ms = saccpar(run_detector(x[seg_start:seg_stop], y[seg_start:seg_stop], analysis_info))
+        seg_ms['onset'] += seg_start
+        seg_ms['offset'] += seg_start
+        run_ms.append(seg_ms)
+    run_ms = np.concatenate(run_ms)
+    run_ms_trial = assign_trials(t[run_ms['onset']], np.array([0, 2000]), np.array([1999, 3999]))
+
+    assert np.sum(np.diff(t[t < 2000]) > 1) > 0
+    assert np.sum(run_ms_trial == 0) == 2
+    assert np.sum(run_ms_trial == 1) == 1